@@ -1,4 +1,11 @@
 #!/usr/bin/with-contenv bashio
 
 echo "Starting M8 Local Server..."
+export M8_CLOUD_MODE="$(bashio::config 'cloud_mode')"
+export M8_DEVICE_CACHE_TTL="$(bashio::config 'device_cache_ttl')"
+export M8_LONG_HOLD="$(bashio::config 'long_hold')"
+if bashio::config.true 'capture'; then
+    export M8_CAPTURE_FILE="/config/m8_capture.jsonl"
+    export M8_CAPTURE_MAX_BYTES="$(( $(bashio::config 'capture_max_mb') * 1024 * 1024 ))"
+fi
 exec python3 /m8_local_server.py
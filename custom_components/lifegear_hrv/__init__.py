@@ -9,11 +9,13 @@ from homeassistant.core import HomeAssistant
 from .const import (
     DOMAIN,
     CONF_USER_ID, CONF_AUTH_CODE, CONF_LOGIN_METHOD, CONF_LOCAL_SERVER,
-    CONF_DEVICE_MODEL, CONF_MAC,
+    CONF_DEVICE_MODEL, CONF_MAC, CONF_ACCOUNT,
     LOGIN_METHOD_MANUAL,
     DEVICE_MODEL_M8, DEVICE_MODEL_M8E,
 )
-from .coordinator import LifegearHRVCoordinator
+from .auth import auth_store, same_platform
+from .coordinator import LifegearHRVCoordinator, snapshot_store
+from .services import async_setup_services, async_unload_services
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -70,14 +72,25 @@ async def async_migrate_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Lifegear HRV from a config entry."""
     coordinator = LifegearHRVCoordinator(hass, entry)
-    await coordinator.async_cloud_login()
-    await coordinator.async_config_entry_first_refresh()
+    if await coordinator.async_restore_snapshot():
+        # Entities start from the last known state; a slow or unreachable
+        # cloud no longer holds up HA startup
+        # (cancelled by HA when the entry unloads)
+        entry.async_create_background_task(
+            hass,
+            coordinator.async_background_start(),
+            name=f"{DOMAIN} background start {entry.entry_id}",
+        )
+    else:
+        await coordinator.async_cloud_login()
+        await coordinator.async_config_entry_first_refresh()
 
     hass.data.setdefault(DOMAIN, {})
     hass.data[DOMAIN][entry.entry_id] = coordinator
 
     await _async_fixup_entity_categories(hass, entry)
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    async_setup_services(hass)
 
     return True
 
@@ -127,9 +140,24 @@ async def _async_fixup_entity_categories(
         ent_reg.async_remove(body_eid)
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Delete the persisted snapshot (and the account's AuthCode with its
+    last entry on that platform)."""
+    await snapshot_store(hass, entry.entry_id).async_remove()
+    account = entry.data.get(CONF_ACCOUNT)
+    model = entry.data.get(CONF_DEVICE_MODEL, DEVICE_MODEL_M8)
+    if account and not any(
+        other.data.get(CONF_ACCOUNT) == account and same_platform(other, model)
+        for other in hass.config_entries.async_entries(DOMAIN)
+        if other.entry_id != entry.entry_id
+    ):
+        await auth_store(hass, str(account), model).async_remove()
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
         hass.data[DOMAIN].pop(entry.entry_id)
+        async_unload_services(hass)
 
     return unload_ok
@@ -0,0 +1,135 @@
+"""Streaming heat-recovery analytics for M8-E HRV duct temperatures.
+
+Every coordinator poll feeds one sample (OA/SA/RA/EX duct temps, fan speed,
+power) into the coordinator's HRVAnalytics instance. All outputs are
+updated incrementally from that sample: an exponentially weighted efficiency
+that holds its last value while the indoor/outdoor gradient is too small to
+measure, a one-hour rolling mean kept with a running sum, recovered heat
+power from the airflow at the current speed (scaled from the rated airflow
+set in the options) and the supply-side delta, and recovered energy
+integrated sample-to-sample. Nothing is recomputed from history.
+"""
+from __future__ import annotations
+
+import math
+from collections import deque
+
+from .const import AIR_HEAT_CAPACITY, HRV_MAX_SPEED
+
+# Below this |RA - OA| (°C) the efficiency ratio is dominated by the 1 °C
+# resolution of the duct sensors; hold the previous estimate instead.
+MIN_GRADIENT = 0.5
+# EWMA time constant (s) for the smoothed efficiencies
+SMOOTHING_TAU = 600
+# Rolling-mean window (s)
+WINDOW = 3600
+# Don't integrate energy across gaps longer than this (s): HA restart,
+# add-on down, device offline.
+MAX_GAP = 600
+
+
+class _RollingMean:
+    """Time-windowed mean with O(1) amortised add/evict."""
+
+    def __init__(self, window: float) -> None:
+        """Initialize."""
+        self._window = window
+        self._samples: deque[tuple[float, float]] = deque()
+        self._sum = 0.0
+
+    def add(self, now: float, value: float) -> None:
+        """Add a sample and drop those that fell out of the window."""
+        self._samples.append((now, value))
+        self._sum += value
+        cutoff = now - self._window
+        while self._samples and self._samples[0][0] < cutoff:
+            self._sum -= self._samples.popleft()[1]
+
+    @property
+    def mean(self) -> float | None:
+        """Mean over the window, None when empty."""
+        if not self._samples:
+            return None
+        return self._sum / len(self._samples)
+
+
+class HRVAnalytics:
+    """Derived ventilation metrics for one HRV unit."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.efficiency: float | None = None
+        self.exhaust_efficiency: float | None = None
+        self.power_w: float = 0.0
+        self.energy_kwh: float = 0.0
+        self._efficiency_1h = _RollingMean(WINDOW)
+        self._last_ts: float | None = None
+
+    def seed_energy(self, kwh: float) -> None:
+        """Continue the energy total from a restored sensor state."""
+        if kwh > self.energy_kwh:
+            self.energy_kwh = kwh
+
+    def _smooth(self, prev: float | None, value: float, dt: float) -> float:
+        if prev is None:
+            return value
+        alpha = 1 - math.exp(-dt / SMOOTHING_TAU) if dt > 0 else 0.0
+        return prev + alpha * (value - prev)
+
+    def update(
+        self,
+        now: float,
+        oa: float | None,
+        sa: float | None,
+        ra: float | None,
+        ex: float | None,
+        speed: int | None,
+        powered: bool,
+        rated_airflow: float = 0.0,
+    ) -> dict:
+        """Fold in one sample and return the md_hrv_* fields for coordinator data.
+
+        `rated_airflow` is the unit's m³/h at the top speed; without it
+        there is no recovered power (None) and no energy is added.
+        """
+        dt = now - self._last_ts if self._last_ts is not None else 0.0
+        self._last_ts = now
+        gradient = ra - oa if ra is not None and oa is not None else None
+        measurable = gradient is not None and abs(gradient) >= MIN_GRADIENT
+
+        efficiency_now = None
+        if measurable and sa is not None:
+            efficiency_now = (sa - oa) / gradient * 100
+            self.efficiency = self._smooth(self.efficiency, efficiency_now, dt)
+            self._efficiency_1h.add(now, efficiency_now)
+        if measurable and ex is not None:
+            exhaust_now = (ra - ex) / gradient * 100
+            self.exhaust_efficiency = self._smooth(self.exhaust_efficiency, exhaust_now, dt)
+
+        # Recovered power: heat (or coolth) the supply air picked up from the
+        # exhaust stream. Only counted in the direction of the gradient;
+        # a supply delta against it is not recovery.
+        power = 0.0
+        airflow = None
+        if rated_airflow and speed:
+            airflow = rated_airflow * min(speed, HRV_MAX_SPEED) / HRV_MAX_SPEED
+        if powered and airflow and gradient is not None and sa is not None and oa is not None:
+            delta = (sa - oa) if gradient >= 0 else (oa - sa)
+            power = max(0.0, AIR_HEAT_CAPACITY * airflow / 3600 * delta)
+        if 0 < dt <= MAX_GAP:
+            self.energy_kwh += (self.power_w + power) / 2 * dt / 3_600_000
+        self.power_w = power
+
+        def _r(v: float | None, nd: int = 1) -> float | None:
+            return round(v, nd) if v is not None else None
+
+        return {
+            "md_hrv_efficiency": _r(self.efficiency),
+            "md_hrv_efficiency_now": _r(efficiency_now),
+            "md_hrv_efficiency_1h": _r(self._efficiency_1h.mean),
+            "md_hrv_exhaust_efficiency": _r(self.exhaust_efficiency),
+            "md_hrv_recovered_power": round(power) if rated_airflow else None,
+            "md_hrv_recovered_energy": round(self.energy_kwh, 3),
+            "md_hrv_airflow": (round(airflow) if airflow else 0) if powered else 0,
+        }
+
@@ -0,0 +1,392 @@
+"""Account-level AuthCode lifecycle for Lifegear cloud logins.
+
+The cloud issues single-session AuthCodes: every login invalidates the code
+any other client holds for the account. One AccountTokenManager per account
+and platform (the legacy M8 and the M8-E platform are separate clouds with
+their own logins and codes) owns the current code for every config entry
+on it. Coordinators read
+`auth_code` / `user_id` from it, report successful cloud calls with
+`mark_verified()` and ask for `async_refresh()` after a rejected call.
+Concurrent refreshes share one in-flight login, and a refresh asked for by a
+request that started before the current code was minted returns at once.
+
+While no poll has proven the code for a while (local mode, add-on app API,
+quiet periods) a cheap authenticated probe checks it in the background, so
+an expired code is replaced before the next command needs it.
+
+The code, when it was last validated and the account's device list are
+kept in integration storage, so a restart shortly after a validation trusts
+the code without any network call and a later one needs a single probe.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from datetime import timedelta
+
+import aiohttp
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.helpers.storage import Store
+
+from .const import (
+    DOMAIN,
+    CONF_ACCOUNT,
+    CONF_PASSWORD,
+    CONF_USER_ID,
+    CONF_AUTH_CODE,
+    CONF_DEVICE_MODEL,
+    DEVICE_MODEL_M8,
+    is_m8e_platform,
+)
+from .scheduler import LANE_BACKGROUND, LANE_CONTROL, get_scheduler
+
+_LOGGER = logging.getLogger(__name__)
+
+# Minimum seconds between logins (prevent login war with APP)
+RELOGIN_COOLDOWN = 120
+# Probe the code when nothing has verified it for this long
+IDLE_PROBE_AFTER = 600
+# How often the idle check runs
+_IDLE_CHECK_INTERVAL = timedelta(seconds=60)
+# Persisted code / validation time / device list
+AUTH_STORAGE_VERSION = 1
+# Write at most this often for routine validations (logins save at once)
+_VERIFIED_SAVE_DELAY = 300
+
+
+def auth_store(hass: HomeAssistant, account: str, model: str = DEVICE_MODEL_M8) -> Store:
+    """Store for an account's validated AuthCode on `model`'s platform
+    (file name hashes the account)."""
+    digest = hashlib.sha1(account.encode()).hexdigest()[:12]
+    platform = ".m8e" if is_m8e_platform(model) else ""
+    return Store(hass, AUTH_STORAGE_VERSION, f"{DOMAIN}.auth{platform}.{digest}")
+
+
+def same_platform(entry: ConfigEntry, model: str) -> bool:
+    """Whether `entry` logs in to the same cloud platform as `model`."""
+    return is_m8e_platform(entry.data.get(CONF_DEVICE_MODEL, DEVICE_MODEL_M8)) == is_m8e_platform(model)
+
+
+class AccountTokenManager:
+    """Current AuthCode for one Lifegear account on one platform."""
+
+    def __init__(self, hass: HomeAssistant, account: str, model: str = DEVICE_MODEL_M8) -> None:
+        """Initialize."""
+        self.hass = hass
+        self.account = account
+        self.user_id = account
+        self.auth_code = ""
+        self.valid = False
+        # monotonic time of the login that minted auth_code (0 = inherited
+        # from entry data)
+        self.issued_at = 0.0
+        self._verified_at = 0.0
+        self._last_login = 0.0
+        self._password = ""
+        # Any model of the platform; picks its login / probe URLs
+        self._model = model
+        self._entries: set[str] = set()
+        self._refresh_task: asyncio.Task | None = None
+        self._startup_lock = asyncio.Lock()
+        self._idle_unsub = None
+        self._storage = auth_store(hass, account, model)
+        self._loaded = False
+        # getDeviceList result from the last login or probe (M8-E platform)
+        self.devices: list[dict] = []
+        # Counters for diagnostics
+        self.logins = 0
+        self.login_failures = 0
+        self.cooldown_hits = 0
+        self.probes = 0
+        self.probe_rejections = 0
+
+    # ── Entries ───────────────────────────────────────────────────────────
+    @callback
+    def attach(self, entry: ConfigEntry) -> None:
+        """Register an entry that uses this account."""
+        self._entries.add(entry.entry_id)
+        self._password = entry.data.get(CONF_PASSWORD, self._password)
+        if not self.auth_code and entry.data.get(CONF_AUTH_CODE):
+            self.user_id = entry.data.get(CONF_USER_ID) or self.account
+            self.auth_code = entry.data[CONF_AUTH_CODE]
+            self.valid = True
+        if self._idle_unsub is None:
+            self._idle_unsub = async_track_time_interval(
+                self.hass, self._async_idle_check, _IDLE_CHECK_INTERVAL,
+            )
+
+    @callback
+    def detach(self, entry_id: str) -> None:
+        """Unregister an entry; stop probing when none are left."""
+        self._entries.discard(entry_id)
+        if not self._entries and self._idle_unsub is not None:
+            self._idle_unsub()
+            self._idle_unsub = None
+
+    @property
+    def in_use(self) -> bool:
+        """Whether any loaded entry still uses this manager."""
+        return bool(self._entries)
+
+    @callback
+    def _store(self) -> None:
+        """Write the current code into every entry on this account and platform."""
+        for entry in self.hass.config_entries.async_entries(DOMAIN):
+            if (
+                entry.data.get(CONF_ACCOUNT) != self.account
+                or not entry.data.get(CONF_PASSWORD)
+                or not same_platform(entry, self._model)
+            ):
+                continue
+            if (
+                entry.data.get(CONF_AUTH_CODE) == self.auth_code
+                and entry.data.get(CONF_USER_ID) == self.user_id
+            ):
+                continue
+            self.hass.config_entries.async_update_entry(
+                entry,
+                data={**entry.data, CONF_USER_ID: self.user_id, CONF_AUTH_CODE: self.auth_code},
+            )
+
+    # ── Validity ──────────────────────────────────────────────────────────
+    @callback
+    def mark_verified(self) -> None:
+        """A cloud call just succeeded with the current code."""
+        self.valid = True
+        self._verified_at = time.monotonic()
+        self._storage.async_delay_save(self._data_to_store, _VERIFIED_SAVE_DELAY)
+
+    # ── Persistence ───────────────────────────────────────────────────────
+    def _data_to_store(self) -> dict:
+        """Payload for the auth store (wall-clock validation time)."""
+        verified = (
+            time.time() - (time.monotonic() - self._verified_at)
+            if self._verified_at else None
+        )
+        return {
+            "user_id": self.user_id,
+            "auth_code": self.auth_code,
+            "verified_at": verified,
+            "devices": self.devices,
+        }
+
+    async def _async_load(self) -> None:
+        """Adopt the persisted code and validation time, once per process."""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            stored = await self._storage.async_load()
+        except Exception as err:
+            _LOGGER.debug("AuthCode store load failed: %s", err)
+            return
+        if not stored or not stored.get("auth_code"):
+            return
+        self.devices = stored.get("devices") or []
+        if self.auth_code and stored["auth_code"] != self.auth_code:
+            # Entry data has a different (newer, e.g. reconfigured) code
+            return
+        self.user_id = stored.get("user_id") or self.user_id
+        self.auth_code = stored["auth_code"]
+        age = time.time() - (stored.get("verified_at") or 0)
+        # (an age beyond the monotonic clock can't be expressed on it; such
+        # a code is simply probed)
+        if 0 <= age < time.monotonic():
+            self.valid = True
+            self._verified_at = time.monotonic() - age
+
+    async def async_ensure_valid(self) -> bool:
+        """Make sure there is a usable code; called at entry setup.
+
+        In order: a login made within the cooldown that we haven't seen yet
+        (config flow, reconfigure), a code a sibling validated moments ago,
+        the stored code if a probe accepts it, and only then a new login.
+        Never raises: setup goes on and the first poll decides.
+        """
+        try:
+            return await self._async_ensure_valid()
+        except Exception as err:
+            _LOGGER.warning("AuthCode check for %s failed: %s", self.account, err)
+            return False
+
+    async def _async_ensure_valid(self) -> bool:
+        async with self._startup_lock:
+            await self._async_load()
+            now = time.monotonic()
+            from .crypto import recent_login
+            login = recent_login(self.account, RELOGIN_COOLDOWN, self._model)
+            if login is not None and login[2] > self.issued_at and login[1] != self.auth_code:
+                # A config flow logged in (and so invalidated our code)
+                self.user_id, self.auth_code, self.issued_at = login
+                self._last_login = self.issued_at
+                self.mark_verified()
+                self._store()
+                self._storage.async_delay_save(self._data_to_store, 1)
+                _LOGGER.info("Adopted the AuthCode from this account's login %.0f s ago",
+                             now - self.issued_at)
+                return True
+
+            if self.valid and now - max(self.issued_at, self._verified_at) < IDLE_PROBE_AFTER:
+                # Validated moments ago by a sibling, or before a restart
+                return True
+
+            if self.auth_code:
+                accepted = await self._async_probe()
+                if accepted is None or accepted:
+                    # Unreachable cloud: keep the stored code, the first
+                    # poll decides.
+                    return True
+
+        return await self.async_refresh()
+
+    async def _async_probe(self) -> bool | None:
+        """Probe the current code: True/False, or None if the cloud is unreachable."""
+        from .crypto import async_get_device_list, async_probe_auth
+        code = self.auth_code
+        self.probes += 1
+        try:
+            async with get_scheduler(self.hass, self.account).slot(LANE_BACKGROUND), \
+                    aiohttp.ClientSession() as session:
+                if is_m8e_platform(self._model):
+                    # getDeviceList is the probe; keep its result
+                    try:
+                        self.devices = await async_get_device_list(
+                            session, self.user_id, code, self._model,
+                        )
+                        accepted = True
+                    except ValueError:
+                        accepted = False
+                else:
+                    accepted = await async_probe_auth(session, self.user_id, code, self._model)
+        except (ConnectionError, asyncio.TimeoutError) as err:
+            _LOGGER.debug("AuthCode probe failed: %s", err)
+            return None
+        except Exception as err:
+            # Malformed answer (non-list JSON, missing keys): as unreachable
+            _LOGGER.debug("AuthCode probe got an unexpected answer: %r", err)
+            return None
+        if code != self.auth_code:
+            # Replaced while probing; the result says nothing about the new one
+            return None
+        if accepted:
+            self.mark_verified()
+        else:
+            _LOGGER.info("AuthCode for %s was rejected by the cloud", self.account)
+            self.probe_rejections += 1
+            self.valid = False
+        return accepted
+
+    async def _async_idle_check(self, _now=None) -> None:
+        """Probe a code nobody has used successfully for a while."""
+        if self._refresh_task is not None or not self.auth_code:
+            return
+        if time.monotonic() - max(self.issued_at, self._verified_at) < IDLE_PROBE_AFTER:
+            return
+        if self.valid and await self._async_probe() is not False:
+            return
+        await self.async_refresh()
+
+    # ── Refresh ───────────────────────────────────────────────────────────
+    async def async_refresh(
+        self, issued_before: float | None = None, force: bool = False,
+    ) -> bool:
+        """Get a new code, sharing a login already in flight.
+
+        `issued_before` is when the caller's failed request started: if the
+        current code was minted after that, it is returned as-is. `force`
+        skips the cooldown (manual re-login button).
+        """
+        if issued_before is not None and self.valid and self.issued_at > issued_before:
+            return True
+        if self._refresh_task is None:
+            if not self._password:
+                return False
+            if not force and time.monotonic() - self._last_login < RELOGIN_COOLDOWN:
+                _LOGGER.debug("Re-login cooldown active, skipping")
+                self.cooldown_hits += 1
+                return False
+            self._refresh_task = self.hass.async_create_task(self._async_login())
+        return await asyncio.shield(self._refresh_task)
+
+    async def _async_login(self) -> bool:
+        """Perform the login (only ever one at a time per account)."""
+        _LOGGER.info("Logging in to refresh the AuthCode for %s", self.account)
+        self._last_login = time.monotonic()
+        self.logins += 1
+        try:
+            from .crypto import async_login
+            # Ahead of every queued poll: they all wait for this code
+            async with get_scheduler(self.hass, self.account).slot(LANE_CONTROL), \
+                    aiohttp.ClientSession() as session:
+                result = await async_login(
+                    session, self.account, self._password, model=self._model,
+                )
+            self.user_id = result["u_id"]
+            self.auth_code = result["auth_code"]
+            self.issued_at = time.monotonic()
+            if result.get("devices"):
+                self.devices = result["devices"]
+            self.mark_verified()
+            self._store()
+            self._storage.async_delay_save(self._data_to_store, 1)
+            _LOGGER.info("Re-login successful, AuthCode refreshed")
+            return True
+        except Exception as err:
+            _LOGGER.error("Re-login failed: %s", err)
+            self.login_failures += 1
+            self.valid = False
+            return False
+        finally:
+            self._refresh_task = None
+
+    def diagnostics(self) -> dict:
+        """Counters and code age (the code itself is never included)."""
+        now = time.monotonic()
+        return {
+            "valid": self.valid,
+            "entries": len(self._entries),
+            "code_age_s": round(now - self.issued_at) if self.issued_at else None,
+            "verified_ago_s": round(now - self._verified_at) if self._verified_at else None,
+            "logins": self.logins,
+            "login_failures": self.login_failures,
+            "cooldown_hits": self.cooldown_hits,
+            "probes": self.probes,
+            "probe_rejections": self.probe_rejections,
+            "devices": len(self.devices),
+        }
+
+
+# Managers by (account, M8-E platform?) in hass.data[DOMAIN], for as long as
+# an entry on the account and platform is loaded
+DATA_TOKEN_MANAGERS = "token_managers"
+
+
+def get_token_manager(
+    hass: HomeAssistant, account: str, model: str = DEVICE_MODEL_M8,
+) -> AccountTokenManager:
+    """Return the token manager for an account on `model`'s platform."""
+    managers = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_TOKEN_MANAGERS, {})
+    key = (account, is_m8e_platform(model))
+    if key not in managers:
+        managers[key] = AccountTokenManager(hass, account, model)
+    return managers[key]
+
+
+@callback
+def release_token_manager(
+    hass: HomeAssistant, manager: AccountTokenManager, entry_id: str,
+) -> None:
+    """Detach an unloaded entry; drop the manager with its last entry."""
+    manager.detach(entry_id)
+    if manager.in_use:
+        return
+    managers = hass.data.get(DOMAIN, {}).get(DATA_TOKEN_MANAGERS, {})
+    key = (manager.account, is_m8e_platform(manager._model))
+    if managers.get(key) is manager:
+        del managers[key]
+        if not managers:
+            del hass.data[DOMAIN][DATA_TOKEN_MANAGERS]
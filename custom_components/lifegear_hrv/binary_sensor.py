@@ -1,6 +1,8 @@
 """Binary sensor platform for Lifegear HRV (M8 connectivity)."""
 from __future__ import annotations
 
+import time
+
 from homeassistant.components.binary_sensor import (
     BinarySensorDeviceClass,
     BinarySensorEntity,
@@ -37,7 +39,11 @@ class LifegearHRVConnectivity(CoordinatorEntity, BinarySensorEntity):
         entry: ConfigEntry,
     ) -> None:
         """Initialize."""
-        super().__init__(coordinator)
+        # sensor_ts alone (a fresh push with identical values) doesn't
+        # rewrite the state; last_data_received is refreshed with the next
+        # online/offline change.
+        # "route" is added by the coordinator when the backend router switches
+        super().__init__(coordinator, frozenset({"local", "m8_online", "isconnect", "route"}))
         mac = entry.data.get(CONF_MAC, "unknown")
         # Friendly name is always just "連線狀態" — HA's device page already
         # groups entities under the owning device, so prefixing with the
@@ -57,22 +63,23 @@ class LifegearHRVConnectivity(CoordinatorEntity, BinarySensorEntity):
         data = self.coordinator.data
 
         # Local mode: check if M8 pushed data recently
-        if data.get("_local"):
-            return bool(data.get("_m8_online", False))
+        if getattr(data, "local", False):
+            return data.m8_online
 
         # Cloud mode: use isconnect field
-        isconnect = data.get("md_isconnect")
-        if isconnect is None:
+        if data.isconnect is None:
             return None
-        return bool(int(isconnect))
+        return bool(data.isconnect)
 
     @property
     def extra_state_attributes(self) -> dict:
-        """Return last seen timestamp."""
-        if not self.coordinator.data:
-            return {}
-        data = self.coordinator.data
-        attrs = {}
-        if data.get("_sensor_ts"):
-            attrs["last_data_received"] = data["_sensor_ts"]
+        """Return last seen timestamp and backend routing diagnostics."""
+        attrs = self.coordinator.router.diagnostics()
+        if self.coordinator.restored_at is not None:
+            attrs["restored_from"] = time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.localtime(self.coordinator.restored_at)
+            )
+        sensor_ts = getattr(self.coordinator.data, "sensor_ts", None)
+        if sensor_ts:
+            attrs["last_data_received"] = sensor_ts
         return attrs
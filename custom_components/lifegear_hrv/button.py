@@ -30,7 +30,7 @@ async def async_setup_entry(
     model = entry.data.get(CONF_DEVICE_MODEL, DEVICE_MODEL_M8)
     entities: list[ButtonEntity] = []
 
-    if coordinator._has_cloud_creds:
+    if coordinator.has_cloud_creds:
         entities.append(LifegearHRVReloginButton(coordinator, entry))
 
     # Filter reset buttons (M8-E platform, except sensor-only)
@@ -60,7 +60,7 @@ class LifegearHRVReloginButton(CoordinatorEntity, ButtonEntity):
         entry: ConfigEntry,
     ) -> None:
         """Initialize."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, frozenset())
         mac = entry.data.get(CONF_MAC, "unknown")
         self._attr_unique_id = f"{mac}_relogin"
         self._attr_device_info = {
@@ -91,7 +91,7 @@ class LifegearFilterResetButton(CoordinatorEntity, ButtonEntity):
         filter_name: str,
     ) -> None:
         """Initialize."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, frozenset())
         mac = entry.data.get(CONF_MAC, "unknown")
         self._filter_type = filter_type
         self._attr_name = f"{filter_name}重置"
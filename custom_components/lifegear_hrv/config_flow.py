@@ -31,10 +31,24 @@ from .const import (
     DEVICE_MODEL_BATH_HEATER,
     DEVICE_MODEL_M8E_SENSOR,
     HEADERS,
+    CONF_HEARTBEAT,
+    DEFAULT_HEARTBEAT,
+    CONF_CLOUD_RATE,
+    CONF_CLOUD_CONCURRENCY,
+    CONF_RATED_AIRFLOW,
+    PUBLISH_DEADBANDS,
+    deadband_option,
     get_api_urls,
     is_m8e_platform,
     detect_device_model,
 )
+from .scheduler import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_RATE,
+    LANE_CONTROL,
+    get_scheduler,
+    release_scheduler,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -102,14 +116,18 @@ async def validate_credentials(
     """Validate account + password login."""
     from .crypto import async_login
 
+    account = str(data[CONF_ACCOUNT])
     async with aiohttp.ClientSession() as session:
         try:
-            result = await async_login(
-                session,
-                data[CONF_ACCOUNT],
-                data[CONF_PASSWORD],
-                model=model,
-            )
+            # Queued with the account's other cloud calls (its loaded
+            # entries' polls, a token manager's re-login)
+            async with get_scheduler(hass, account).slot(LANE_CONTROL):
+                result = await async_login(
+                    session,
+                    data[CONF_ACCOUNT],
+                    data[CONF_PASSWORD],
+                    model=model,
+                )
             default_name = "樂奇 M8-E" if is_m8e_platform(model) else "樂奇全熱交換機"
             info = {
                 "title": result.get("title", default_name),
@@ -127,6 +145,9 @@ async def validate_credentials(
         except ConnectionError as err:
             _LOGGER.error("Connection error: %s", err)
             raise CannotConnect from err
+        finally:
+            # Not kept for an account with no loaded entry
+            release_scheduler(hass, account)
 
 
 class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -451,13 +472,106 @@ class ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         )
 
 
+def _publish_keys(model: str) -> tuple[str, ...]:
+    """Sensor kinds with a publishing deadband for a device model."""
+    if model == DEVICE_MODEL_M8E:
+        return ("duct_temp", "efficiency", "recovered_power", "recovered_energy")
+    if model == DEVICE_MODEL_BATH_HEATER:
+        return ("co2", "pm25", "rh")
+    return ("co2", "pm25", "temp", "rh")
+
+
 class OptionsFlowHandler(config_entries.OptionsFlow):
     """Handle options flow."""
 
     async def async_step_init(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
-        """Manage the options."""
+        """Choose between connection settings and state publishing."""
+        menu = ["connection", "publishing", "cloud_limits"]
+        if self.config_entry.data.get(CONF_DEVICE_MODEL) == DEVICE_MODEL_M8E:
+            menu.append("airflow")
+        return self.async_show_menu(step_id="init", menu_options=menu)
+
+    async def async_step_publishing(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Per-sensor deadbands and the heartbeat interval.
+
+        Stored in entry.options; the coordinator reads them on every update,
+        so no reload is needed.
+        """
+        if user_input is not None:
+            return self.async_create_entry(
+                title="", data={**self.config_entry.options, **user_input}
+            )
+
+        options = self.config_entry.options
+        model = self.config_entry.data.get(CONF_DEVICE_MODEL, DEVICE_MODEL_M8)
+        fields: dict[Any, Any] = {
+            vol.Optional(
+                CONF_HEARTBEAT, default=options.get(CONF_HEARTBEAT, DEFAULT_HEARTBEAT)
+            ): vol.All(vol.Coerce(int), vol.Range(min=0, max=1440)),
+        }
+        for key in _publish_keys(model):
+            option = deadband_option(key)
+            fields[vol.Optional(
+                option, default=options.get(option, PUBLISH_DEADBANDS[key])
+            )] = vol.All(vol.Coerce(float), vol.Range(min=0))
+        return self.async_show_form(step_id="publishing", data_schema=vol.Schema(fields))
+
+    async def async_step_cloud_limits(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Cloud request rate and concurrency for this entry's account.
+
+        Read by the coordinator on every cloud call; no reload is needed.
+        """
+        if user_input is not None:
+            return self.async_create_entry(
+                title="", data={**self.config_entry.options, **user_input}
+            )
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="cloud_limits",
+            data_schema=vol.Schema({
+                vol.Optional(
+                    CONF_CLOUD_RATE, default=options.get(CONF_CLOUD_RATE, DEFAULT_RATE)
+                ): vol.All(vol.Coerce(int), vol.Range(min=6, max=600)),
+                vol.Optional(
+                    CONF_CLOUD_CONCURRENCY,
+                    default=options.get(CONF_CLOUD_CONCURRENCY, DEFAULT_CONCURRENCY),
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=8)),
+            }),
+        )
+
+    async def async_step_airflow(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Rated airflow for the recovered heat estimate (M8-E HRV).
+
+        Read by the coordinator on every update; no reload is needed.
+        """
+        if user_input is not None:
+            return self.async_create_entry(
+                title="", data={**self.config_entry.options, **user_input}
+            )
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="airflow",
+            data_schema=vol.Schema({
+                vol.Optional(
+                    CONF_RATED_AIRFLOW, default=options.get(CONF_RATED_AIRFLOW, 0)
+                ): vol.All(vol.Coerce(int), vol.Range(min=0, max=2000)),
+            }),
+        )
+
+    async def async_step_connection(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the connection options."""
         errors: dict[str, str] = {}
         login_method = self.config_entry.data.get(CONF_LOGIN_METHOD)
         is_credentials = login_method == LOGIN_METHOD_CREDENTIALS
@@ -498,6 +612,14 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                         CONF_USER_ID: user_input[CONF_USER_ID],
                         CONF_AUTH_CODE: user_input[CONF_AUTH_CODE],
                     }
+                if not is_local and is_m8e_platform(model):
+                    # Optional add-on URL: serve status/control from the
+                    # add-on's local app API instead of the remote cloud
+                    local_url = user_input.get(CONF_LOCAL_SERVER, "").strip().rstrip("/")
+                    if local_url:
+                        new_data[CONF_LOCAL_SERVER] = local_url
+                    else:
+                        new_data.pop(CONF_LOCAL_SERVER, None)
             except CannotConnect:
                 errors["base"] = "cannot_connect"
             except InvalidAuth:
@@ -506,10 +628,19 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                 _LOGGER.exception("Unexpected exception")
                 errors["base"] = "unknown"
             else:
+                local_changed = (
+                    new_data.get(CONF_LOCAL_SERVER)
+                    != self.config_entry.data.get(CONF_LOCAL_SERVER)
+                )
                 self.hass.config_entries.async_update_entry(
                     self.config_entry, data=new_data
                 )
-                return self.async_create_entry(title="", data={})
+                if local_changed and not is_local:
+                    # API URLs are resolved when the coordinator is created
+                    self.hass.async_create_task(
+                        self.hass.config_entries.async_reload(self.config_entry.entry_id)
+                    )
+                return self.async_create_entry(title="", data=dict(self.config_entry.options))
 
         if is_local:
             schema = vol.Schema(
@@ -532,9 +663,15 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
                     vol.Required(CONF_AUTH_CODE, default=self.config_entry.data.get(CONF_AUTH_CODE, "")): str,
                 }
             )
+        if not is_local and is_m8e_platform(model):
+            schema = schema.extend(
+                {
+                    vol.Optional(CONF_LOCAL_SERVER, default=self.config_entry.data.get(CONF_LOCAL_SERVER, "")): str,
+                }
+            )
 
         return self.async_show_form(
-            step_id="init",
+            step_id="connection",
             data_schema=schema,
             errors=errors,
         )
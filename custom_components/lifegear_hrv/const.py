@@ -18,6 +18,8 @@ LOGIN_METHOD_CREDENTIALS = "credentials"
 LOGIN_METHOD_MANUAL = "manual"
 LOGIN_METHOD_LOCAL = "local"
 
+SERVICE_SET_MANY = "set_many"
+
 DEVICE_MODEL_M8 = "m8"
 DEVICE_MODEL_M8E = "m8e"
 DEVICE_MODEL_BATH_HEATER = "bath_heater"
@@ -44,10 +46,22 @@ API_FILTER_ALARM_RESET_M8E = f"{API_BASE_URL_M8E}/getDeviceFilterAlarmReset.asp"
 API_FILTER_ALARM_EDIT_M8E = f"{API_BASE_URL_M8E}/getDeviceFilterAlarmEdit.asp"
 
 
-def get_api_urls(model: str = DEVICE_MODEL_M8) -> dict:
-    """Return API URLs for the given device model."""
+# App-facing endpoints the m8_local_server add-on also serves (from its live
+# per-MAC device state) on its REST port under the same /AppV2 path.
+LOCAL_API_KEYS = (
+    "status", "air_index", "device_function", "filter_alarm", "control", "power",
+)
+
+
+def get_api_urls(model: str = DEVICE_MODEL_M8, local_base: str | None = None) -> dict:
+    """Return API URLs for the given device model.
+
+    With `local_base` (the add-on REST URL, e.g. http://ha:8765) the M8-E
+    platform's LOCAL_API_KEYS point at the add-on instead of the cloud;
+    login, device list and filter reset/edit stay on the cloud.
+    """
     if model in (DEVICE_MODEL_M8E, DEVICE_MODEL_BATH_HEATER, DEVICE_MODEL_M8E_SENSOR):
-        return {
+        urls = {
             "login": API_LOGIN_M8E,
             "list": API_LIST_DEVICES_M8E,
             "device_list": API_GET_DEVICE_LIST_M8E,
@@ -60,6 +74,11 @@ def get_api_urls(model: str = DEVICE_MODEL_M8) -> dict:
             "filter_reset": API_FILTER_ALARM_RESET_M8E,
             "filter_edit": API_FILTER_ALARM_EDIT_M8E,
         }
+        if local_base:
+            base = local_base.rstrip("/")
+            for key in LOCAL_API_KEYS:
+                urls[key] = urls[key].replace("http://dm03.e-giant.com.tw", base, 1)
+        return urls
     return {
         "login": API_LOGIN,
         "list": API_GET_STATUS,
@@ -104,6 +123,45 @@ MODE_NAMES_M8E = {
 }
 
 
+# Significance-based state publishing: a numeric sensor writes state only
+# when its value moves by at least its deadband (in the sensor's unit) or the
+# heartbeat interval has passed. Set per sensor kind in the options flow and
+# stored in entry.options as deadband_<key> / heartbeat_minutes.
+CONF_HEARTBEAT = "heartbeat_minutes"
+DEFAULT_HEARTBEAT = 15
+PUBLISH_DEADBANDS = {
+    "co2": 10,
+    "pm25": 1,
+    "temp": 0,
+    "rh": 1,
+    "duct_temp": 0,
+    "efficiency": 0.5,
+    "recovered_power": 5,
+    "recovered_energy": 0.005,
+}
+
+
+# Per-account cloud request limits (see scheduler.py); the strictest value
+# among an account's entries applies.
+CONF_CLOUD_RATE = "cloud_rate_per_minute"
+CONF_CLOUD_CONCURRENCY = "cloud_concurrency"
+
+
+def deadband_option(key: str) -> str:
+    """Return the entry.options key holding a sensor kind's deadband."""
+    return f"deadband_{key}"
+
+
+# Rated M8-E HRV airflow (m³/h) at the top fan speed, from the unit's
+# nameplate, set in the options flow; lower speeds scale linearly. Recovered
+# heat power is only estimated once it is set.
+CONF_RATED_AIRFLOW = "rated_airflow_m3h"
+HRV_MAX_SPEED = 4
+
+# Volumetric heat capacity of air, J/(m³·K): ρ 1.2 kg/m³ × cp 1005 J/(kg·K)
+AIR_HEAT_CAPACITY = 1206
+
+
 def normalize_mode(raw) -> int:
     """Convert M8 internal mode (17/18/19) to cloud mode (1/2/3)."""
     try:
@@ -2,15 +2,18 @@
 from __future__ import annotations
 
 import asyncio
+import contextvars
 import json
 import logging
 import time
+from contextlib import asynccontextmanager, contextmanager
 from datetime import timedelta
 from typing import Any
 
 import aiohttp
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from .const import (
@@ -30,28 +33,64 @@ from .const import (
     DEVICE_MODEL_BATH_HEATER,
     DEVICE_MODEL_M8E_SENSOR,
     HEADERS,
+    CONF_HEARTBEAT,
+    DEFAULT_HEARTBEAT,
+    CONF_CLOUD_RATE,
+    CONF_CLOUD_CONCURRENCY,
+    CONF_RATED_AIRFLOW,
+    PUBLISH_DEADBANDS,
+    deadband_option,
     normalize_mode,
     get_api_urls,
     is_m8e_platform,
 )
+from .analytics import HRVAnalytics
+from .models import DeviceSnapshot, snapshot_from_dict
+from .auth import AccountTokenManager, get_token_manager, release_token_manager
+from .health import BACKEND_ADDON, BACKEND_CLOUD, BackendRouter
+from .stats import CoordinatorStats
+from .scheduler import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_RATE,
+    LANE_BACKGROUND,
+    LANE_CONFIRM,
+    LANE_CONTROL,
+    Superseded,
+    current_lane,
+    get_scheduler,
+    in_lane,
+    release_scheduler,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
-# Minimum seconds between re-login attempts (prevent login war with APP)
-_RELOGIN_COOLDOWN = 120
+# Last snapshot persisted per entry, restored at startup so entities come up
+# with their last known state while login and the first refresh run in the
+# background. Older snapshots are ignored (normal blocking first refresh).
+SNAPSHOT_STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 60
+SNAPSHOT_MAX_AGE = 24 * 3600
+
+
+# App-API reads that can wait behind polls
+_BACKGROUND_KEYS = frozenset({"filter_alarm", "device_list"})
+
+# Backend of the routed attempt in progress (see _on_backend). A context
+# variable, not coordinator state: a poll and a command of one entry run
+# concurrently and each must keep its own backend.
+_attempt_backend: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "lifegear_hrv_backend", default=None
+)
+
 
-# Process-wide lock per account. The cloud issues single-session AuthCodes:
-# a new code invalidates every previously-issued code for the user. Two
-# coordinators on the same account must not re-login concurrently or they
-# will wipe each other's auth_code mid-request. The lock is keyed by the
-# account id and shared across every coordinator instance.
-_relogin_locks: dict[str, asyncio.Lock] = {}
+def snapshot_store(hass: HomeAssistant, entry_id: str) -> Store:
+    """Store holding an entry's last snapshot."""
+    return Store(hass, SNAPSHOT_STORAGE_VERSION, f"{DOMAIN}.snapshot.{entry_id}")
 
 
-def _get_relogin_lock(account: str) -> asyncio.Lock:
-    if account not in _relogin_locks:
-        _relogin_locks[account] = asyncio.Lock()
-    return _relogin_locks[account]
+def _or(value: int | None, default: int) -> int:
+    """Snapshot field, or `default` when it is None (0 is kept)."""
+    return default if value is None else value
 
 
 class LifegearHRVCoordinator(DataUpdateCoordinator):
@@ -65,25 +104,72 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
         self._local_mode = entry.data.get(CONF_LOGIN_METHOD) == LOGIN_METHOD_LOCAL
         self._local_server = entry.data.get(CONF_LOCAL_SERVER, "").strip().rstrip("/")
         self._model = entry.data.get(CONF_DEVICE_MODEL, DEVICE_MODEL_M8)
-        self._api_urls = get_api_urls(self._model)
-
-        # Cloud-mode fields
-        self.user_id = entry.data.get(CONF_USER_ID, "")
-        self.auth_code = entry.data.get(CONF_AUTH_CODE, "")
+        # Cloud-mode entries with an add-on URL can read/write the add-on's
+        # local copy of the app API as well as the remote cloud; the router
+        # picks one per call from their health (see health.py).
+        self._cloud_urls = get_api_urls(self._model)
+        self._addon_urls = None
+        if not self._local_mode and self._local_server and is_m8e_platform(self._model):
+            self._addon_urls = get_api_urls(self._model, local_base=self._local_server)
+
+        # Cloud-mode fields (manual entries; credential entries read the
+        # account's token manager)
+        self._user_id = entry.data.get(CONF_USER_ID, "")
+        self._auth_code = entry.data.get(CONF_AUTH_CODE, "")
         self._relogin_attempted = False
+        # Start of the current poll / command, so a refresh can tell whether
+        # the code it would replace is the one that just failed
+        self._attempt_started = 0.0
 
         # AuthCode management (works for both credentials and local+credentials modes)
         self._has_cloud_creds = bool(
             entry.data.get(CONF_ACCOUNT) and entry.data.get(CONF_PASSWORD)
         )
-        # For credentials mode, auth_code from config is already valid
-        self._auth_valid = bool(self.auth_code) and not self._local_mode
-        self._last_relogin_time: float = 0
+        self._tokens: AccountTokenManager | None = None
+        if self._has_cloud_creds:
+            self._tokens = get_token_manager(hass, str(entry.data[CONF_ACCOUNT]), self._model)
+            self._tokens.attach(entry)
+            entry.async_on_unload(
+                lambda: release_token_manager(hass, self._tokens, entry.entry_id)
+            )
+
+        # Backends: the add-on (REST API in local mode, /AppV2 otherwise)
+        # and, when it can be authenticated, the cloud
+        backends = []
+        if self._local_mode or self._addon_urls:
+            backends.append(BACKEND_ADDON)
+        if not self._local_mode or self._has_cloud_creds:
+            backends.append(BACKEND_CLOUD)
+        self.router = BackendRouter(backends, preferred=BACKEND_ADDON)
+        self._notified_route = self.router.route
+        # Per-endpoint timing and error counters (diagnostics)
+        self.stats = CoordinatorStats()
+        # Heat-recovery metrics from the duct temperatures (M8-E HRV); the
+        # energy total is carried across restarts by its sensor's state
+        self.analytics = HRVAnalytics()
+        # Persisted snapshot; `restored_at` is the save time of a restored
+        # snapshot until the first live refresh replaces it
+        self._store = snapshot_store(hass, entry.entry_id)
+        self.restored_at: float | None = None
+        # Cloud calls of every entry on the account share one scheduler
+        account = str(entry.data.get(CONF_ACCOUNT) or self._user_id or entry.entry_id)
+        self.scheduler = get_scheduler(hass, account)
+        self._set_cloud_limits()
+        entry.async_on_unload(lambda: release_scheduler(hass, account, entry.entry_id))
+        # Poll in progress (see _async_update_data) and its lane
+        self._poll: asyncio.Future | None = None
+        self._poll_lane = 0
 
         # Local mode polls more frequently (device pushes ~every 3 s)
         # Cloud mode: 60s to reduce server load (3 devices stagger naturally)
         interval = timedelta(seconds=5) if self._local_mode else timedelta(seconds=60)
         self._poll_count = 0
+        # Field-level change tracking: snapshot attributes that differ between
+        # the previous and the new refresh, consumed by async_update_listeners.
+        # None means "notify every entity" (first refresh, after a command).
+        self._changed_keys: set[str] | None = None
+        self._notified_success = True
+        self._notify_all = False
         super().__init__(
             hass,
             _LOGGER,
@@ -91,151 +177,175 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
             update_interval=interval,
         )
 
-    async def _async_relogin(self) -> bool:
-        """Re-login to get a new AuthCode (credentials or local+credentials)."""
-        account = self.entry.data.get(CONF_ACCOUNT)
-        password = self.entry.data.get(CONF_PASSWORD)
-        if not account or not password:
-            return False
+    def publish_policy(self, key: str) -> tuple[float, float]:
+        """Return (deadband, heartbeat seconds) for a sensor kind.
 
-        lock = _get_relogin_lock(str(account))
-        async with lock:
-            # After acquiring the lock, check whether a sibling coordinator
-            # just finished re-logging in on the same account and already
-            # propagated a fresh AuthCode to our entry data. If so, adopt
-            # it instead of hitting the cloud again (which would invalidate
-            # the sibling's in-flight request).
-            stored_auth = self.entry.data.get(CONF_AUTH_CODE)
-            if (
-                stored_auth
-                and stored_auth != self.auth_code
-            ):
-                _LOGGER.info(
-                    "AuthCode was refreshed by a sibling entry; adopting"
-                )
-                self.auth_code = stored_auth
-                self.user_id = self.entry.data.get(CONF_USER_ID, self.user_id)
-                self._auth_valid = True
-                self._last_relogin_time = time.monotonic()
-                self._relogin_attempted = False
-                return True
+        Read from entry.options on every call, so options-flow changes apply
+        on the next update without reloading the entry.
+        """
+        options = self.entry.options
+        deadband = float(options.get(deadband_option(key), PUBLISH_DEADBANDS.get(key, 0)))
+        heartbeat = float(options.get(CONF_HEARTBEAT, DEFAULT_HEARTBEAT)) * 60
+        return deadband, heartbeat
 
-            # Cooldown to prevent login war with APP
-            now = time.monotonic()
-            if now - self._last_relogin_time < _RELOGIN_COOLDOWN:
-                _LOGGER.debug("Re-login cooldown active, skipping")
-                return False
+    @property
+    def _backend(self) -> str:
+        """Backend serving the current call.
 
-            return await self._do_relogin(account, password, now)
+        The one set by _on_backend for this task's attempt; outside routed
+        attempts (filter writes, probes) the current route.
+        """
+        return _attempt_backend.get() or self.router.route
 
-    async def _do_relogin(
-        self, account: str, password: str, now: float
-    ) -> bool:
-        """Perform the actual cloud re-login. Must be called with the
-        account lock held."""
-        _LOGGER.info("Attempting to re-login to refresh AuthCode")
-        self._last_relogin_time = now
+    @contextmanager
+    def _on_backend(self, name: str):
+        """Run one routed attempt on backend `name`."""
+        token = _attempt_backend.set(name)
         try:
-            from .crypto import async_login
-            async with aiohttp.ClientSession() as session:
-                result = await async_login(session, account, password, model=self._model)
+            yield
+        finally:
+            _attempt_backend.reset(token)
+
+    @property
+    def _api_urls(self) -> dict:
+        """App API URLs of the backend serving the current call."""
+        if self._backend == BACKEND_ADDON and self._addon_urls:
+            return self._addon_urls
+        return self._cloud_urls
+
+    def _track(self, key: str):
+        """Time an API call to `key` on the current backend (see stats.py)."""
+        return self.stats.track(self._backend, key)
+
+    def _set_cloud_limits(self) -> None:
+        """Register this entry's cloud request limits (options apply live)."""
+        options = self.entry.options
+        self.scheduler.set_limits(
+            self.entry.entry_id,
+            float(options.get(CONF_CLOUD_RATE, DEFAULT_RATE)),
+            int(options.get(CONF_CLOUD_CONCURRENCY, DEFAULT_CONCURRENCY)),
+        )
 
-            new_data = {
-                **self.entry.data,
-                CONF_USER_ID: result["u_id"],
-                CONF_AUTH_CODE: result["auth_code"],
-            }
-            # Also grab device_id/mac if we didn't have them
-            if not self.device_id and result.get(CONF_DEVICE_ID):
-                new_data[CONF_DEVICE_ID] = result[CONF_DEVICE_ID]
-                self.device_id = result[CONF_DEVICE_ID]
-            if not self.mac and result.get(CONF_MAC):
-                new_data[CONF_MAC] = result[CONF_MAC]
-                self.mac = result[CONF_MAC]
-
-            self.hass.config_entries.async_update_entry(self.entry, data=new_data)
-            self.user_id = result["u_id"]
-            self.auth_code = result["auth_code"]
-            self._auth_valid = True
-
-            # Propagate the new AuthCode to sibling entries with the same
-            # account. The cloud issues single-session AuthCodes: a new one
-            # invalidates every previously-issued code for the user. Without
-            # this sync two entries on the same account would ping-pong
-            # relogins forever, causing flapping entities.
-            self._propagate_auth_code(result["u_id"], result["auth_code"], now)
-
-            _LOGGER.info("Re-login successful, AuthCode refreshed")
-            return True
-        except Exception as err:
-            _LOGGER.error("Re-login failed: %s", err)
-            self._auth_valid = False
-            return False
+    @asynccontextmanager
+    async def _call(self, key: str):
+        """Time an API call to `key`, waiting for a scheduler slot if it goes to the cloud."""
+        if key not in self._cloud_urls or self._api_urls.get(key) != self._cloud_urls[key]:
+            with self._track(key):
+                yield
+            return
+        self._set_cloud_limits()
+        lane = LANE_BACKGROUND if key in _BACKGROUND_KEYS else None
+        async with self.scheduler.slot(lane, key=f"{self.entry.entry_id}/{key}"):
+            with self._track(key):
+                yield
+
+    def _reject(self, key: str, reason: str) -> None:
+        """Count a response from `key` that carried no usable data."""
+        _LOGGER.debug("%s via %s rejected: %s", key, self._backend, reason)
+        self.stats.reject(self._backend, key, reason)
+
+    @property
+    def model(self) -> str:
+        """Device model of the entry (DEVICE_MODEL_*)."""
+        return self._model
+
+    @property
+    def user_id(self) -> str:
+        """Cloud u_id."""
+        return self._tokens.user_id if self._tokens else self._user_id
+
+    @property
+    def auth_code(self) -> str:
+        """Current AuthCode."""
+        return self._tokens.auth_code if self._tokens else self._auth_code
+
+    @property
+    def has_cloud_creds(self) -> bool:
+        """Whether the entry has an account and password to log in with."""
+        return self._has_cloud_creds
+
+    def auth_diagnostics(self) -> dict | None:
+        """The account's login, cooldown and probe counters (None without a login)."""
+        return self._tokens.diagnostics() if self._tokens else None
+
+    @property
+    def _auth_valid(self) -> bool:
+        """Whether the AuthCode is believed to be accepted by the cloud."""
+        if self._tokens:
+            return self._tokens.valid
+        return bool(self._auth_code) and not self._local_mode
 
-    def _propagate_auth_code(
-        self, user_id: str, auth_code: str, relogin_time: float
-    ) -> None:
-        """Push freshly minted AuthCode to sibling config entries on the same
-        account, and bump their re-login cooldown so they won't race back.
-        """
-        for sibling in self.hass.config_entries.async_entries(DOMAIN):
-            if sibling.entry_id == self.entry.entry_id:
-                continue
-            if sibling.data.get(CONF_USER_ID) != user_id:
-                continue
-            # Only sync entries that actually use cloud credentials.
-            # Manual / local-only entries stay untouched.
-            if not (
-                sibling.data.get(CONF_ACCOUNT)
-                and sibling.data.get(CONF_PASSWORD)
-            ):
-                continue
-            if sibling.data.get(CONF_AUTH_CODE) == auth_code:
-                continue
-            self.hass.config_entries.async_update_entry(
-                sibling,
-                data={**sibling.data, CONF_AUTH_CODE: auth_code},
-            )
-            sibling_coord = self.hass.data.get(DOMAIN, {}).get(sibling.entry_id)
-            if sibling_coord is not None:
-                sibling_coord.auth_code = auth_code
-                sibling_coord._auth_valid = True
-                sibling_coord._relogin_attempted = False
-                # Share the cooldown window so the sibling does not also
-                # try to re-login on its next update and invalidate us.
-                sibling_coord._last_relogin_time = relogin_time
-            _LOGGER.info(
-                "Propagated new AuthCode to sibling entry %s (%s)",
-                sibling.entry_id, sibling.title,
-            )
+    async def _async_relogin(self) -> bool:
+        """Get a fresh AuthCode after the current attempt was rejected."""
+        if not self._tokens:
+            return False
+        self.stats.relogins += 1
+        ok = await self._tokens.async_refresh(issued_before=self._attempt_started)
+        if not ok:
+            self.stats.relogin_failures += 1
+        return ok
 
     async def async_cloud_login(self) -> None:
-        """Initial cloud login to obtain AuthCode (called once at startup)."""
-        if not self._has_cloud_creds:
+        """Make sure the account has a usable AuthCode (called once at startup).
+
+        Reuses a code a sibling entry or the config flow obtained moments ago,
+        or the stored code if the cloud still accepts it; logs in otherwise.
+        """
+        if not self._tokens:
             return
-        if await self._async_relogin():
-            _LOGGER.info("Initial cloud login successful (u_id=%s)", self.user_id)
+        if await self._tokens.async_ensure_valid():
+            _LOGGER.info("Cloud AuthCode ready (u_id=%s)", self.user_id)
         else:
             _LOGGER.warning("Initial cloud login failed — mode control via cloud will be unavailable")
 
+    async def async_restore_snapshot(self) -> bool:
+        """Use the last persisted snapshot as data, if recent enough."""
+        try:
+            stored = await self._store.async_load()
+        except Exception as err:
+            _LOGGER.debug("Snapshot restore failed: %s", err)
+            return False
+        if not stored or stored.get("model") != self._model:
+            return False
+        age = time.time() - stored.get("saved_at", 0)
+        if age > SNAPSHOT_MAX_AGE:
+            return False
+        self.data = snapshot_from_dict(self._model, stored.get("data") or {})
+        self.restored_at = stored["saved_at"]
+        _LOGGER.info("Restored last state of %s from %.0f min ago", self.mac or self.device_id, age / 60)
+        return True
+
+    async def async_background_start(self) -> None:
+        """Login and first refresh after a restored start."""
+        await self.async_cloud_login()
+        await self.async_refresh()
+
+    def _data_to_store(self) -> dict:
+        """Payload for the snapshot store."""
+        return {
+            "saved_at": time.time(),
+            "model": self._model,
+            "data": self.data.as_dict() if self.data else {},
+        }
+
     async def async_manual_relogin(self) -> bool:
         """Manual re-login triggered by user (bypasses cooldown)."""
-        if not self._has_cloud_creds:
+        if not self._tokens:
             _LOGGER.warning("No cloud credentials configured")
             return False
-        self._last_relogin_time = 0  # bypass cooldown
-        return await self._async_relogin()
+        return await self._tokens.async_refresh(force=True)
 
     async def _async_update_local(self) -> dict[str, Any]:
         """Fetch data from local server REST API."""
         url = f"{self._local_server}/api/status"
         try:
             async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    url,
-                    timeout=aiohttp.ClientTimeout(total=5),
-                ) as response:
-                    raw = await response.json()
+                with self._track("local_status"):
+                    async with session.get(
+                        url,
+                        timeout=aiohttp.ClientTimeout(total=5),
+                    ) as response:
+                        raw = await response.json()
 
             sensor = raw.get("sensor", {})
             state  = raw.get("state",  {})
@@ -324,6 +434,7 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
         # Both M8 and M8-E getHomeDeviceDetail return device directly
         return entry if entry.get("mdid") or entry.get("success") is True else None
 
+    @in_lane(LANE_CONTROL)
     async def async_filter_reset(self, filter_type: int) -> bool:
         """Reset filter usage counter. FilterType: 1=Primary, 2=High."""
         if "filter_reset" not in self._api_urls:
@@ -334,12 +445,13 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
         )
         try:
             async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self._api_urls["filter_reset"], data=payload, headers=HEADERS,
-                    timeout=aiohttp.ClientTimeout(total=10),
-                ) as response:
-                    text = await response.text()
-                    _LOGGER.debug("Filter reset response: %s", text)
+                async with self._call("filter_reset"):
+                    async with session.post(
+                        self._api_urls["filter_reset"], data=payload, headers=HEADERS,
+                        timeout=aiohttp.ClientTimeout(total=10),
+                    ) as response:
+                        text = await response.text()
+                        _LOGGER.debug("Filter reset response: %s", text)
             await asyncio.sleep(1.0)
             await self.async_request_refresh()
             return True
@@ -347,6 +459,7 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
             _LOGGER.error("Filter reset failed: %s", err)
             return False
 
+    @in_lane(LANE_CONTROL)
     async def async_filter_set_alarm_time(self, filter_type: int, alarm_time: int) -> bool:
         """Set filter alarm time. FilterType: 1=Primary, 2=High."""
         if "filter_edit" not in self._api_urls:
@@ -358,12 +471,13 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
         )
         try:
             async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self._api_urls["filter_edit"], data=payload, headers=HEADERS,
-                    timeout=aiohttp.ClientTimeout(total=10),
-                ) as response:
-                    text = await response.text()
-                    _LOGGER.debug("Filter alarm edit response: %s", text)
+                async with self._call("filter_edit"):
+                    async with session.post(
+                        self._api_urls["filter_edit"], data=payload, headers=HEADERS,
+                        timeout=aiohttp.ClientTimeout(total=10),
+                    ) as response:
+                        text = await response.text()
+                        _LOGGER.debug("Filter alarm edit response: %s", text)
             await asyncio.sleep(1.0)
             await self.async_request_refresh()
             return True
@@ -406,7 +520,7 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
                 deduped.append(url)
         return deduped
 
-    async def _async_resolve_addon_base_url(
+    async def async_resolve_addon_base_url(
         self, session: aiohttp.ClientSession
     ) -> str | None:
         """Probe the candidate list and cache the first URL that responds."""
@@ -431,7 +545,7 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
     async def _async_fetch_addon_duct_temps(
         self, session: aiohttp.ClientSession, result: dict
     ) -> None:
-        """Fetch HRV duct temperatures (TempOA/SA/RA) from local m8_local_server addon.
+        """Fetch HRV duct temperatures (TempOA/SA/RA/EX) from local m8_local_server addon.
 
         The M8-E HRV ESP only pushes duct temperatures via PostAirIndex. These
         are captured by the addon MitM and exposed at /api/sensor/by_mac.
@@ -439,21 +553,24 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
           1. The addon is running and reachable
           2. The UDM DNAT rule is routing HRV traffic through the addon
         Falls through silently otherwise — duct-temp entities become unavailable.
-        Computes heat-recovery efficiency from the three temps.
+        The temps are fed to the MAC's HRVAnalytics, which adds smoothed
+        supply/exhaust efficiency and recovered power/energy to `result`.
         """
         if not self.mac:
             return
-        base = await self._async_resolve_addon_base_url(session)
+        base = await self.async_resolve_addon_base_url(session)
         if not base:
             return
         url = f"{base}/api/sensor/by_mac"
         try:
-            async with session.get(
-                url, timeout=aiohttp.ClientTimeout(total=3)
-            ) as response:
-                if response.status != 200:
-                    return
-                data = await response.json()
+            with self.stats.track(BACKEND_ADDON, "duct_temps"):
+                async with session.get(
+                    url, timeout=aiohttp.ClientTimeout(total=3)
+                ) as response:
+                    if response.status != 200:
+                        self.stats.reject(BACKEND_ADDON, "duct_temps", f"HTTP {response.status}")
+                        return
+                    data = await response.json()
         except Exception as err:
             _LOGGER.debug("Addon duct-temp fetch failed: %s", err)
             return
@@ -469,24 +586,27 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
         oa = _to_float(slot.get("temp_oa"))
         sa = _to_float(slot.get("temp_sa"))
         ra = _to_float(slot.get("temp_ra"))
+        ex = _to_float(slot.get("temp_ex"))
         result["md_temp_oa"] = oa
         result["md_temp_sa"] = sa
         result["md_temp_ra"] = ra
+        result["md_temp_ex"] = ex
         # Note: PostAirIndex also has a top-level `Temp` field, but
         # 24-hour comparison confirmed it is byte-for-byte identical to
         # TempRA — a firmware alias, not an independent sensor. Don't
         # expose it as its own entity (would be a duplicate).
 
-        # Heat recovery efficiency: (SA - OA) / (RA - OA) × 100
-        # Only meaningful when there's a meaningful temperature gradient.
-        if oa is not None and sa is not None and ra is not None:
-            gradient = ra - oa
-            if abs(gradient) >= 0.5:
-                result["md_hrv_efficiency"] = round((sa - oa) / gradient * 100, 1)
-            else:
-                result["md_hrv_efficiency"] = None
-        else:
-            result["md_hrv_efficiency"] = None
+        # Supply efficiency (SA - OA) / (RA - OA), exhaust efficiency
+        # (RA - EX) / (RA - OA), recovered power and energy.
+        try:
+            speed = int(result.get("md_speed") or 0)
+        except (TypeError, ValueError):
+            speed = 0
+        result.update(self.analytics.update(
+            time.monotonic(), oa, sa, ra, ex, speed,
+            powered=bool(result.get("md_ispower")),
+            rated_airflow=float(self.entry.options.get(CONF_RATED_AIRFLOW, 0)),
+        ))
 
     async def _async_fetch_filter_alarm(self, session: aiohttp.ClientSession, result: dict) -> None:
         """Fetch filter alarm data and merge into result dict. Only every 10th poll (~10 min)."""
@@ -496,29 +616,30 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
         if self._poll_count % 30 != 1:
             # Carry over previous filter data
             if self.data:
+                previous = self.data.as_dict()
                 for key in ("filter_high_used", "filter_high_alarm", "filter_high_reset",
                             "filter_primary_used", "filter_primary_alarm", "filter_primary_reset"):
-                    if key in self.data:
-                        result[key] = self.data[key]
+                    result[key] = previous[key]
             return
         auth_payload = f"u_id={self.user_id}&Mac={self.mac}&AuthCode={self.auth_code}"
         try:
-            async with session.post(
-                self._api_urls["filter_alarm"],
-                data=auth_payload,
-                headers=HEADERS,
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as response:
-                text = await response.text()
-                data = json.loads(text)
-                if data and data[0].get("success"):
-                    filt = data[0].get("result", [{}])[0]
-                    result["filter_high_used"] = filt.get("HighUsedTime")
-                    result["filter_high_alarm"] = filt.get("HighAlarmTime")
-                    result["filter_high_reset"] = filt.get("HighResetTime")
-                    result["filter_primary_used"] = filt.get("PrimaryUsedTime")
-                    result["filter_primary_alarm"] = filt.get("PrimaryAlarmTime")
-                    result["filter_primary_reset"] = filt.get("PrimaryResetTime")
+            async with self._call("filter_alarm"):
+                async with session.post(
+                    self._api_urls["filter_alarm"],
+                    data=auth_payload,
+                    headers=HEADERS,
+                    timeout=aiohttp.ClientTimeout(total=10),
+                ) as response:
+                    text = await response.text()
+                    data = json.loads(text)
+                    if data and data[0].get("success"):
+                        filt = data[0].get("result", [{}])[0]
+                        result["filter_high_used"] = filt.get("HighUsedTime")
+                        result["filter_high_alarm"] = filt.get("HighAlarmTime")
+                        result["filter_high_reset"] = filt.get("HighResetTime")
+                        result["filter_primary_used"] = filt.get("PrimaryUsedTime")
+                        result["filter_primary_alarm"] = filt.get("PrimaryAlarmTime")
+                        result["filter_primary_reset"] = filt.get("PrimaryResetTime")
         except Exception as err:
             _LOGGER.debug("Filter alarm fetch failed: %s", err)
 
@@ -529,48 +650,60 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
 
         async with aiohttp.ClientSession() as session:
             # 1) getDeviceFunction → power, function, speed, countdown
-            async with session.post(
-                self._api_urls["device_function"],
-                data=auth_payload,
-                headers=HEADERS,
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as response:
-                text = await response.text()
-                data = json.loads(text)
-                if data and data[0].get("success"):
-                    dev = data[0].get("result", [{}])[0]
-                    result["md_ispower"] = int(dev.get("IsPower", 0))
-                    # API returned data successfully = device reachable
-                    result["md_isconnect"] = 1
-                    # Parse Function list for selected values
-                    for func_group in dev.get("Function", []):
-                        param = func_group.get("Parameters", "")
-                        for sub in func_group.get("ParametersSub", []):
-                            if param == "Function" and str(sub.get("Selected")) == "1":
-                                result["md_function"] = int(sub["Data"])
-                            elif param == "Speed" and str(sub.get("Selected")) == "1":
-                                result["md_speed"] = str(sub["Data"])
-                            elif param == "CountDown":
-                                if sub.get("FunctionTitle") == "SetCountDown":
-                                    result["md_set_countdown"] = sub.get("Data", "")
-                                elif sub.get("FunctionTitle") == "CountDown":
-                                    result["md_countdown"] = sub.get("Data", "")
+            async with self._call("device_function"):
+                async with session.post(
+                    self._api_urls["device_function"],
+                    data=auth_payload,
+                    headers=HEADERS,
+                    timeout=aiohttp.ClientTimeout(total=10),
+                ) as response:
+                    text = await response.text()
+                    data = json.loads(text)
+                    function_ok = bool(data and data[0].get("success"))
+                    if function_ok:
+                        dev = data[0].get("result", [{}])[0]
+                        result["md_ispower"] = int(dev.get("IsPower", 0))
+                        # API returned data successfully = device reachable
+                        result["md_isconnect"] = 1
+                        # Parse Function list for selected values
+                        for func_group in dev.get("Function", []):
+                            param = func_group.get("Parameters", "")
+                            for sub in func_group.get("ParametersSub", []):
+                                if param == "Function" and str(sub.get("Selected")) == "1":
+                                    result["md_function"] = int(sub["Data"])
+                                elif param == "Speed" and str(sub.get("Selected")) == "1":
+                                    result["md_speed"] = str(sub["Data"])
+                                elif param == "CountDown":
+                                    if sub.get("FunctionTitle") == "SetCountDown":
+                                        result["md_set_countdown"] = sub.get("Data", "")
+                                    elif sub.get("FunctionTitle") == "CountDown":
+                                        result["md_countdown"] = sub.get("Data", "")
+                    else:
+                        self._reject("device_function", "unsuccessful response")
 
             # 2) getDeviceAirIndex → sensor data
-            async with session.post(
-                self._api_urls["air_index"],
-                data=auth_payload,
-                headers=HEADERS,
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as response:
-                text = await response.text()
-                data = json.loads(text)
-                if data and data[0].get("success"):
-                    air = data[0].get("result", [{}])[0]
-                    result["md_co2"] = air.get("co2", "")
-                    result["md_pm25"] = air.get("pm25", "")
-                    result["md_temp"] = air.get("temp", "")
-                    result["md_rh"] = air.get("rh", "")
+            async with self._call("air_index"):
+                async with session.post(
+                    self._api_urls["air_index"],
+                    data=auth_payload,
+                    headers=HEADERS,
+                    timeout=aiohttp.ClientTimeout(total=10),
+                ) as response:
+                    text = await response.text()
+                    data = json.loads(text)
+                    air_ok = bool(data and data[0].get("success"))
+                    if air_ok:
+                        air = data[0].get("result", [{}])[0]
+                        result["md_co2"] = air.get("co2", "")
+                        result["md_pm25"] = air.get("pm25", "")
+                        result["md_temp"] = air.get("temp", "")
+                        result["md_rh"] = air.get("rh", "")
+                    else:
+                        self._reject("air_index", "unsuccessful response")
+            if not function_ok and not air_ok:
+                # Both rejected (e.g. the AuthCode is dead): a failed read,
+                # not an empty one, so the code isn't marked verified
+                raise UpdateFailed("No bath heater data received")
 
             # 3) getDeviceFilterAlarm → filter data
             await self._async_fetch_filter_alarm(session, result)
@@ -588,122 +721,256 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
         async with aiohttp.ClientSession() as session:
             # 1) getDeviceAirIndex → sensor values (always succeeds if
             #    cloud has cached data, even if the device is offline)
-            async with session.post(
-                self._api_urls["air_index"],
-                data=auth_payload,
-                headers=HEADERS,
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as response:
-                text = await response.text()
-                data = json.loads(text)
-                if data and data[0].get("success"):
-                    air = data[0].get("result", [{}])[0]
-                    result["md_co2"] = air.get("co2", "")
-                    result["md_pm25"] = air.get("pm25", "")
-                    result["md_temp"] = air.get("temp", "")
-                    result["md_rh"] = air.get("rh", "")
-                else:
-                    raise UpdateFailed("No sensor data received")
+            async with self._call("air_index"):
+                async with session.post(
+                    self._api_urls["air_index"],
+                    data=auth_payload,
+                    headers=HEADERS,
+                    timeout=aiohttp.ClientTimeout(total=10),
+                ) as response:
+                    text = await response.text()
+            data = json.loads(text)
+            if data and data[0].get("success"):
+                air = data[0].get("result", [{}])[0]
+                result["md_co2"] = air.get("co2", "")
+                result["md_pm25"] = air.get("pm25", "")
+                result["md_temp"] = air.get("temp", "")
+                result["md_rh"] = air.get("rh", "")
+            else:
+                self._reject("air_index", "no sensor data")
+                raise UpdateFailed("No sensor data received")
 
             # 2) getDeviceList → real isOnLine status for this MAC.
             #    getDeviceAirIndex doesn't carry isOnLine, so without
             #    this step the sensor always shows "connected" as long
             #    as the cloud has any cached data.
             try:
-                async with session.post(
-                    self._api_urls["device_list"],
-                    data=list_payload,
-                    headers=HEADERS,
-                    timeout=aiohttp.ClientTimeout(total=10),
-                ) as response:
-                    text = await response.text()
-                    data = json.loads(text)
-                    if data and data[0].get("success"):
-                        for dev in data[0].get("result", []):
-                            if dev.get("Mac") == self.mac:
-                                result["md_isconnect"] = int(
-                                    dev.get("isOnLine", 0)
-                                )
-                                break
+                async with self._call("device_list"):
+                    async with session.post(
+                        self._api_urls["device_list"],
+                        data=list_payload,
+                        headers=HEADERS,
+                        timeout=aiohttp.ClientTimeout(total=10),
+                    ) as response:
+                        text = await response.text()
+                        data = json.loads(text)
+                        if data and data[0].get("success"):
+                            for dev in data[0].get("result", []):
+                                if dev.get("Mac") == self.mac:
+                                    result["md_isconnect"] = int(
+                                        dev.get("isOnLine", 0)
+                                    )
+                                    break
+                            else:
+                                result["md_isconnect"] = 0
                         else:
-                            result["md_isconnect"] = 0
-                    else:
-                        result["md_isconnect"] = 1  # fallback
+                            result["md_isconnect"] = 1  # fallback
             except Exception as err:
                 _LOGGER.debug("getDeviceList failed for sensor: %s", err)
                 result["md_isconnect"] = 1  # optimistic fallback
 
         return result
 
-    async def _async_update_data(self) -> dict[str, Any]:
-        """Fetch data from API."""
-        if self._local_mode:
+    async def _async_update_data(self) -> DeviceSnapshot:
+        """Fetch, or join a poll of this entry already queued or running.
+
+        The interval timer and a post-command refresh can overlap; the later
+        one shares the earlier one's result unless it is more urgent (a
+        confirmation must not wait behind a queued background poll).
+        """
+        lane = current_lane.get()
+        if self._poll is not None and not self._poll.done() and self._poll_lane <= lane:
+            snapshot = await asyncio.shield(self._poll)
+            # The first caller already notified the entities
+            self._changed_keys = set()
+            return snapshot
+        self._poll = poll = asyncio.ensure_future(self._async_poll())
+        self._poll_lane = lane
+        return await poll
+
+    async def _async_poll(self) -> DeviceSnapshot:
+        """Fetch, parse once into a snapshot and record which fields changed."""
+        self._attempt_started = time.monotonic()
+        error: UpdateFailed | None = None
+        candidates = self.router.candidates()
+        for index, backend in enumerate(candidates):
+            started = time.monotonic()
+            try:
+                with self._on_backend(backend.name):
+                    raw = await self._async_fetch_data()
+            except Superseded:
+                # A more urgent poll of this entry started while this one was
+                # queued for the cloud: share its result instead
+                self.router.release(candidates[index:])
+                newer = self._poll
+                if newer is None or newer is asyncio.current_task():
+                    raise UpdateFailed("Poll superseded") from None
+                snapshot = await asyncio.shield(newer)
+                self._changed_keys = set()
+                return snapshot
+            except UpdateFailed as err:
+                backend.record(False, time.monotonic() - started)
+                _LOGGER.debug("Read via %s failed: %s", backend.name, err)
+                error = err
+                continue
+            backend.record(True, time.monotonic() - started)
+            self.router.release(candidates[index + 1:])
+            break
+        else:
+            self.stats.record_update(False, time.monotonic() - self._attempt_started)
+            raise error or UpdateFailed("No backend available")
+        self.stats.record_update(True, time.monotonic() - self._attempt_started)
+        # Any good read re-arms the one re-login a failing read may trigger
+        self._relogin_attempted = False
+        self.router.used(backend)
+        if self._tokens and backend.name == BACKEND_CLOUD:
+            # Every cloud reader raises unless device fields came back, so
+            # a read that got here was accepted with the current code
+            self._tokens.mark_verified()
+
+        snapshot = snapshot_from_dict(self._model, raw)
+        self._changed_keys = snapshot.diff(self.data)
+        if self._changed_keys is not None:
+            # Diagnostic sensors follow every refresh
+            self._changed_keys.add("stats")
+            if self.router.route != self._notified_route:
+                self._changed_keys.add("route")
+        self._notified_route = self.router.route
+        if self.restored_at is not None:
+            # First live data after a restored start: refresh every entity
+            self.restored_at = None
+            self._changed_keys = None
+        self._store.async_delay_save(self._data_to_store, SNAPSHOT_SAVE_DELAY)
+        return snapshot
+
+    async def _async_routed_write(self, send) -> bool:
+        """Run an app-API write on the best backend, failing over once.
+
+        `send` is a zero-argument coroutine function that uses _api_urls.
+        """
+        if not self._auth_valid or not self.auth_code:
+            return False
+        candidates = self.router.candidates()
+        self.router.release(candidates[2:])
+        for index, backend in enumerate(candidates[:2]):
+            started = time.monotonic()
+            with self._on_backend(backend.name):
+                ok = await send()
+            backend.record(ok, time.monotonic() - started)
+            if ok:
+                self.router.used(backend)
+                self.router.release(candidates[index + 1:])
+                return True
+            _LOGGER.debug("Write via %s failed", backend.name)
+        return False
+
+    async def async_request_refresh(self) -> None:
+        """Refresh after a command; the next update goes to every entity.
+
+        Optimistic entities must re-sync even when the device ignored the
+        command and none of their fields changed.
+        """
+        self._notify_all = True
+        token = current_lane.set(min(LANE_CONFIRM, current_lane.get()))
+        try:
+            await super().async_request_refresh()
+        finally:
+            current_lane.reset(token)
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Notify only the entities whose source fields changed.
+
+        Entities pass their snapshot attributes as the CoordinatorEntity context; an
+        entity without a context is always notified. Availability flips and
+        the first refresh go to everyone.
+        """
+        changed = self._changed_keys
+        self._changed_keys = None
+        if (
+            changed is None
+            or self._notify_all
+            or self.last_update_success != self._notified_success
+        ):
+            self._notify_all = False
+            self._notified_success = self.last_update_success
+            super().async_update_listeners()
+            return
+        if not changed:
+            return
+        for update_callback, context in list(self._listeners.values()):
+            if context is None or not changed.isdisjoint(context):
+                update_callback()
+
+    async def _async_fetch_data(self) -> dict[str, Any]:
+        """Fetch data from the backend of the current attempt (see _on_backend)."""
+        if self._local_mode and self._backend == BACKEND_ADDON:
             return await self._async_update_local()
 
         if self._model == DEVICE_MODEL_BATH_HEATER:
             try:
-                return await self._async_update_bath_heater()
+                result = await self._async_update_bath_heater()
             except Exception as err:
                 if not self._relogin_attempted and self._has_cloud_creds:
                     self._relogin_attempted = True
                     if await self._async_relogin():
-                        return await self._async_update_bath_heater()
+                        result = await self._async_update_bath_heater()
+                        self._relogin_attempted = False
+                        return result
                 raise UpdateFailed(f"Bath heater update error: {err}")
+            self._relogin_attempted = False
+            return result
 
         if self._model == DEVICE_MODEL_M8E_SENSOR:
             try:
-                return await self._async_update_m8e_sensor()
+                result = await self._async_update_m8e_sensor()
             except Exception as err:
                 if not self._relogin_attempted and self._has_cloud_creds:
                     self._relogin_attempted = True
                     if await self._async_relogin():
-                        return await self._async_update_m8e_sensor()
+                        result = await self._async_update_m8e_sensor()
+                        self._relogin_attempted = False
+                        return result
                 raise UpdateFailed(f"M8-E sensor update error: {err}")
+            self._relogin_attempted = False
+            return result
 
         try:
             async with aiohttp.ClientSession() as session:
-                payload = self._build_status_payload()
-                async with session.post(
-                    self._api_urls["status"],
-                    data=payload,
-                    headers=HEADERS,
-                    timeout=aiohttp.ClientTimeout(total=10),
-                ) as response:
-                    text = await response.text()
-                    data = json.loads(text)
-                    device = self._extract_device(data)
-                    if device and device.get("mdid"):
-                        self._relogin_attempted = False
-                        result = self._normalize_device_data(device)
-                        await self._async_fetch_filter_alarm(session, result)
-                        await self._async_fetch_addon_duct_temps(session, result)
-                        return result
-                    # Auth failure or no device - try relogin
-                    if not self._relogin_attempted and self._has_cloud_creds:
-                        self._relogin_attempted = True
-                        if await self._async_relogin():
-                            payload2 = self._build_status_payload()
-                            async with session.post(
-                                self._api_urls["status"],
-                                data=payload2,
-                                headers=HEADERS,
-                                timeout=aiohttp.ClientTimeout(total=10),
-                            ) as response2:
-                                text2 = await response2.text()
-                                data2 = json.loads(text2)
-                                device2 = self._extract_device(data2)
-                                if device2 and device2.get("mdid"):
-                                    self._relogin_attempted = False
-                                    result2 = self._normalize_device_data(device2)
-                                    await self._async_fetch_filter_alarm(session, result2)
-                                    await self._async_fetch_addon_duct_temps(session, result2)
-                                    return result2
+                device = await self._async_fetch_status(session)
+                # Auth failure or no device - try relogin
+                if not device and not self._relogin_attempted and self._has_cloud_creds:
+                    self._relogin_attempted = True
+                    if await self._async_relogin():
+                        device = await self._async_fetch_status(session)
+                if not device:
                     raise UpdateFailed("No data received")
+                self._relogin_attempted = False
+                result = self._normalize_device_data(device)
+                await self._async_fetch_filter_alarm(session, result)
+                await self._async_fetch_addon_duct_temps(session, result)
+                return result
         except UpdateFailed:
             raise
         except Exception as err:
             raise UpdateFailed(f"Error communicating with API: {err}")
 
+    async def _async_fetch_status(self, session: aiohttp.ClientSession) -> dict | None:
+        """POST the status endpoint; the device record, or None if rejected."""
+        async with self._call("status"):
+            async with session.post(
+                self._api_urls["status"],
+                data=self._build_status_payload(),
+                headers=HEADERS,
+                timeout=aiohttp.ClientTimeout(total=10),
+            ) as response:
+                text = await response.text()
+        device = self._extract_device(json.loads(text))
+        if device and device.get("mdid"):
+            return device
+        self._reject("status", "no device in response")
+        return None
+
     async def _async_cloud_set_control(
         self,
         target_power: int,
@@ -739,24 +1006,26 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
                     )
 
                 # Double-send control
-                async with session.post(
-                    self._api_urls["control"], data=control_payload, headers=HEADERS,
-                    timeout=aiohttp.ClientTimeout(total=10),
-                ) as response:
-                    text = await response.text()
-                    _LOGGER.debug("Cloud control response (1st): %s", text)
+                async with self._call("control"):
+                    async with session.post(
+                        self._api_urls["control"], data=control_payload, headers=HEADERS,
+                        timeout=aiohttp.ClientTimeout(total=10),
+                    ) as response:
+                        text = await response.text()
+                        _LOGGER.debug("Cloud control response (1st): %s", text)
                 await asyncio.sleep(0.2)
-                async with session.post(
-                    self._api_urls["control"], data=control_payload, headers=HEADERS,
-                    timeout=aiohttp.ClientTimeout(total=10),
-                ) as response:
-                    text = await response.text()
-                    _LOGGER.debug("Cloud control response (2nd): %s", text)
+                async with self._call("control"):
+                    async with session.post(
+                        self._api_urls["control"], data=control_payload, headers=HEADERS,
+                        timeout=aiohttp.ClientTimeout(total=10),
+                    ) as response:
+                        text = await response.text()
+                        _LOGGER.debug("Cloud control response (2nd): %s", text)
 
                 # M8-E: send power after mode/speed
                 if self._model == DEVICE_MODEL_M8E and "power" in self._api_urls:
                     # Auto power on if device is off and user changed mode/speed
-                    current_power = int((self.data or {}).get("md_ispower", 0))
+                    current_power = self.data.ispower if self.data else 0
                     need_power = power_changed or (not current_power and (speed_changed or not power_changed))
                     if need_power:
                         await asyncio.sleep(0.3)
@@ -766,12 +1035,13 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
                             f"&AuthCode={self.auth_code}"
                             f"&IsPower={power_val}&ShareMidno="
                         )
-                        async with session.post(
-                            self._api_urls["power"], data=power_payload, headers=HEADERS,
-                            timeout=aiohttp.ClientTimeout(total=10),
-                        ) as response:
-                            text = await response.text()
-                            _LOGGER.debug("Cloud getDevicePower response: %s", text)
+                        async with self._call("power"):
+                            async with session.post(
+                                self._api_urls["power"], data=power_payload, headers=HEADERS,
+                                timeout=aiohttp.ClientTimeout(total=10),
+                            ) as response:
+                                text = await response.text()
+                                _LOGGER.debug("Cloud getDevicePower response: %s", text)
 
                 return True
         except Exception as err:
@@ -788,15 +1058,16 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
         """Control bath heater via getDevicePower + getDeviceFunctionEdit.
 
         App flow: power on → function edit (always, with SetCountDown).
-        Power off: just send power off.
+        Power off: just send power off. Through the add-on both writes are
+        injected locally into the heater's next GetDeviceData poll.
         """
         if not self._auth_valid or not self.auth_code:
             return False
 
-        current_data = self.data or {}
-        target_function = function if function is not None else current_data.get("md_function", 25)
-        target_speed = speed if speed is not None else int(current_data.get("md_speed", 3) or 3)
-        target_countdown = countdown if countdown is not None else int(current_data.get("md_set_countdown", 60) or 60)
+        current = self.data
+        target_function = function if function is not None else _or(current and current.function, 25)
+        target_speed = speed if speed is not None else (current and current.speed) or 3
+        target_countdown = countdown if countdown is not None else (current and current.set_countdown) or 60
         countdown_str = str(target_countdown)
 
         try:
@@ -808,12 +1079,13 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
                         f"&AuthCode={self.auth_code}"
                         f"&IsPower=0&ShareMidno="
                     )
-                    async with session.post(
-                        self._api_urls["power"], data=power_payload, headers=HEADERS,
-                        timeout=aiohttp.ClientTimeout(total=10),
-                    ) as response:
-                        text = await response.text()
-                        _LOGGER.debug("Bath heater power off: %s", text)
+                    async with self._call("power"):
+                        async with session.post(
+                            self._api_urls["power"], data=power_payload, headers=HEADERS,
+                            timeout=aiohttp.ClientTimeout(total=10),
+                        ) as response:
+                            text = await response.text()
+                            _LOGGER.debug("Bath heater power off: %s", text)
                     return True
 
                 # Power on or function/speed change:
@@ -823,14 +1095,18 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
                     f"&AuthCode={self.auth_code}"
                     f"&IsPower=1&ShareMidno="
                 )
-                async with session.post(
-                    self._api_urls["power"], data=power_payload, headers=HEADERS,
-                    timeout=aiohttp.ClientTimeout(total=10),
-                ) as response:
-                    text = await response.text()
-                    _LOGGER.debug("Bath heater power on: %s", text)
+                async with self._call("power"):
+                    async with session.post(
+                        self._api_urls["power"], data=power_payload, headers=HEADERS,
+                        timeout=aiohttp.ClientTimeout(total=10),
+                    ) as response:
+                        text = await response.text()
+                        _LOGGER.debug("Bath heater power on: %s", text)
 
-                await asyncio.sleep(0.3)
+                # The add-on merges both writes into one pending command;
+                # only the cloud needs them spaced out
+                if self._backend != BACKEND_ADDON:
+                    await asyncio.sleep(0.3)
 
                 # 2) Send function edit
                 control_payload = (
@@ -839,18 +1115,20 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
                     f"&u_id={self.user_id}&ShareMidno="
                     f"&Function={target_function}&Mac={self.mac}&Auto=&Mute="
                 )
-                async with session.post(
-                    self._api_urls["control"], data=control_payload, headers=HEADERS,
-                    timeout=aiohttp.ClientTimeout(total=10),
-                ) as response:
-                    text = await response.text()
-                    _LOGGER.debug("Bath heater function edit: %s", text)
+                async with self._call("control"):
+                    async with session.post(
+                        self._api_urls["control"], data=control_payload, headers=HEADERS,
+                        timeout=aiohttp.ClientTimeout(total=10),
+                    ) as response:
+                        text = await response.text()
+                        _LOGGER.debug("Bath heater function edit: %s", text)
 
                 return True
         except Exception as err:
             _LOGGER.warning("Bath heater control failed: %s", err)
             return False
 
+    @in_lane(LANE_CONTROL)
     async def _async_set_control_local(
         self,
         ispower: int | None,
@@ -858,48 +1136,87 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
         speed: int | None,
     ) -> bool:
         """Send command to local add-on REST API + cloud getDeviceMod.asp."""
-        current_data = self.data or {}
+        self._attempt_started = time.monotonic()
+        current = self.data
         cmd = {
-            "ispower": ispower if ispower is not None else int(current_data.get("md_ispower") or 1),
-            "mode":    mode if mode is not None else normalize_mode(current_data.get("md_mode") or 3),
-            "speed":   speed if speed is not None else int(current_data.get("md_speed") or 1),
+            "ispower": ispower if ispower is not None else (current and current.ispower) or 1,
+            "mode":    mode if mode is not None else (current and current.mode) or 3,
+            "speed":   speed if speed is not None else (current and current.speed) or 1,
         }
         cmd["mode"] = normalize_mode(cmd["mode"])
         if cmd["speed"] < 1:
             cmd["speed"] = 1
+        if is_m8e_platform(self._model) and self.mac:
+            # The add-on injects it into this device's polls only (older
+            # add-ons ignore the key and use the shared command)
+            cmd["mac"] = self.mac
+
+        # Both paths are used (the add-on injects speed/power, the cloud is
+        # the reliable way to change mode) unless a backend's circuit is
+        # open; with both open each gets a trial claimed early, unless a
+        # trial is already out.
+        addon = self.router.get(BACKEND_ADDON)
+        cloud = self.router.get(BACKEND_CLOUD)
+        # (allow() claims a half-open circuit's single trial: ask once, and
+        # not for a cloud that cannot be called without a valid AuthCode)
+        addon_allowed = addon.breaker.allow()
+        cloud_allowed = bool(cloud and self._auth_valid and cloud.breaker.allow())
+        if not addon_allowed and not cloud_allowed and not any(
+            b.breaker.trial_in_flight for b in self.router.backends
+        ):
+            addon_allowed = True
+            addon.breaker.force_trial()
+            if cloud and self._auth_valid:
+                cloud_allowed = True
+                cloud.breaker.force_trial()
 
         # 1) Send to local add-on (MitM injection for speed/power)
         addon_ok = False
         url = f"{self._local_server}/api/command"
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url,
-                    json=cmd,
-                    timeout=aiohttp.ClientTimeout(total=5),
-                ) as response:
-                    result = await response.json()
+        if addon_allowed:
+            started = time.monotonic()
+            # A 404 (device not polling the add-on yet) still means it's up
+            reachable = False
+            try:
+                async with aiohttp.ClientSession() as session:
+                    with self.stats.track(BACKEND_ADDON, "local_command"):
+                        async with session.post(
+                            url,
+                            json=cmd,
+                            timeout=aiohttp.ClientTimeout(total=5),
+                        ) as response:
+                            reachable = response.status == 404
+                            result = await response.json()
                     addon_ok = result.get("ok", False)
                     _LOGGER.debug("Local command sent: %s (ok=%s)", cmd, addon_ok)
-        except Exception as err:
-            _LOGGER.error("Local command error: %s", err)
+                    if not addon_ok:
+                        self.stats.reject(BACKEND_ADDON, "local_command", "ok=false")
+            except Exception as err:
+                _LOGGER.error("Local command error: %s", err)
+            addon.record(addon_ok or reachable, time.monotonic() - started)
 
         # 2) Also call cloud API directly (reliable mode control)
         cloud_ok = False
         power_changed = ispower is not None
         speed_changed = speed is not None
-        if self._has_cloud_creds:
-            cloud_ok = await self._async_cloud_set_control(
-                cmd["ispower"], cmd["mode"], cmd["speed"],
-                power_changed=power_changed, speed_changed=speed_changed,
-            )
-            if not cloud_ok and self._auth_valid:
-                _LOGGER.info("Cloud command failed, attempting re-login")
-                if await self._async_relogin():
-                    cloud_ok = await self._async_cloud_set_control(
-                        cmd["ispower"], cmd["mode"], cmd["speed"],
-                        power_changed=power_changed, speed_changed=speed_changed,
-                    )
+        if cloud_allowed and not self._auth_valid:
+            # Signed out while the add-on was called: hand the trial back
+            cloud.breaker.release()
+        elif cloud_allowed:
+            started = time.monotonic()
+            with self._on_backend(BACKEND_CLOUD):
+                cloud_ok = await self._async_cloud_set_control(
+                    cmd["ispower"], cmd["mode"], cmd["speed"],
+                    power_changed=power_changed, speed_changed=speed_changed,
+                )
+                cloud.record(cloud_ok, time.monotonic() - started)
+                if not cloud_ok and self._auth_valid:
+                    _LOGGER.info("Cloud command failed, attempting re-login")
+                    if await self._async_relogin():
+                        cloud_ok = await self._async_cloud_set_control(
+                            cmd["ispower"], cmd["mode"], cmd["speed"],
+                            power_changed=power_changed, speed_changed=speed_changed,
+                        )
             if cloud_ok:
                 _LOGGER.debug("Cloud control ok: mode=%s speed=%s power=%s", cmd["mode"], cmd["speed"], cmd["ispower"])
 
@@ -909,6 +1226,7 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
             return True
         return False
 
+    @in_lane(LANE_CONTROL)
     async def async_set_bath_heater_control(
         self,
         ispower: int | None = None,
@@ -917,11 +1235,15 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
         countdown: int | None = None,
     ) -> bool:
         """Send control command to bath heater with retry."""
+        self._attempt_started = time.monotonic()
         for attempt in range(3):
-            ok = await self._async_bath_heater_set_control(
-                ispower=ispower, function=function, speed=speed, countdown=countdown,
+            ok = await self._async_routed_write(
+                lambda: self._async_bath_heater_set_control(
+                    ispower=ispower, function=function, speed=speed, countdown=countdown,
+                )
             )
             if ok:
+                self._relogin_attempted = False
                 await asyncio.sleep(1.0)
                 await self.async_request_refresh()
                 return True
@@ -931,6 +1253,7 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
             await asyncio.sleep(0.5)
         return False
 
+    @in_lane(LANE_CONTROL)
     async def async_set_control(
         self,
         ispower: int | None = None,
@@ -941,11 +1264,12 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
         """Send control command to device."""
         if self._local_mode:
             return await self._async_set_control_local(ispower, mode, speed)
+        self._attempt_started = time.monotonic()
 
-        current_data = self.data or {}
-        target_power = ispower if ispower is not None else int(current_data.get("md_ispower", 1))
-        target_mode = mode if mode is not None else int(current_data.get("md_mode", 1))
-        target_speed = speed if speed is not None else int(current_data.get("md_speed", 1))
+        current = self.data
+        target_power = ispower if ispower is not None else _or(current and current.ispower, 1)
+        target_mode = mode if mode is not None else _or(current and current.mode, 1)
+        target_speed = speed if speed is not None else _or(current and current.speed, 1)
         if target_speed < 1:
             target_speed = 1
 
@@ -953,9 +1277,11 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
         speed_changed = speed is not None
         for attempt in range(max_retries):
             try:
-                ok = await self._async_cloud_set_control(
-                    target_power, target_mode, target_speed,
-                    power_changed=power_changed, speed_changed=speed_changed,
+                ok = await self._async_routed_write(
+                    lambda: self._async_cloud_set_control(
+                        target_power, target_mode, target_speed,
+                        power_changed=power_changed, speed_changed=speed_changed,
+                    )
                 )
                 if not ok:
                     _LOGGER.warning("Cloud control returned False (attempt %d)", attempt + 1)
@@ -965,10 +1291,10 @@ class LifegearHRVCoordinator(DataUpdateCoordinator):
                 await asyncio.sleep(1.0)
                 await self.async_request_refresh()
 
-                new_data = self.data or {}
-                actual_power = int(new_data.get("md_ispower", -1))
-                actual_mode = int(new_data.get("md_mode", -1))
-                actual_speed = int(new_data.get("md_speed", -1))
+                new = self.data
+                actual_power = _or(new and new.ispower, -1)
+                actual_mode = _or(new and new.mode, -1)
+                actual_speed = _or(new and new.speed, -1)
 
                 power_ok = (ispower is None) or (actual_power == target_power)
                 mode_ok = (mode is None) or (actual_mode == target_mode)
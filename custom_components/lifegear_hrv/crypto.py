@@ -1,10 +1,12 @@
 """AES encryption utilities for Lifegear HRV login."""
 from __future__ import annotations
 
+import asyncio
 import base64
 import json
 import logging
 import random
+import time
 from datetime import datetime
 from urllib.parse import quote
 
@@ -24,6 +26,24 @@ from .const import (
 
 _LOGGER = logging.getLogger(__name__)
 
+# Most recent successful login per (account, M8-E platform?): (u_id,
+# auth_code, monotonic time). Each login mints a single-session AuthCode that
+# invalidates the previous one on that platform's cloud, so entries created
+# from a config flow (or set up right after a sibling logged in) adopt this
+# code instead of logging in again.
+_recent_logins: dict[tuple[str, bool], tuple[str, str, float]] = {}
+
+
+def recent_login(
+    account: str, max_age: float, model: str = DEVICE_MODEL_M8,
+) -> tuple[str, str, float] | None:
+    """Return (u_id, auth_code, time) if `account` logged in to `model`'s
+    platform within `max_age` s."""
+    login = _recent_logins.get((account, is_m8e_platform(model)))
+    if login is None or time.monotonic() - login[2] >= max_age:
+        return None
+    return login
+
 
 def generate_auth_code() -> str:
     """Generate a random 10-digit auth code (digits 1-9)."""
@@ -100,6 +120,8 @@ async def async_login(
             if not login_data.get("success", False):
                 msg = login_data.get("message", "Unknown error")
                 raise ValueError(f"Login failed: {msg}")
+            _recent_logins[(account, is_m8e_platform(model))] = (
+                account, auth_code, time.monotonic())
     except aiohttp.ClientError as err:
         raise ConnectionError(f"Connection error: {err}") from err
     except json.JSONDecodeError as err:
@@ -188,7 +210,45 @@ async def async_get_device_list(
                 raise ValueError(f"Device list failed: {entry.get('message')}")
 
             return entry.get("result", [])
-    except aiohttp.ClientError as err:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as err:
+        raise ConnectionError(f"Connection error: {err}") from err
+    except json.JSONDecodeError as err:
+        raise ConnectionError(f"Invalid response: {err}") from err
+
+
+async def async_probe_auth(
+    session: aiohttp.ClientSession,
+    account: str,
+    auth_code: str,
+    model: str = DEVICE_MODEL_M8,
+) -> bool:
+    """Check whether an AuthCode is still accepted, without logging in.
+
+    Uses the cheapest authenticated call per platform (getDeviceList on M8-E,
+    getHomeDeviceDetail on M8). Returns False when the cloud rejects the
+    code; raises ConnectionError when the cloud can't be reached.
+    """
+    if is_m8e_platform(model):
+        try:
+            await async_get_device_list(session, account, auth_code, model)
+        except ValueError:
+            return False
+        return True
+
+    urls = get_api_urls(model)
+    payload = f"u_id={account}&AuthCode={auth_code}&ShareMidno="
+    try:
+        async with session.post(
+            urls["list"],
+            data=payload,
+            headers=HEADERS,
+            timeout=aiohttp.ClientTimeout(total=10),
+        ) as response:
+            data = json.loads(await response.text())
+    except (aiohttp.ClientError, asyncio.TimeoutError) as err:
         raise ConnectionError(f"Connection error: {err}") from err
     except json.JSONDecodeError as err:
         raise ConnectionError(f"Invalid response: {err}") from err
+    if not isinstance(data, list) or (data and not isinstance(data[0], dict)):
+        raise ConnectionError(f"Invalid response: {str(data)[:80]}")
+    return bool(data) and bool(data[0].get("mdid"))
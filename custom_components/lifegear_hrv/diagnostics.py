@@ -0,0 +1,56 @@
+"""Diagnostics support for Lifegear HRV."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import (
+    DOMAIN,
+    CONF_ACCOUNT,
+    CONF_PASSWORD,
+    CONF_USER_ID,
+    CONF_AUTH_CODE,
+    CONF_MAC,
+    CONF_DEVICE_ID,
+)
+from .coordinator import LifegearHRVCoordinator
+
+TO_REDACT = {
+    CONF_ACCOUNT,
+    CONF_PASSWORD,
+    CONF_USER_ID,
+    CONF_AUTH_CODE,
+    CONF_MAC,
+    CONF_DEVICE_ID,
+    # Snapshot keys
+    "md_mac",
+    "mdid",
+    "_wifi_ssid",
+}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: LifegearHRVCoordinator = hass.data[DOMAIN][entry.entry_id]
+    data = coordinator.data
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "coordinator": {
+            "last_update_success": coordinator.last_update_success,
+            "update_interval_s": coordinator.update_interval.total_seconds()
+            if coordinator.update_interval else None,
+            "data": async_redact_data(data.as_dict(), TO_REDACT) if data else None,
+        },
+        "routing": coordinator.router.diagnostics(),
+        "stats": coordinator.stats.as_dict(),
+        "scheduler": coordinator.scheduler.diagnostics(),
+        "auth": coordinator.auth_diagnostics(),
+    }
@@ -0,0 +1,244 @@
+"""Per-backend health tracking and routing between the add-on and the cloud.
+
+An entry can reach its device through up to two backends: the
+m8_local_server add-on (its REST API in local mode, its /AppV2 copy of the
+app API for cloud entries with an add-on URL) and the Lifegear cloud. Each
+backend keeps a window of recent call outcomes and latencies, and a circuit
+breaker that stops sending to it after repeated failures, retrying with one
+trial call after a back-off. The router orders the healthy backends by p95
+latency, preferring the add-on unless it is clearly slower.
+"""
+from __future__ import annotations
+
+import time
+from collections import deque
+
+BACKEND_ADDON = "addon"
+BACKEND_CLOUD = "cloud"
+
+# Outcomes kept per backend
+WINDOW = 50
+# Open the circuit at this failure rate (with at least MIN_SAMPLES calls)...
+FAILURE_RATE = 0.5
+MIN_SAMPLES = 6
+# ...or after this many failures in a row
+CONSECUTIVE_FAILURES = 3
+# Open duration, doubled on every failed trial up to the maximum
+OPEN_SECONDS = 30
+MAX_OPEN_SECONDS = 600
+# A half-open trial not recorded within this long no longer blocks others
+TRIAL_TIMEOUT = 60
+# The preferred backend keeps the route unless another is this much faster
+LATENCY_MARGIN = 2.0
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LatencyWindow:
+    """Recent (ok, seconds) outcomes with failure rate and p95 latency."""
+
+    def __init__(self, size: int = WINDOW) -> None:
+        """Initialize."""
+        self._samples: deque[tuple[bool, float]] = deque(maxlen=size)
+
+    def add(self, ok: bool, seconds: float) -> None:
+        """Record one call."""
+        self._samples.append((ok, seconds))
+
+    def __len__(self) -> int:
+        """Number of samples."""
+        return len(self._samples)
+
+    @property
+    def failure_rate(self) -> float:
+        """Share of failed calls in the window."""
+        if not self._samples:
+            return 0.0
+        return sum(1 for ok, _ in self._samples if not ok) / len(self._samples)
+
+    def percentile(self, q: float) -> float | None:
+        """Latency of successful calls at quantile `q` (0–1), seconds."""
+        latencies = sorted(s for ok, s in self._samples if ok)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    @property
+    def p95(self) -> float | None:
+        """95th percentile latency of successful calls, seconds."""
+        return self.percentile(0.95)
+
+
+class CircuitBreaker:
+    """Closed → open on failures → half-open trial after a back-off."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.state = CLOSED
+        self._open_for = OPEN_SECONDS
+        self._opened_at = 0.0
+        self._consecutive = 0
+        # When the half-open trial call was let through (None: none out)
+        self._trial_at: float | None = None
+
+    def allow(self) -> bool:
+        """Whether a call may go to this backend now.
+
+        Half-open admits one trial call at a time: a True answer claims it
+        until the outcome is recorded (or TRIAL_TIMEOUT passes).
+        """
+        now = time.monotonic()
+        if self.state == OPEN and now - self._opened_at >= self._open_for:
+            self.state = HALF_OPEN
+            self._trial_at = None
+        if self.state != HALF_OPEN:
+            return self.state == CLOSED
+        if self.trial_in_flight:
+            return False
+        self._trial_at = now
+        return True
+
+    @property
+    def trial_in_flight(self) -> bool:
+        """Whether a half-open trial call is still out."""
+        return (
+            self._trial_at is not None
+            and time.monotonic() - self._trial_at < TRIAL_TIMEOUT
+        )
+
+    def force_trial(self) -> None:
+        """Claim a trial before the back-off ends (nothing else to try)."""
+        self.state = HALF_OPEN
+        self._trial_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give back a trial claimed by allow() but not used."""
+        if self.state == HALF_OPEN:
+            self._trial_at = None
+
+    def record(self, ok: bool, window: LatencyWindow) -> None:
+        """Update the state after a call."""
+        self._trial_at = None
+        if ok:
+            self._consecutive = 0
+            if self.state == HALF_OPEN:
+                self.state = CLOSED
+                self._open_for = OPEN_SECONDS
+            return
+        self._consecutive += 1
+        if self.state == HALF_OPEN:
+            self._open_for = min(self._open_for * 2, MAX_OPEN_SECONDS)
+            self._trip()
+        elif self._consecutive >= CONSECUTIVE_FAILURES or (
+            len(window) >= MIN_SAMPLES and window.failure_rate >= FAILURE_RATE
+        ):
+            self._trip()
+
+    def _trip(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+
+    @property
+    def retry_in(self) -> float:
+        """Seconds until an open circuit allows a trial call."""
+        if self.state == HALF_OPEN and self.trial_in_flight:
+            return TRIAL_TIMEOUT - (time.monotonic() - self._trial_at)
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._open_for - (time.monotonic() - self._opened_at))
+
+
+class Backend:
+    """One way of reaching the device."""
+
+    def __init__(self, name: str) -> None:
+        """Initialize."""
+        self.name = name
+        self.window = LatencyWindow()
+        self.breaker = CircuitBreaker()
+
+    def record(self, ok: bool, seconds: float) -> None:
+        """Record the outcome of a call to this backend."""
+        self.window.add(ok, seconds)
+        self.breaker.record(ok, self.window)
+
+    def as_dict(self) -> dict:
+        """Diagnostics view."""
+        p95 = self.window.p95
+        return {
+            "state": self.breaker.state,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            "failure_rate": round(self.window.failure_rate, 2),
+            "samples": len(self.window),
+        }
+
+
+class BackendRouter:
+    """Orders backends for each read or write."""
+
+    def __init__(self, names: list[str], preferred: str | None = None) -> None:
+        """Initialize with backend names in default order."""
+        self.backends = [Backend(name) for name in names]
+        self._by_name = {b.name: b for b in self.backends}
+        self.preferred = preferred if preferred in self._by_name else names[0]
+        self.route = self.preferred
+        self.route_changes = 0
+        self.last_change: tuple[float, str, str] | None = None  # (time, from, to)
+
+    def get(self, name: str) -> Backend | None:
+        """Backend by name."""
+        return self._by_name.get(name)
+
+    def candidates(self) -> list[Backend]:
+        """Backends to try, best first.
+
+        Healthy backends by p95, the preferred one first unless another is
+        LATENCY_MARGIN times faster. When every circuit is open the one that
+        allows a trial soonest is returned with that trial claimed early, so
+        there is always something to try, unless a half-open trial is already
+        out: then nothing is, until that trial's outcome is known.
+        """
+        healthy = [b for b in self.backends if b.breaker.allow()]
+        if not healthy:
+            if any(b.breaker.trial_in_flight for b in self.backends):
+                return []
+            forced = min(self.backends, key=lambda b: b.breaker.retry_in)
+            forced.breaker.force_trial()
+            return [forced]
+
+        def _cost(backend: Backend) -> float:
+            p95 = backend.window.p95
+            if backend.name == self.preferred:
+                return p95 / LATENCY_MARGIN if p95 is not None else 0.0
+            # Unmeasured alternatives wait until the preferred one fails
+            return p95 if p95 is not None else float("inf")
+
+        return sorted(healthy, key=_cost)
+
+    def release(self, backends: list[Backend]) -> None:
+        """Hand back the trials of candidates that were not called."""
+        for backend in backends:
+            backend.breaker.release()
+
+    def used(self, backend: Backend) -> None:
+        """Note which backend served the latest successful call."""
+        if backend.name != self.route:
+            self.last_change = (time.time(), self.route, backend.name)
+            self.route = backend.name
+            self.route_changes += 1
+
+    def diagnostics(self) -> dict:
+        """State for entity attributes."""
+        attrs: dict = {"route": self.route, "route_changes": self.route_changes}
+        if self.last_change:
+            ts, old, new = self.last_change
+            attrs["last_route_change"] = {
+                "at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(ts)),
+                "from": old,
+                "to": new,
+            }
+        for backend in self.backends:
+            attrs[backend.name] = backend.as_dict()
+        return attrs
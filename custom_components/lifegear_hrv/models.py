@@ -0,0 +1,193 @@
+"""Typed coordinator data snapshots, one class per device model.
+
+The fetch paths still assemble the raw `md_*` dicts the cloud, the add-on
+and the local server speak; `snapshot_from_dict` parses that dict once per
+refresh into a `__slots__` object with numeric fields, and entities read
+the attributes directly. Missing or blank values ("" from the cloud) become
+None here, so no entity has to guard against empty strings.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable
+
+from .const import (
+    DEVICE_MODEL_BATH_HEATER,
+    DEVICE_MODEL_M8E_SENSOR,
+    normalize_mode,
+)
+
+
+def _int(value: Any) -> int | None:
+    """int() that maps None, "" and garbage to None."""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(round(float(value)))
+        except (TypeError, ValueError):
+            return None
+
+
+def _float(value: Any) -> float | None:
+    """float() that maps None, "" and garbage to None."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _mode(value: Any) -> int | None:
+    """Cloud mode (1/2/3) from either the cloud or the M8-internal value."""
+    if value is None or value == "":
+        return None
+    return normalize_mode(value)
+
+
+def _str(value: Any) -> str | None:
+    """Non-empty string or None."""
+    if value is None or value == "":
+        return None
+    return str(value)
+
+
+def _bool(value: Any) -> bool:
+    """Truthiness, with a missing value meaning False."""
+    return bool(value)
+
+
+def _raw(value: Any) -> Any:
+    """Keep the value as received."""
+    return value
+
+
+# (attribute, raw dict key, parser)
+_Field = tuple[str, str, Callable[[Any], Any]]
+
+
+class DeviceSnapshot:
+    """Fields every model reports: air quality, power and connectivity."""
+
+    FIELDS: tuple[_Field, ...] = (
+        ("mac", "md_mac", _str),
+        ("ispower", "md_ispower", _int),
+        ("isconnect", "md_isconnect", _int),
+        ("co2", "md_co2", _int),
+        ("pm25", "md_pm25", _int),
+        ("temp", "md_temp", _int),
+        ("rh", "md_rh", _int),
+        ("filter_high_used", "filter_high_used", _int),
+        ("filter_high_alarm", "filter_high_alarm", _int),
+        ("filter_high_reset", "filter_high_reset", _str),
+        ("filter_primary_used", "filter_primary_used", _int),
+        ("filter_primary_alarm", "filter_primary_alarm", _int),
+        ("filter_primary_reset", "filter_primary_reset", _str),
+    )
+    __slots__ = tuple(f[0] for f in FIELDS)
+
+    def __init__(self, **values: Any) -> None:
+        """Set every field, defaulting to None."""
+        for attr, _key, _parse in self.FIELDS:
+            setattr(self, attr, values.get(attr))
+
+    @classmethod
+    def from_dict(cls, raw: dict[str, Any]) -> DeviceSnapshot:
+        """Parse a raw md_* dict."""
+        snapshot = cls.__new__(cls)
+        for attr, key, parse in cls.FIELDS:
+            setattr(snapshot, attr, parse(raw.get(key)))
+        return snapshot
+
+    def as_dict(self) -> dict[str, Any]:
+        """Parsed values under the raw md_* keys (round-trips via from_dict)."""
+        return {key: getattr(self, attr) for attr, key, _parse in self.FIELDS}
+
+    def diff(self, other: DeviceSnapshot | None) -> set[str] | None:
+        """Attribute names whose value differs from `other`.
+
+        None when there is nothing comparable (no previous snapshot or a
+        different model), meaning "everything changed".
+        """
+        if other is None or type(other) is not type(self):
+            return None
+        return {
+            attr for attr, _key, _parse in self.FIELDS
+            if getattr(self, attr) != getattr(other, attr)
+        }
+
+    def __repr__(self) -> str:
+        """Show the populated fields."""
+        shown = ", ".join(
+            f"{attr}={getattr(self, attr)!r}" for attr, _key, _parse in self.FIELDS
+            if getattr(self, attr) is not None
+        )
+        return f"{type(self).__name__}({shown})"
+
+
+class HRVSnapshot(DeviceSnapshot):
+    """M8 / M8-E heat-recovery ventilator."""
+
+    _OWN: tuple[_Field, ...] = (
+        ("device_id", "mdid", _str),
+        ("speed", "md_speed", _int),
+        ("mode", "md_mode", _mode),
+        # Duct temperatures and heat-recovery analytics from the add-on
+        ("temp_oa", "md_temp_oa", _float),
+        ("temp_sa", "md_temp_sa", _float),
+        ("temp_ra", "md_temp_ra", _float),
+        ("temp_ex", "md_temp_ex", _float),
+        ("hrv_efficiency", "md_hrv_efficiency", _float),
+        ("hrv_efficiency_now", "md_hrv_efficiency_now", _float),
+        ("hrv_efficiency_1h", "md_hrv_efficiency_1h", _float),
+        ("hrv_exhaust_efficiency", "md_hrv_exhaust_efficiency", _float),
+        ("hrv_recovered_power", "md_hrv_recovered_power", _int),
+        ("hrv_recovered_energy", "md_hrv_recovered_energy", _float),
+        ("hrv_airflow", "md_hrv_airflow", _int),
+        # Local-server mode extras
+        ("local", "_local", _bool),
+        ("m8_online", "_m8_online", _bool),
+        ("sensor_ts", "_sensor_ts", _str),
+        ("state_ts", "_state_ts", _str),
+        ("wifi_rssi_pct", "_wifi_rssi_pct", _raw),
+        ("wifi_rssi_label", "_wifi_rssi_label", _raw),
+        ("wifi_ssid", "_wifi_ssid", _raw),
+    )
+    FIELDS = DeviceSnapshot.FIELDS + _OWN
+    __slots__ = tuple(f[0] for f in _OWN)
+
+
+class BathHeaterSnapshot(DeviceSnapshot):
+    """BD-125W bath heater."""
+
+    _OWN: tuple[_Field, ...] = (
+        ("function", "md_function", _int),
+        ("speed", "md_speed", _int),
+        ("set_countdown", "md_set_countdown", _int),
+        ("countdown", "md_countdown", _int),
+    )
+    FIELDS = DeviceSnapshot.FIELDS + _OWN
+    __slots__ = tuple(f[0] for f in _OWN)
+
+
+class SensorSnapshot(DeviceSnapshot):
+    """M8-E standalone air-quality sensor."""
+
+    FIELDS = DeviceSnapshot.FIELDS
+    __slots__ = ()
+
+
+def snapshot_class(model: str) -> type[DeviceSnapshot]:
+    """Snapshot class for a CONF_DEVICE_MODEL value."""
+    if model == DEVICE_MODEL_BATH_HEATER:
+        return BathHeaterSnapshot
+    if model == DEVICE_MODEL_M8E_SENSOR:
+        return SensorSnapshot
+    return HRVSnapshot
+
+
+def snapshot_from_dict(model: str, raw: dict[str, Any]) -> DeviceSnapshot:
+    """Parse a raw md_* dict for the given device model."""
+    return snapshot_class(model).from_dict(raw)
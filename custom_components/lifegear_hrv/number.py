@@ -51,7 +51,7 @@ class LifegearHRVSpeedNumber(CoordinatorEntity, NumberEntity):
         entry: ConfigEntry,
     ) -> None:
         """Initialize the number."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, frozenset({"speed"}))
         self._entry = entry
         self._mac = entry.data[CONF_MAC]
         self._attr_unique_id = f"{self._mac}_speed"
@@ -71,12 +71,10 @@ class LifegearHRVSpeedNumber(CoordinatorEntity, NumberEntity):
     @property
     def native_value(self) -> float | None:
         """Return current speed."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get("md_speed")
-            if val is None:
-                return None
-            return max(1, int(val))
-        return None
+        data = self.coordinator.data
+        if not data or data.speed is None:
+            return None
+        return max(1, data.speed)
 
     async def async_set_native_value(self, value: float) -> None:
         """Set the speed."""
@@ -101,7 +99,7 @@ class LifegearBathCountdownNumber(CoordinatorEntity, NumberEntity):
         entry: ConfigEntry,
     ) -> None:
         """Initialize."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, frozenset({"set_countdown", "function"}))
         self._entry = entry
         self._mac = entry.data[CONF_MAC]
         self._attr_unique_id = f"{self._mac}_countdown"
@@ -119,20 +117,16 @@ class LifegearBathCountdownNumber(CoordinatorEntity, NumberEntity):
     @property
     def native_max_value(self) -> float:
         """Max 180 for 乾燥快速/暖房沐浴/暖房溫控, 480 for others."""
-        if self.coordinator.data:
-            func = self.coordinator.data.get("md_function")
-            if func is not None and int(func) in FUNC_BATH_WITH_COUNTDOWN:
-                return 180
+        data = self.coordinator.data
+        if data and data.function in FUNC_BATH_WITH_COUNTDOWN:
+            return 180
         return 480
 
     @property
     def native_value(self) -> float | None:
         """Return current countdown setting (minutes)."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get("md_set_countdown")
-            if val is not None and val != "":
-                return int(val)
-        return None
+        data = self.coordinator.data
+        return data.set_countdown if data else None
 
     async def async_set_native_value(self, value: float) -> None:
         """Set countdown time."""
@@ -0,0 +1,242 @@
+"""Per-account scheduling of Lifegear cloud requests.
+
+Every entry on an account shares one AccountScheduler. A cloud call waits
+for a slot, which needs a token from a bucket refilled at the configured
+rate and a free place under the concurrency limit. Waiting calls are served
+by lane, then in arrival order: commands (and logins) first, then the
+refreshes that confirm them, then regular polls, then background reads
+(filter alarm, device list, AuthCode probes). A burst of polls from several
+entries therefore never delays a command, and a command's double-send and
+retries never hit the cloud faster than the rate allows. A poll still
+queued when a newer poll or confirmation of the same entry and endpoint
+arrives is dropped: it would only fetch what the newer one fetches.
+
+The lane of a call is taken from the `current_lane` context variable, set by
+`in_lane` on the coordinator's command methods and by the post-command
+refresh; everything else runs in the poll lane.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator
+
+from .const import DOMAIN
+from .health import LatencyWindow
+
+if TYPE_CHECKING:
+    # Kept out of the runtime imports: the scheduler itself runs (and is
+    # tested) without Home Assistant
+    from homeassistant.core import HomeAssistant
+
+LANE_CONTROL = 0
+LANE_CONFIRM = 1
+LANE_POLL = 2
+LANE_BACKGROUND = 3
+LANE_NAMES = {
+    LANE_CONTROL: "control",
+    LANE_CONFIRM: "confirm",
+    LANE_POLL: "poll",
+    LANE_BACKGROUND: "background",
+}
+
+# Defaults, overridable per entry in the options flow (the strictest
+# setting among an account's entries applies)
+DEFAULT_RATE = 30          # requests per minute
+DEFAULT_CONCURRENCY = 2
+# Bucket size: how many requests may go out back to back after a quiet spell
+BURST = 6
+
+current_lane: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "lifegear_hrv_lane", default=LANE_POLL
+)
+
+
+class Superseded(asyncio.CancelledError):
+    """A queued poll dropped for a newer read of the same key.
+
+    A CancelledError so that the readers' catch-all error handling lets it
+    through to the poll, which then shares the newer read's result.
+    """
+
+
+def in_lane(lane: int):
+    """Decorator running a coroutine method's cloud calls in `lane`."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            token = current_lane.set(min(lane, current_lane.get()))
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                current_lane.reset(token)
+        return wrapper
+    return decorator
+
+
+class AccountScheduler:
+    """Token bucket + concurrency limit with priority lanes."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._limits: dict[str, tuple[float, int]] = {}
+        self._tokens = float(BURST)
+        self._refilled = time.monotonic()
+        self._active = 0
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._timer: asyncio.TimerHandle | None = None
+        self._waits = {lane: LatencyWindow() for lane in LANE_NAMES}
+        self.granted = {lane: 0 for lane in LANE_NAMES}
+        # Queued poll-lane waiters by key (see slot)
+        self._polls: dict[str, asyncio.Future] = {}
+        self.superseded = 0
+
+    # ── Limits ────────────────────────────────────────────────────────────
+    def set_limits(self, entry_id: str, rate: float, concurrency: int) -> None:
+        """Register an entry's limits."""
+        self._limits[entry_id] = (rate, concurrency)
+
+    def remove(self, entry_id: str) -> None:
+        """Forget an unloaded entry's limits."""
+        self._limits.pop(entry_id, None)
+
+    @property
+    def in_use(self) -> bool:
+        """Whether any loaded entry still uses this scheduler."""
+        return bool(self._limits)
+
+    @property
+    def rate(self) -> float:
+        """Requests per second."""
+        rates = [rate for rate, _ in self._limits.values()]
+        return min(rates or [DEFAULT_RATE]) / 60
+
+    @property
+    def concurrency(self) -> int:
+        """Requests in flight at once."""
+        return max(1, min([c for _, c in self._limits.values()] or [DEFAULT_CONCURRENCY]))
+
+    # ── Slots ─────────────────────────────────────────────────────────────
+    @asynccontextmanager
+    async def slot(
+        self, lane: int | None = None, key: str | None = None
+    ) -> AsyncIterator[None]:
+        """Wait for a slot in `lane` (default: the current lane), hold it for the block.
+
+        `key` names what a read fetches (entry and endpoint): a poll-lane
+        waiter with the same key still queued when this read arrives is
+        dropped with Superseded.
+        """
+        if lane is None:
+            lane = current_lane.get()
+        future = asyncio.get_running_loop().create_future()
+        if key is not None and lane in (LANE_CONFIRM, LANE_POLL):
+            stale = self._polls.pop(key, None)
+            if stale is not None and not stale.done():
+                stale.set_exception(Superseded(key))
+                self.superseded += 1
+            if lane == LANE_POLL:
+                self._polls[key] = future
+        heapq.heappush(self._queue, (lane, next(self._seq), future))
+        started = time.monotonic()
+        self._dispatch()
+        try:
+            await future
+        except Superseded:
+            raise
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled: give the slot back
+                self._release()
+            raise
+        finally:
+            if key is not None and self._polls.get(key) is future:
+                del self._polls[key]
+        self._waits[lane].add(True, time.monotonic() - started)
+        self.granted[lane] += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._dispatch()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(float(BURST), self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _dispatch(self) -> None:
+        """Grant slots to the best waiting calls the limits allow."""
+        self._refill()
+        while self._queue and self._active < self.concurrency and self._tokens >= 1:
+            _lane, _seq, future = heapq.heappop(self._queue)
+            if future.done():
+                continue  # cancelled while waiting
+            self._tokens -= 1
+            self._active += 1
+            future.set_result(None)
+        if self._queue and self._tokens < 1 and self._timer is None:
+            delay = (1 - self._tokens) / self.rate
+            self._timer = asyncio.get_running_loop().call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+    def diagnostics(self) -> dict:
+        """Limits, queue state and per-lane wait times."""
+        lanes = {}
+        for lane, name in LANE_NAMES.items():
+            window = self._waits[lane]
+            p50, p95 = window.percentile(0.5), window.p95
+            lanes[name] = {
+                "granted": self.granted[lane],
+                "wait_p50_ms": round(p50 * 1000) if p50 is not None else None,
+                "wait_p95_ms": round(p95 * 1000) if p95 is not None else None,
+            }
+        return {
+            "rate_per_min": round(self.rate * 60, 1),
+            "concurrency": self.concurrency,
+            "active": self._active,
+            "queued": sum(1 for *_, f in self._queue if not f.done()),
+            "superseded": self.superseded,
+            "lanes": lanes,
+        }
+
+
+# Schedulers by account (or u_id) in hass.data[DOMAIN], for as long as an
+# entry on the account is loaded
+DATA_SCHEDULERS = "schedulers"
+
+
+def get_scheduler(hass: HomeAssistant, account: str) -> AccountScheduler:
+    """Return the scheduler for an account."""
+    schedulers = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_SCHEDULERS, {})
+    if account not in schedulers:
+        schedulers[account] = AccountScheduler()
+    return schedulers[account]
+
+
+def release_scheduler(
+    hass: HomeAssistant, account: str, entry_id: str | None = None
+) -> None:
+    """Forget an unloaded entry (if given); drop the scheduler once no entry uses it."""
+    schedulers = hass.data.get(DOMAIN, {}).get(DATA_SCHEDULERS, {})
+    scheduler = schedulers.get(account)
+    if scheduler is None:
+        return
+    if entry_id is not None:
+        scheduler.remove(entry_id)
+    if not scheduler.in_use:
+        del schedulers[account]
+        if not schedulers:
+            del hass.data[DOMAIN][DATA_SCHEDULERS]
@@ -8,12 +8,13 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import EntityCategory
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import (
     DOMAIN, CONF_MAC, CONF_DEVICE_MODEL, DEVICE_MODEL_M8,
     DEVICE_MODEL_M8E, DEVICE_MODEL_BATH_HEATER, DEVICE_MODEL_M8E_SENSOR,
-    normalize_mode, get_mode_config, is_m8e_platform,
+    get_mode_config, is_m8e_platform,
     FUNC_NAMES_BATH, FUNC_NAME_TO_VALUE_BATH,
     SPEED_NAMES_BATH, SPEED_NAME_TO_VALUE_BATH,
 )
@@ -23,6 +24,46 @@ from .coordinator import LifegearHRVCoordinator
 _OPTIMISTIC_GRACE = 8
 
 
+class _OptimisticGraceMixin:
+    """Re-reads coordinator data when the optimistic grace after a command ends.
+
+    The coordinator only notifies entities whose fields changed, so a
+    command the device ignored would otherwise leave the optimistic option
+    showing until the field happens to change. Needs `_target_option` and
+    `_update_from_coordinator` from the entity.
+    """
+
+    _grace_unsub = None
+
+    @callback
+    def _recheck_after_grace(self) -> None:
+        """(Re)start the grace timer; only the latest command's one runs."""
+        if self._grace_unsub is not None:
+            self._grace_unsub()
+        self._grace_unsub = async_call_later(
+            self.hass, _OPTIMISTIC_GRACE + 0.5, self._async_grace_over,
+        )
+
+    @callback
+    def _async_grace_over(self, _now) -> None:
+        self._grace_unsub = None
+        self.async_end_grace()
+
+    @callback
+    def async_end_grace(self) -> None:
+        """Drop the optimistic option and show the coordinator's data."""
+        self._target_option = None
+        self._update_from_coordinator()
+        self.async_write_ha_state()
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Cancel a pending grace timer."""
+        if self._grace_unsub is not None:
+            self._grace_unsub()
+            self._grace_unsub = None
+        await super().async_will_remove_from_hass()
+
+
 async def async_setup_entry(
     hass: HomeAssistant,
     entry: ConfigEntry,
@@ -57,7 +98,7 @@ async def async_setup_entry(
         async_add_entities(entities)
 
 
-class LifegearHRVModeSelect(CoordinatorEntity, SelectEntity):
+class LifegearHRVModeSelect(_OptimisticGraceMixin, CoordinatorEntity, SelectEntity):
     """Mode Select for Lifegear HRV."""
 
     _attr_name = "模式"
@@ -70,7 +111,7 @@ class LifegearHRVModeSelect(CoordinatorEntity, SelectEntity):
         entry: ConfigEntry,
     ) -> None:
         """Initialize the select."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, frozenset({"mode"}))
         self._entry = entry
         self._mac = entry.data.get(CONF_MAC, "")
         model = entry.data.get(CONF_DEVICE_MODEL, DEVICE_MODEL_M8)
@@ -95,14 +136,10 @@ class LifegearHRVModeSelect(CoordinatorEntity, SelectEntity):
 
     def _update_from_coordinator(self) -> None:
         """Update _attr_current_option from coordinator data."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get("md_mode", 1)
-            if val == "":
-                self._attr_current_option = None
-            else:
-                mode_int = normalize_mode(val)
-                default = list(self._mode_names.values())[0] if self._mode_names else None
-                self._attr_current_option = self._mode_names.get(mode_int, default)
+        data = self.coordinator.data
+        if data and data.mode is not None:
+            default = list(self._mode_names.values())[0] if self._mode_names else None
+            self._attr_current_option = self._mode_names.get(data.mode, default)
         else:
             self._attr_current_option = None
 
@@ -111,9 +148,7 @@ class LifegearHRVModeSelect(CoordinatorEntity, SelectEntity):
         """Handle updated data from the coordinator."""
         if self._target_option and (time.monotonic() - self._command_time < _OPTIMISTIC_GRACE):
             if self.coordinator.data:
-                val = self.coordinator.data.get("md_mode", 1)
-                mode_int = normalize_mode(val)
-                actual = self._mode_names.get(mode_int, None)
+                actual = self._mode_names.get(self.coordinator.data.mode)
                 if actual == self._target_option:
                     self._target_option = None
                     self._attr_current_option = actual
@@ -131,10 +166,11 @@ class LifegearHRVModeSelect(CoordinatorEntity, SelectEntity):
         self._command_time = time.monotonic()
         self._attr_current_option = option
         self.async_write_ha_state()
+        self._recheck_after_grace()
         await self.coordinator.async_set_control(mode=mode_value)
 
 
-class LifegearBathFunctionSelect(CoordinatorEntity, SelectEntity):
+class LifegearBathFunctionSelect(_OptimisticGraceMixin, CoordinatorEntity, SelectEntity):
     """Function Select for bath heater."""
 
     _attr_name = "功能"
@@ -143,7 +179,7 @@ class LifegearBathFunctionSelect(CoordinatorEntity, SelectEntity):
 
     def __init__(self, coordinator: LifegearHRVCoordinator, entry: ConfigEntry) -> None:
         """Initialize."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, frozenset({"function"}))
         self._entry = entry
         self._mac = entry.data.get(CONF_MAC, "")
         self._attr_options = list(FUNC_NAMES_BATH.values())
@@ -164,12 +200,9 @@ class LifegearBathFunctionSelect(CoordinatorEntity, SelectEntity):
 
     def _update_from_coordinator(self) -> None:
         """Update from coordinator data."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get("md_function")
-            if val is not None:
-                self._attr_current_option = FUNC_NAMES_BATH.get(int(val))
-            else:
-                self._attr_current_option = None
+        data = self.coordinator.data
+        if data and data.function is not None:
+            self._attr_current_option = FUNC_NAMES_BATH.get(data.function)
         else:
             self._attr_current_option = None
 
@@ -178,8 +211,8 @@ class LifegearBathFunctionSelect(CoordinatorEntity, SelectEntity):
         """Handle updated data."""
         if self._target_option and (time.monotonic() - self._command_time < _OPTIMISTIC_GRACE):
             if self.coordinator.data:
-                val = self.coordinator.data.get("md_function")
-                if val is not None and FUNC_NAMES_BATH.get(int(val)) == self._target_option:
+                val = self.coordinator.data.function
+                if val is not None and FUNC_NAMES_BATH.get(val) == self._target_option:
                     self._target_option = None
             super()._handle_coordinator_update()
             return
@@ -196,10 +229,11 @@ class LifegearBathFunctionSelect(CoordinatorEntity, SelectEntity):
         self._command_time = time.monotonic()
         self._attr_current_option = option
         self.async_write_ha_state()
+        self._recheck_after_grace()
         await self.coordinator.async_set_bath_heater_control(function=func_value)
 
 
-class LifegearBathSpeedSelect(CoordinatorEntity, SelectEntity):
+class LifegearBathSpeedSelect(_OptimisticGraceMixin, CoordinatorEntity, SelectEntity):
     """Speed Select for bath heater."""
 
     _attr_name = "風速"
@@ -208,7 +242,7 @@ class LifegearBathSpeedSelect(CoordinatorEntity, SelectEntity):
 
     def __init__(self, coordinator: LifegearHRVCoordinator, entry: ConfigEntry) -> None:
         """Initialize."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, frozenset({"speed"}))
         self._entry = entry
         self._mac = entry.data.get(CONF_MAC, "")
         self._attr_options = list(SPEED_NAMES_BATH.values())
@@ -229,12 +263,9 @@ class LifegearBathSpeedSelect(CoordinatorEntity, SelectEntity):
 
     def _update_from_coordinator(self) -> None:
         """Update from coordinator data."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get("md_speed")
-            if val is not None and val != "":
-                self._attr_current_option = SPEED_NAMES_BATH.get(int(val))
-            else:
-                self._attr_current_option = None
+        data = self.coordinator.data
+        if data and data.speed is not None:
+            self._attr_current_option = SPEED_NAMES_BATH.get(data.speed)
         else:
             self._attr_current_option = None
 
@@ -243,8 +274,8 @@ class LifegearBathSpeedSelect(CoordinatorEntity, SelectEntity):
         """Handle updated data."""
         if self._target_option and (time.monotonic() - self._command_time < _OPTIMISTIC_GRACE):
             if self.coordinator.data:
-                val = self.coordinator.data.get("md_speed")
-                if val is not None and val != "" and SPEED_NAMES_BATH.get(int(val)) == self._target_option:
+                val = self.coordinator.data.speed
+                if val is not None and SPEED_NAMES_BATH.get(val) == self._target_option:
                     self._target_option = None
             super()._handle_coordinator_update()
             return
@@ -261,6 +292,7 @@ class LifegearBathSpeedSelect(CoordinatorEntity, SelectEntity):
         self._command_time = time.monotonic()
         self._attr_current_option = option
         self.async_write_ha_state()
+        self._recheck_after_grace()
         await self.coordinator.async_set_bath_heater_control(speed=speed_value)
 
 
@@ -280,10 +312,10 @@ class LifegearFilterAlarmSelect(CoordinatorEntity, SelectEntity):
         options: list[str],
     ) -> None:
         """Initialize."""
-        super().__init__(coordinator)
+        self._alarm_attr = f"filter_{'high' if filter_type == 2 else 'primary'}_alarm"
+        super().__init__(coordinator, frozenset({self._alarm_attr}))
         self._mac = entry.data.get(CONF_MAC, "")
         self._filter_type = filter_type
-        self._filter_key = "high" if filter_type == 2 else "primary"
         self._attr_name = f"{filter_name}更換提醒"
         self._attr_unique_id = f"{self._mac}_filter_{filter_type}_alarm"
         self._attr_options = options
@@ -296,14 +328,8 @@ class LifegearFilterAlarmSelect(CoordinatorEntity, SelectEntity):
 
     def _update_from_coordinator(self) -> None:
         """Update from coordinator data."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get(f"filter_{self._filter_key}_alarm")
-            if val is not None:
-                self._attr_current_option = str(int(val))
-            else:
-                self._attr_current_option = None
-        else:
-            self._attr_current_option = None
+        val = getattr(self.coordinator.data, self._alarm_attr, None)
+        self._attr_current_option = str(val) if val is not None else None
 
     @callback
     def _handle_coordinator_update(self) -> None:
@@ -2,9 +2,12 @@
 from __future__ import annotations
 
 import logging
+import time
+from datetime import timedelta
 
 import aiohttp
 from homeassistant.components.sensor import (
+    RestoreSensor,
     SensorDeviceClass,
     SensorEntity,
     SensorStateClass,
@@ -15,10 +18,13 @@ from homeassistant.const import (
     CONCENTRATION_PARTS_PER_MILLION,
     PERCENTAGE,
     EntityCategory,
+    UnitOfEnergy,
+    UnitOfPower,
     UnitOfTemperature,
 )
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from homeassistant.const import UnitOfTime
@@ -28,7 +34,7 @@ _LOGGER = logging.getLogger(__name__)
 from .const import (
     DOMAIN, CONF_MAC, CONF_DEVICE_MODEL, DEVICE_MODEL_M8, DEVICE_MODEL_M8E,
     DEVICE_MODEL_BATH_HEATER, DEVICE_MODEL_M8E_SENSOR,
-    normalize_mode, get_mode_config, is_m8e_platform,
+    get_mode_config, is_m8e_platform,
     FUNC_NAMES_BATH,
 )
 from .coordinator import LifegearHRVCoordinator
@@ -82,18 +88,58 @@ async def async_setup_entry(
     # Duct temperatures + heat recovery efficiency — only if the local
     # m8_local_server addon is reachable. Without the addon running MitM,
     # the cloud API doesn't expose per-duct temperatures, so the sensors
-    # would be permanently unavailable for most users. Probe once at setup.
-    if model == DEVICE_MODEL_M8E and await _async_addon_duct_temps_available(
-        hass, coordinator
-    ):
-        sensors.append(LifegearHRVDuctTempSensor(coordinator, entry, "oa", "外氣溫度"))
-        sensors.append(LifegearHRVDuctTempSensor(coordinator, entry, "sa", "送風溫度"))
-        sensors.append(LifegearHRVDuctTempSensor(coordinator, entry, "ra", "回風溫度"))
-        sensors.append(LifegearHRVEfficiencySensor(coordinator, entry))
+    # would be permanently unavailable for most users. Registered right
+    # away when the (possibly restored) data already has duct temps;
+    # otherwise the addon is probed in the background so setup doesn't wait.
+    if model == DEVICE_MODEL_M8E:
+        data = coordinator.data
+        if data is not None and any(
+            t is not None for t in (data.temp_oa, data.temp_sa, data.temp_ra)
+        ):
+            sensors.extend(_duct_sensors(coordinator, entry))
+        else:
+            entry.async_create_background_task(
+                hass,
+                _async_add_duct_sensors_if_available(hass, coordinator, entry, async_add_entities),
+                name=f"{DOMAIN} duct sensor probe {entry.entry_id}",
+            )
+
+    # Polling diagnostics (disabled by default; see stats.py)
+    sensors.append(LifegearUpdateDurationSensor(coordinator, entry))
+    sensors.append(LifegearApiFailuresSensor(coordinator, entry))
+    if coordinator.has_cloud_creds:
+        sensors.append(LifegearReloginSensor(coordinator, entry))
 
     async_add_entities(sensors)
 
 
+def _duct_sensors(
+    coordinator: LifegearHRVCoordinator, entry: ConfigEntry
+) -> list[SensorEntity]:
+    """Duct temperature and heat-recovery sensors of an M8-E HRV."""
+    return [
+        LifegearHRVDuctTempSensor(coordinator, entry, "oa", "外氣溫度"),
+        LifegearHRVDuctTempSensor(coordinator, entry, "sa", "送風溫度"),
+        LifegearHRVDuctTempSensor(coordinator, entry, "ra", "回風溫度"),
+        LifegearHRVDuctTempSensor(coordinator, entry, "ex", "排風溫度"),
+        LifegearHRVEfficiencySensor(coordinator, entry),
+        LifegearHRVExhaustEfficiencySensor(coordinator, entry),
+        LifegearHRVRecoveredPowerSensor(coordinator, entry),
+        LifegearHRVRecoveredEnergySensor(coordinator, entry),
+    ]
+
+
+async def _async_add_duct_sensors_if_available(
+    hass: HomeAssistant,
+    coordinator: LifegearHRVCoordinator,
+    entry: ConfigEntry,
+    async_add_entities: AddEntitiesCallback,
+) -> None:
+    """Probe the addon after setup and add the duct sensors if it has data."""
+    if await _async_addon_duct_temps_available(hass, coordinator):
+        async_add_entities(_duct_sensors(coordinator, entry))
+
+
 async def _async_addon_duct_temps_available(
     hass: HomeAssistant, coordinator: LifegearHRVCoordinator
 ) -> bool:
@@ -109,7 +155,7 @@ async def _async_addon_duct_temps_available(
         return False
     try:
         async with aiohttp.ClientSession() as session:
-            base = await coordinator._async_resolve_addon_base_url(session)
+            base = await coordinator.async_resolve_addon_base_url(session)
             if not base:
                 return False
             async with session.get(
@@ -129,25 +175,89 @@ async def _async_addon_duct_temps_available(
     if has_any:
         _LOGGER.info(
             "m8_local_server addon detected with duct temps for %s — "
-            "registering OA/SA/RA + efficiency sensors",
+            "registering duct temp + heat recovery sensors",
             coordinator.mac,
         )
     return has_any
 
 
+# How often sensors check whether their heartbeat is due (the heartbeat
+# option is in minutes)
+_HEARTBEAT_CHECK = timedelta(seconds=30)
+
+
+def _moved(previous, current, deadband: float) -> bool:
+    """Return True if `current` differs from `previous` by at least `deadband`."""
+    if previous is None or current is None:
+        return previous != current
+    try:
+        delta = abs(float(current) - float(previous))
+    except (TypeError, ValueError):
+        return previous != current
+    return delta >= deadband if deadband > 0 else delta > 0
+
+
 class LifegearHRVBaseSensor(CoordinatorEntity, SensorEntity):
     """Base class for Lifegear HRV sensors."""
 
+    # PUBLISH_DEADBANDS key; None writes state on every coordinator update
+    _publish_key: str | None = None
+    # Snapshot attributes the state is built from; only changes to these
+    # wake the entity (see LifegearHRVCoordinator.async_update_listeners)
+    _source_keys: frozenset[str] | None = None
+
     def __init__(
         self,
         coordinator: LifegearHRVCoordinator,
         entry: ConfigEntry,
     ) -> None:
         """Initialize the sensor."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, self._source_keys)
         self._entry = entry
         self._attr_has_entity_name = True
         self._mac = entry.data[CONF_MAC]
+        self._published: tuple[bool, object] | None = None
+        self._published_at = 0.0
+
+    async def async_added_to_hass(self) -> None:
+        """Start the heartbeat."""
+        await super().async_added_to_hass()
+        if self._publish_key is not None:
+            self.async_on_remove(async_track_time_interval(
+                self.hass, self._async_heartbeat, _HEARTBEAT_CHECK,
+            ))
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write state only on a significant change (see _async_heartbeat)."""
+        if self._publish_key is None:
+            self.async_write_ha_state()
+            return
+        available = self.available
+        value = self.native_value if available else None
+        deadband, _heartbeat = self.coordinator.publish_policy(self._publish_key)
+        last = self._published
+        if last is None or last[0] != available or _moved(last[1], value, deadband):
+            self._publish(available, value)
+
+    @callback
+    def _async_heartbeat(self, _now=None) -> None:
+        """Republish once the heartbeat interval has passed.
+
+        Runs on its own timer: the coordinator only notifies entities whose
+        fields changed, so a steady value, or a change held back by the
+        deadband, would otherwise never be written again.
+        """
+        _deadband, heartbeat = self.coordinator.publish_policy(self._publish_key)
+        if heartbeat and time.monotonic() - self._published_at >= heartbeat:
+            available = self.available
+            self._publish(available, self.native_value if available else None)
+
+    @callback
+    def _publish(self, available: bool, value) -> None:
+        self._published = (available, value)
+        self._published_at = time.monotonic()
+        self.async_write_ha_state()
 
     @property
     def device_info(self):
@@ -171,7 +281,9 @@ class LifegearHRVBaseSensor(CoordinatorEntity, SensorEntity):
 class LifegearHRVCO2Sensor(LifegearHRVBaseSensor):
     """CO2 Sensor."""
 
+    _source_keys = frozenset({"co2"})
     _attr_name = "CO2"
+    _publish_key = "co2"
     _attr_device_class = SensorDeviceClass.CO2
     _attr_native_unit_of_measurement = CONCENTRATION_PARTS_PER_MILLION
     _attr_state_class = SensorStateClass.MEASUREMENT
@@ -184,16 +296,16 @@ class LifegearHRVCO2Sensor(LifegearHRVBaseSensor):
     @property
     def native_value(self):
         """Return the state."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get("md_co2", 0)
-            return int(val) if val != "" else None
-        return None
+        data = self.coordinator.data
+        return data.co2 if data else None
 
 
 class LifegearHRVPM25Sensor(LifegearHRVBaseSensor):
     """PM2.5 Sensor."""
 
+    _source_keys = frozenset({"pm25"})
     _attr_name = "PM2.5"
+    _publish_key = "pm25"
     _attr_device_class = SensorDeviceClass.PM25
     _attr_native_unit_of_measurement = CONCENTRATION_MICROGRAMS_PER_CUBIC_METER
     _attr_state_class = SensorStateClass.MEASUREMENT
@@ -206,16 +318,16 @@ class LifegearHRVPM25Sensor(LifegearHRVBaseSensor):
     @property
     def native_value(self):
         """Return the state."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get("md_pm25", 0)
-            return int(val) if val != "" else None
-        return None
+        data = self.coordinator.data
+        return data.pm25 if data else None
 
 
 class LifegearHRVTemperatureSensor(LifegearHRVBaseSensor):
     """Temperature Sensor."""
 
+    _source_keys = frozenset({"temp"})
     _attr_name = "溫度"
+    _publish_key = "temp"
     _attr_device_class = SensorDeviceClass.TEMPERATURE
     _attr_native_unit_of_measurement = UnitOfTemperature.CELSIUS
     _attr_state_class = SensorStateClass.MEASUREMENT
@@ -228,16 +340,16 @@ class LifegearHRVTemperatureSensor(LifegearHRVBaseSensor):
     @property
     def native_value(self):
         """Return the state."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get("md_temp", 0)
-            return int(val) if val != "" else None
-        return None
+        data = self.coordinator.data
+        return data.temp if data else None
 
 
 class LifegearHRVHumiditySensor(LifegearHRVBaseSensor):
     """Humidity Sensor."""
 
+    _source_keys = frozenset({"rh"})
     _attr_name = "濕度"
+    _publish_key = "rh"
     _attr_device_class = SensorDeviceClass.HUMIDITY
     _attr_native_unit_of_measurement = PERCENTAGE
     _attr_state_class = SensorStateClass.MEASUREMENT
@@ -250,15 +362,14 @@ class LifegearHRVHumiditySensor(LifegearHRVBaseSensor):
     @property
     def native_value(self):
         """Return the state."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get("md_rh", 0)
-            return int(val) if val != "" else None
-        return None
+        data = self.coordinator.data
+        return data.rh if data else None
 
 
 class LifegearHRVSpeedSensor(LifegearHRVBaseSensor):
     """Speed Sensor."""
 
+    _source_keys = frozenset({"speed"})
     _attr_name = "目前風速"
     _attr_icon = "mdi:fan"
 
@@ -270,15 +381,14 @@ class LifegearHRVSpeedSensor(LifegearHRVBaseSensor):
     @property
     def native_value(self):
         """Return the state."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get("md_speed", 0)
-            return int(val) if val != "" else None
-        return None
+        data = self.coordinator.data
+        return data.speed if data else None
 
 
 class LifegearHRVModeSensor(LifegearHRVBaseSensor):
     """Mode Sensor."""
 
+    _source_keys = frozenset({"mode"})
     _attr_name = "目前模式"
     _attr_icon = "mdi:air-filter"
 
@@ -292,17 +402,16 @@ class LifegearHRVModeSensor(LifegearHRVBaseSensor):
     @property
     def native_value(self):
         """Return the state."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get("md_mode", 1)
-            if val == "":
-                return None
-            return self._mode_names.get(normalize_mode(val), "未知")
-        return None
+        data = self.coordinator.data
+        if not data or data.mode is None:
+            return None
+        return self._mode_names.get(data.mode, "未知")
 
 
 class LifegearBathFunctionSensor(LifegearHRVBaseSensor):
     """Bath heater current function sensor."""
 
+    _source_keys = frozenset({"function"})
     _attr_name = "目前功能"
     _attr_icon = "mdi:heat-wave"
 
@@ -314,17 +423,16 @@ class LifegearBathFunctionSensor(LifegearHRVBaseSensor):
     @property
     def native_value(self):
         """Return the state."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get("md_function")
-            if val is None:
-                return None
-            return FUNC_NAMES_BATH.get(int(val), "未知")
-        return None
+        data = self.coordinator.data
+        if not data or data.function is None:
+            return None
+        return FUNC_NAMES_BATH.get(data.function, "未知")
 
 
 class LifegearBathSpeedSensor(LifegearHRVBaseSensor):
     """Bath heater current speed sensor."""
 
+    _source_keys = frozenset({"speed"})
     _attr_name = "目前風速"
     _attr_icon = "mdi:fan"
 
@@ -336,13 +444,11 @@ class LifegearBathSpeedSensor(LifegearHRVBaseSensor):
     @property
     def native_value(self):
         """Return the state."""
-        if self.coordinator.data:
-            from .const import SPEED_NAMES_BATH
-            val = self.coordinator.data.get("md_speed")
-            if val is None or val == "":
-                return None
-            return SPEED_NAMES_BATH.get(int(val), str(val))
-        return None
+        data = self.coordinator.data
+        if not data or data.speed is None:
+            return None
+        from .const import SPEED_NAMES_BATH
+        return SPEED_NAMES_BATH.get(data.speed, str(data.speed))
 
 
 class LifegearFilterSensor(LifegearHRVBaseSensor):
@@ -363,45 +469,49 @@ class LifegearFilterSensor(LifegearHRVBaseSensor):
         """Initialize."""
         super().__init__(coordinator, entry)
         self._filter_type = filter_type  # "high" or "primary"
+        self._used_attr = f"filter_{filter_type}_used"
+        self._alarm_attr = f"filter_{filter_type}_alarm"
+        self._reset_attr = f"filter_{filter_type}_reset"
+        self.coordinator_context = frozenset(
+            {self._used_attr, self._alarm_attr, self._reset_attr}
+        )
         self._attr_name = f"{filter_name}已使用"
         self._attr_unique_id = f"{self._mac}_filter_{filter_type}_used"
 
     @property
     def native_value(self) -> int | None:
         """Return hours used."""
-        if self.coordinator.data:
-            val = self.coordinator.data.get(f"filter_{self._filter_type}_used")
-            if val is not None:
-                return int(val)
-        return None
+        data = self.coordinator.data
+        return getattr(data, self._used_attr) if data else None
 
     @property
     def extra_state_attributes(self) -> dict:
         """Return alarm threshold and reset time."""
-        if not self.coordinator.data:
+        data = self.coordinator.data
+        if not data:
             return {}
-        prefix = f"filter_{self._filter_type}"
         attrs = {}
-        alarm = self.coordinator.data.get(f"{prefix}_alarm")
+        alarm = getattr(data, self._alarm_attr)
         if alarm is not None:
-            attrs["更換提醒時數"] = int(alarm)
-            used = self.coordinator.data.get(f"{prefix}_used")
+            attrs["更換提醒時數"] = alarm
+            used = getattr(data, self._used_attr)
             if used is not None:
-                remaining = int(alarm) - int(used)
+                remaining = alarm - used
                 attrs["剩餘時數"] = max(0, remaining)
                 attrs["已到期"] = remaining <= 0
-        reset = self.coordinator.data.get(f"{prefix}_reset")
+        reset = getattr(data, self._reset_attr)
         if reset:
             attrs["上次重置"] = reset
         return attrs
 
 
 class LifegearHRVDuctTempSensor(LifegearHRVBaseSensor):
-    """M8-E HRV duct temperature sensor (OA / SA / RA), sourced from addon MitM."""
+    """M8-E HRV duct temperature sensor (OA / SA / RA / EX), sourced from addon MitM."""
 
     _attr_device_class = SensorDeviceClass.TEMPERATURE
     _attr_native_unit_of_measurement = UnitOfTemperature.CELSIUS
     _attr_state_class = SensorStateClass.MEASUREMENT
+    _publish_key = "duct_temp"
     # HRV firmware only transmits whole-degree temperatures
     _attr_suggested_display_precision = 0
 
@@ -409,27 +519,23 @@ class LifegearHRVDuctTempSensor(LifegearHRVBaseSensor):
         self,
         coordinator: LifegearHRVCoordinator,
         entry: ConfigEntry,
-        duct: str,   # "oa" | "sa" | "ra"
+        duct: str,   # "oa" | "sa" | "ra" | "ex"
         name: str,
     ) -> None:
         """Initialize."""
         super().__init__(coordinator, entry)
         self._duct = duct
+        self._temp_attr = f"temp_{duct}"
+        self.coordinator_context = frozenset({self._temp_attr})
         self._attr_name = name
         self._attr_unique_id = f"{self._mac}_temp_{duct}"
 
     @property
     def native_value(self):
         """Return the duct temperature from the addon-sourced fields."""
-        if not self.coordinator.data:
-            return None
-        val = self.coordinator.data.get(f"md_temp_{self._duct}")
-        if val is None:
-            return None
-        try:
-            return int(round(float(val)))
-        except (TypeError, ValueError):
-            return None
+        data = self.coordinator.data
+        val = getattr(data, self._temp_attr) if data else None
+        return int(round(val)) if val is not None else None
 
     @property
     def available(self) -> bool:
@@ -438,13 +544,21 @@ class LifegearHRVDuctTempSensor(LifegearHRVBaseSensor):
             return False
         if not self.coordinator.data:
             return False
-        return self.coordinator.data.get(f"md_temp_{self._duct}") is not None
+        return getattr(self.coordinator.data, self._temp_attr) is not None
 
 
 class LifegearHRVEfficiencySensor(LifegearHRVBaseSensor):
-    """Heat recovery efficiency: (TempSA - TempOA) / (TempRA - TempOA) × 100."""
+    """Heat recovery efficiency: (TempSA - TempOA) / (TempRA - TempOA) × 100.
 
+    Smoothed by the HRV analytics; holds the last estimate while the
+    indoor/outdoor gradient is too small to measure.
+    """
+
+    _source_keys = frozenset({
+        "hrv_efficiency", "hrv_efficiency_now", "hrv_efficiency_1h",
+    })
     _attr_name = "熱回收效率"
+    _publish_key = "efficiency"
     _attr_native_unit_of_measurement = PERCENTAGE
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_icon = "mdi:gauge"
@@ -459,13 +573,236 @@ class LifegearHRVEfficiencySensor(LifegearHRVBaseSensor):
         """Return efficiency from coordinator-computed field."""
         if not self.coordinator.data:
             return None
-        return self.coordinator.data.get("md_hrv_efficiency")
+        return self.coordinator.data.hrv_efficiency
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        """Return the instantaneous reading and the one-hour mean."""
+        if not self.coordinator.data:
+            return {}
+        return {
+            "即時效率": self.coordinator.data.hrv_efficiency_now,
+            "一小時平均": self.coordinator.data.hrv_efficiency_1h,
+        }
+
+    @property
+    def available(self) -> bool:
+        """Unavailable until a measurable gradient was seen or addon isn't providing data."""
+        if not self.coordinator.last_update_success:
+            return False
+        if not self.coordinator.data:
+            return False
+        return self.coordinator.data.hrv_efficiency is not None
+
+
+class LifegearHRVExhaustEfficiencySensor(LifegearHRVBaseSensor):
+    """Exhaust-side efficiency: (TempRA - TempEX) / (TempRA - TempOA) × 100."""
+
+    _source_keys = frozenset({"hrv_exhaust_efficiency"})
+    _attr_name = "排風側效率"
+    _publish_key = "efficiency"
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_icon = "mdi:gauge"
+
+    def __init__(self, coordinator: LifegearHRVCoordinator, entry: ConfigEntry) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{self._mac}_hrv_exhaust_efficiency"
+
+    @property
+    def native_value(self):
+        """Return smoothed exhaust-side efficiency."""
+        if not self.coordinator.data:
+            return None
+        return self.coordinator.data.hrv_exhaust_efficiency
+
+    @property
+    def available(self) -> bool:
+        """Unavailable when the HRV doesn't report TempEX."""
+        if not self.coordinator.last_update_success:
+            return False
+        if not self.coordinator.data:
+            return False
+        return self.coordinator.data.hrv_exhaust_efficiency is not None
+
+
+class LifegearHRVRecoveredPowerSensor(LifegearHRVBaseSensor):
+    """Recovered heat power from the rated airflow option × (TempSA - TempOA)."""
+
+    _source_keys = frozenset({"hrv_recovered_power", "hrv_airflow"})
+    _attr_name = "熱回收功率"
+    _publish_key = "recovered_power"
+    _attr_device_class = SensorDeviceClass.POWER
+    _attr_native_unit_of_measurement = UnitOfPower.WATT
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, coordinator: LifegearHRVCoordinator, entry: ConfigEntry) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{self._mac}_hrv_recovered_power"
+
+    @property
+    def native_value(self):
+        """Return recovered power in W."""
+        if not self.coordinator.data:
+            return None
+        return self.coordinator.data.hrv_recovered_power
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        """Return the airflow the estimate is based on."""
+        if not self.coordinator.data:
+            return {}
+        return {"風量_m3h": self.coordinator.data.hrv_airflow}
+
+    @property
+    def available(self) -> bool:
+        """Unavailable when addon isn't providing duct temps."""
+        if not self.coordinator.last_update_success:
+            return False
+        if not self.coordinator.data:
+            return False
+        return self.coordinator.data.hrv_recovered_power is not None
+
+
+class LifegearHRVRecoveredEnergySensor(LifegearHRVBaseSensor, RestoreSensor):
+    """Recovered heat energy, integrated by the HRV analytics.
+
+    The running total survives restarts by seeding the analytics from the
+    last recorded state.
+    """
+
+    _source_keys = frozenset({"hrv_recovered_energy"})
+    _attr_name = "熱回收能量"
+    _publish_key = "recovered_energy"
+    _attr_device_class = SensorDeviceClass.ENERGY
+    _attr_native_unit_of_measurement = UnitOfEnergy.KILO_WATT_HOUR
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_suggested_display_precision = 2
+
+    def __init__(self, coordinator: LifegearHRVCoordinator, entry: ConfigEntry) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{self._mac}_hrv_recovered_energy"
+
+    async def async_added_to_hass(self) -> None:
+        """Restore the energy total into the analytics."""
+        await super().async_added_to_hass()
+        last = await self.async_get_last_sensor_data()
+        if last is not None and last.native_value is not None:
+            try:
+                self.coordinator.analytics.seed_energy(float(last.native_value))
+            except (TypeError, ValueError):
+                pass
+
+    @property
+    def native_value(self):
+        """Return recovered energy in kWh.
+
+        Read from the analytics rather than coordinator data so the restored
+        total is reported immediately instead of the pre-restore value of the
+        first refresh, which the recorder would treat as a meter reset.
+        """
+        if not self.coordinator.data:
+            return None
+        return round(self.coordinator.analytics.energy_kwh, 3)
 
     @property
     def available(self) -> bool:
-        """Unavailable when gradient is too small or addon isn't providing data."""
+        """Unavailable when addon isn't providing duct temps."""
         if not self.coordinator.last_update_success:
             return False
         if not self.coordinator.data:
             return False
-        return self.coordinator.data.get("md_hrv_efficiency") is not None
+        return self.coordinator.data.hrv_recovered_energy is not None
+
+
+class LifegearStatsSensor(LifegearHRVBaseSensor):
+    """Base for the coordinator's own polling diagnostics.
+
+    Woken on every refresh (the coordinator marks "stats" changed) and kept
+    available while the device is unreachable, which is when they matter.
+    """
+
+    _source_keys = frozenset({"stats"})
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+
+    @property
+    def available(self) -> bool:
+        """Always available."""
+        return True
+
+
+class LifegearUpdateDurationSensor(LifegearStatsSensor):
+    """Duration of the last coordinator refresh."""
+
+    _attr_name = "更新耗時"
+    _attr_icon = "mdi:timer-outline"
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(self, coordinator: LifegearHRVCoordinator, entry: ConfigEntry) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{self._mac}_update_duration"
+
+    @property
+    def native_value(self) -> int | None:
+        """Return the last refresh duration in ms."""
+        return self.coordinator.stats.as_dict()["update"]["last_ms"]
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        """Return refresh percentiles and failure rate."""
+        return self.coordinator.stats.as_dict()["update"]
+
+
+class LifegearApiFailuresSensor(LifegearStatsSensor):
+    """Timeouts, errors and rejected responses over all API endpoints."""
+
+    _attr_name = "API 錯誤次數"
+    _attr_icon = "mdi:alert-circle-outline"
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+    def __init__(self, coordinator: LifegearHRVCoordinator, entry: ConfigEntry) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{self._mac}_api_failures"
+
+    @property
+    def native_value(self) -> int:
+        """Return the failure count since startup."""
+        return self.coordinator.stats.failures
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        """Return per-endpoint counters and latencies."""
+        return self.coordinator.stats.as_dict()["endpoints"]
+
+
+class LifegearReloginSensor(LifegearStatsSensor):
+    """Re-logins requested by this entry."""
+
+    _attr_name = "重新登入次數"
+    _attr_icon = "mdi:account-key-outline"
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+
+    def __init__(self, coordinator: LifegearHRVCoordinator, entry: ConfigEntry) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        self._attr_unique_id = f"{self._mac}_relogins"
+
+    @property
+    def native_value(self) -> int:
+        """Return the re-login count since startup."""
+        return self.coordinator.stats.relogins
+
+    @property
+    def extra_state_attributes(self) -> dict:
+        """Return the account's login, cooldown and probe counters."""
+        attrs = {"relogin_failures": self.coordinator.stats.relogin_failures}
+        attrs.update(self.coordinator.auth_diagnostics() or {})
+        return attrs
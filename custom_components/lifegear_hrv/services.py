@@ -0,0 +1,251 @@
+"""Integration services for Lifegear HRV.
+
+`lifegear_hrv.set_many` sends one command to many devices at once. Each
+device still goes through its coordinator's normal control path (double-send,
+re-login, confirmation refresh), and the devices run concurrently. Their
+cloud calls queue in the account's scheduler (see scheduler.py) like any
+other command, so devices on different accounts proceed fully in parallel
+while those on one account share its rate limit: a handful of devices fit
+in the burst, larger batches on one account are paced by it. The call
+returns once every device has confirmed (or given up), with a result per
+device.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any
+
+import voluptuous as vol
+from homeassistant.core import (
+    HomeAssistant,
+    ServiceCall,
+    ServiceResponse,
+    SupportsResponse,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers import device_registry as dr
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.service import async_extract_referenced_entity_ids
+
+from .const import (
+    DOMAIN,
+    CONF_DEVICE_MODEL,
+    DEVICE_MODEL_M8,
+    DEVICE_MODEL_BATH_HEATER,
+    DEVICE_MODEL_M8E_SENSOR,
+    FUNC_NAME_TO_VALUE_BATH,
+    SERVICE_SET_MANY,
+    get_mode_config,
+)
+from .coordinator import LifegearHRVCoordinator
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_DEVICES = "devices"
+ATTR_DEVICE_ID = "device_id"
+ATTR_ENTITY_ID = "entity_id"
+ATTR_MAC = "mac"
+ATTR_POWER = "power"
+ATTR_MODE = "mode"
+ATTR_SPEED = "speed"
+ATTR_FUNCTION = "function"
+ATTR_COUNTDOWN = "countdown"
+
+_TARGETS = {
+    vol.Optional(ATTR_POWER): cv.boolean,
+    # Cloud value 1–3 or the select option name (自動 / 淨化 / 全熱, 新風 / 節能)
+    vol.Optional(ATTR_MODE): vol.Any(vol.All(vol.Coerce(int), vol.Range(min=1, max=3)), cv.string),
+    vol.Optional(ATTR_SPEED): vol.All(vol.Coerce(int), vol.Range(min=1, max=4)),
+    # Bath heater only
+    vol.Optional(ATTR_FUNCTION): vol.Any(vol.Coerce(int), cv.string),
+    vol.Optional(ATTR_COUNTDOWN): vol.All(vol.Coerce(int), vol.Range(min=0, max=480)),
+}
+_TARGETS_KEYS = tuple(key.schema for key in _TARGETS)
+
+_DEVICE_SCHEMA = vol.All(
+    vol.Schema({
+        vol.Optional(ATTR_DEVICE_ID): cv.string,
+        vol.Optional(ATTR_ENTITY_ID): cv.entity_id,
+        vol.Optional(ATTR_MAC): cv.string,
+        **_TARGETS,
+    }),
+    cv.has_at_least_one_key(ATTR_DEVICE_ID, ATTR_ENTITY_ID, ATTR_MAC),
+)
+
+SET_MANY_SCHEMA = vol.Schema({
+    # Service target (devices / entities / areas) + shared targets
+    **cv.ENTITY_SERVICE_FIELDS,
+    **_TARGETS,
+    # Per-device targets, overriding the shared ones
+    vol.Optional(ATTR_DEVICES, default=[]): [_DEVICE_SCHEMA],
+})
+
+
+def _coordinators(hass: HomeAssistant) -> dict[str, LifegearHRVCoordinator]:
+    """Loaded coordinators by config entry id."""
+    return {
+        entry_id: coordinator
+        for entry_id, coordinator in hass.data.get(DOMAIN, {}).items()
+        if isinstance(coordinator, LifegearHRVCoordinator)
+    }
+
+
+def _resolve(
+    hass: HomeAssistant, item: dict[str, Any]
+) -> LifegearHRVCoordinator | None:
+    """Coordinator for a device id, entity id or MAC."""
+    coordinators = _coordinators(hass)
+    if mac := item.get(ATTR_MAC):
+        for coordinator in coordinators.values():
+            if coordinator.mac.upper() == mac.upper():
+                return coordinator
+        return None
+    entry_ids: set[str] = set()
+    if device_id := item.get(ATTR_DEVICE_ID):
+        device = dr.async_get(hass).async_get(device_id)
+        if device:
+            entry_ids = set(device.config_entries)
+    elif entity_id := item.get(ATTR_ENTITY_ID):
+        entity = er.async_get(hass).async_get(entity_id)
+        if entity and entity.config_entry_id:
+            entry_ids = {entity.config_entry_id}
+    for entry_id in entry_ids:
+        if entry_id in coordinators:
+            return coordinators[entry_id]
+    return None
+
+
+def _state(coordinator: LifegearHRVCoordinator) -> dict[str, Any]:
+    """Confirmed state after the command."""
+    data = coordinator.data
+    if data is None:
+        return {}
+    state = {ATTR_POWER: bool(data.ispower), ATTR_SPEED: data.speed}
+    if coordinator.model == DEVICE_MODEL_BATH_HEATER:
+        state[ATTR_FUNCTION] = data.function
+        state[ATTR_COUNTDOWN] = data.set_countdown
+    else:
+        state[ATTR_MODE] = data.mode
+    return state
+
+
+async def _async_send(
+    coordinator: LifegearHRVCoordinator, targets: dict[str, Any]
+) -> bool:
+    """Send one device's command through its coordinator."""
+    model = coordinator.entry.data.get(CONF_DEVICE_MODEL, DEVICE_MODEL_M8)
+    ispower = None
+    if ATTR_POWER in targets:
+        ispower = 1 if targets[ATTR_POWER] else 0
+
+    if model == DEVICE_MODEL_BATH_HEATER:
+        function = targets.get(ATTR_FUNCTION)
+        if isinstance(function, str):
+            if function.isdigit():
+                function = int(function)
+            elif function in FUNC_NAME_TO_VALUE_BATH:
+                function = FUNC_NAME_TO_VALUE_BATH[function]
+            else:
+                raise HomeAssistantError(f"Unknown bath heater function: {function}")
+        return await coordinator.async_set_bath_heater_control(
+            ispower=ispower,
+            function=function,
+            speed=targets.get(ATTR_SPEED),
+            countdown=targets.get(ATTR_COUNTDOWN),
+        )
+
+    mode = targets.get(ATTR_MODE)
+    if isinstance(mode, str):
+        _names, name_to_value = get_mode_config(model)
+        if mode not in name_to_value:
+            raise HomeAssistantError(f"Unknown mode for {model}: {mode}")
+        mode = name_to_value[mode]
+    return await coordinator.async_set_control(
+        ispower=ispower, mode=mode, speed=targets.get(ATTR_SPEED),
+    )
+
+
+async def _async_set_many(hass: HomeAssistant, call: ServiceCall) -> ServiceResponse:
+    """Handle lifegear_hrv.set_many."""
+    shared = {k: call.data[k] for k in _TARGETS_KEYS if k in call.data}
+
+    # The service target may name areas or other integrations' devices;
+    # only Lifegear devices are picked from it. Entries in `devices` are
+    # explicit, so an unknown one is reported.
+    selected = async_extract_referenced_entity_ids(hass, call)
+    items: list[tuple[dict[str, Any], bool]] = [
+        ({ATTR_DEVICE_ID: device_id, **shared}, False)
+        for device_id in sorted(selected.referenced_devices)
+    ] + [
+        ({ATTR_ENTITY_ID: entity_id, **shared}, False)
+        for entity_id in sorted(selected.referenced | selected.indirectly_referenced)
+    ] + [
+        ({**shared, **item}, True) for item in call.data[ATTR_DEVICES]
+    ]
+
+    results: list[dict[str, Any]] = []
+    # One job per coordinator; a later item for the same device wins
+    jobs: dict[str, tuple[LifegearHRVCoordinator, dict[str, Any], dict[str, Any]]] = {}
+    for item, explicit in items:
+        ref = {k: item[k] for k in (ATTR_DEVICE_ID, ATTR_ENTITY_ID, ATTR_MAC) if k in item}
+        coordinator = _resolve(hass, item)
+        if coordinator is None:
+            if explicit:
+                results.append({**ref, "ok": False, "error": "not a loaded Lifegear device"})
+            continue
+        if coordinator.model == DEVICE_MODEL_M8E_SENSOR:
+            if explicit:
+                results.append({**ref, "ok": False, "error": "sensor has no controls"})
+            continue
+        targets = {k: item[k] for k in _TARGETS_KEYS if k in item}
+        if not targets:
+            results.append({**ref, "ok": False, "error": "no targets"})
+            continue
+        jobs[coordinator.entry.entry_id] = (coordinator, ref, targets)
+    if not jobs and not results:
+        raise HomeAssistantError("set_many: no Lifegear device selected")
+
+    async def _run(coordinator, ref, targets) -> dict[str, Any]:
+        result = {**ref, ATTR_MAC: coordinator.mac, "name": coordinator.entry.title}
+        try:
+            ok = await _async_send(coordinator, targets)
+        except HomeAssistantError as err:
+            return {**result, "ok": False, "error": str(err)}
+        except Exception as err:
+            _LOGGER.exception("set_many failed for %s", coordinator.mac)
+            return {**result, "ok": False, "error": str(err)}
+        return {**result, "ok": ok, "state": _state(coordinator)}
+
+    results.extend(await asyncio.gather(*(_run(*job) for job in jobs.values())))
+    _LOGGER.info(
+        "set_many: %d/%d devices confirmed",
+        sum(1 for r in results if r["ok"]), len(results),
+    )
+    return {"results": results}
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration's services."""
+    if hass.services.has_service(DOMAIN, SERVICE_SET_MANY):
+        return
+
+    async def _handle_set_many(call: ServiceCall) -> ServiceResponse:
+        return await _async_set_many(hass, call)
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_SET_MANY,
+        _handle_set_many,
+        schema=SET_MANY_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+
+@callback
+def async_unload_services(hass: HomeAssistant) -> None:
+    """Remove the integration's services with its last loaded entry."""
+    if not _coordinators(hass):
+        hass.services.async_remove(DOMAIN, SERVICE_SET_MANY)
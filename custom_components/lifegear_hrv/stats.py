@@ -0,0 +1,131 @@
+"""Per-endpoint timing and error counters for diagnostics.
+
+Every app-API call the coordinator makes runs inside `track(backend, key)`,
+where `key` is the get_api_urls() key (status, air_index, device_function,
+filter_alarm, control, power, …) or one of the add-on REST calls
+(local_status, local_command, duct_temps). Each endpoint keeps a rolling
+latency window, call / timeout / error counts and the last error; responses
+that arrived but carried no data are counted with `reject()`. The result is
+shown in the diagnostics download and the optional diagnostic sensors.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from .health import LatencyWindow
+
+
+def _ms(seconds: float | None) -> int | None:
+    """Seconds → whole milliseconds."""
+    return round(seconds * 1000) if seconds is not None else None
+
+
+class EndpointStats:
+    """Counters for one (backend, URL key) pair."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.window = LatencyWindow()
+        self.calls = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.rejected = 0
+        self.last_error: str | None = None
+        self.last_error_at: float | None = None
+
+    def failed(self, reason: str) -> None:
+        """Remember the latest failure."""
+        self.last_error = reason
+        self.last_error_at = time.time()
+
+    def as_dict(self) -> dict:
+        """Diagnostics view."""
+        attrs = {
+            "calls": self.calls,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "p50_ms": _ms(self.window.percentile(0.5)),
+            "p95_ms": _ms(self.window.p95),
+        }
+        if self.last_error:
+            attrs["last_error"] = self.last_error
+            attrs["last_error_at"] = time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.localtime(self.last_error_at)
+            )
+        return attrs
+
+
+class CoordinatorStats:
+    """Endpoint stats, refresh timing and re-login counts for one entry."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.endpoints: dict[tuple[str, str], EndpointStats] = {}
+        self.updates = LatencyWindow()
+        self.last_update_seconds: float | None = None
+        self.relogins = 0
+        self.relogin_failures = 0
+
+    def endpoint(self, backend: str, key: str) -> EndpointStats:
+        """Stats for an endpoint, created on first use."""
+        stats = self.endpoints.get((backend, key))
+        if stats is None:
+            stats = self.endpoints[(backend, key)] = EndpointStats()
+        return stats
+
+    @contextmanager
+    def track(self, backend: str, key: str) -> Iterator[None]:
+        """Time the call made inside the block and count how it ended."""
+        stats = self.endpoint(backend, key)
+        stats.calls += 1
+        started = time.monotonic()
+        try:
+            yield
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            stats.window.add(False, time.monotonic() - started)
+            stats.failed("timeout")
+            raise
+        except Exception as err:
+            stats.errors += 1
+            stats.window.add(False, time.monotonic() - started)
+            stats.failed(f"{type(err).__name__}: {err}")
+            raise
+        stats.window.add(True, time.monotonic() - started)
+
+    def reject(self, backend: str, key: str, reason: str) -> None:
+        """A response arrived but had no usable data (usually a bad AuthCode)."""
+        stats = self.endpoint(backend, key)
+        stats.rejected += 1
+        stats.failed(reason)
+
+    def record_update(self, ok: bool, seconds: float) -> None:
+        """Duration of a whole coordinator refresh."""
+        self.updates.add(ok, seconds)
+        self.last_update_seconds = seconds
+
+    @property
+    def failures(self) -> int:
+        """Timeouts, errors and rejections over all endpoints."""
+        return sum(s.timeouts + s.errors + s.rejected for s in self.endpoints.values())
+
+    def as_dict(self) -> dict:
+        """Diagnostics view, endpoints grouped by backend."""
+        endpoints: dict[str, dict] = {}
+        for (backend, key), stats in sorted(self.endpoints.items()):
+            endpoints.setdefault(backend, {})[key] = stats.as_dict()
+        return {
+            "update": {
+                "last_ms": _ms(self.last_update_seconds),
+                "p50_ms": _ms(self.updates.percentile(0.5)),
+                "p95_ms": _ms(self.updates.p95),
+                "failure_rate": round(self.updates.failure_rate, 2),
+            },
+            "relogins": self.relogins,
+            "relogin_failures": self.relogin_failures,
+            "endpoints": endpoints,
+        }
@@ -43,7 +43,7 @@ class LifegearHRVPowerSwitch(CoordinatorEntity, SwitchEntity):
         entry: ConfigEntry,
     ) -> None:
         """Initialize the switch."""
-        super().__init__(coordinator)
+        super().__init__(coordinator, frozenset({"ispower"}))
         self._entry = entry
         self._mac = entry.data[CONF_MAC]
         self._attr_unique_id = f"{self._mac}_power"
@@ -69,7 +69,7 @@ class LifegearHRVPowerSwitch(CoordinatorEntity, SwitchEntity):
     def is_on(self) -> bool:
         """Return true if switch is on."""
         if self.coordinator.data:
-            return self.coordinator.data.get("md_ispower") == 1
+            return self.coordinator.data.ispower == 1
         return False
 
     async def async_turn_on(self, **kwargs: Any) -> None:
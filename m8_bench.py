@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""Benchmark / load test for m8_local_server with a simulated device fleet.
+
+Starts M8Handler (device port) and RestHandler (REST API) in a child process,
+points their cloud forwarding at a local stand-in cloud, and drives them with
+N legacy M8 and N M8-E installations sending encrypted traffic at realistic
+intervals:
+
+  - legacy M8       PostDeviceStatus / PostDeviceData / GetDeviceData (CBC)
+  - M8-E HRV unit   PostAirIndex (duct temps) / PostDeviceData / GetDeviceData (ECB)
+  - M8-E wall unit  PostAirIndex (air quality) / GetDeviceData (ECB)
+  - HA integration  GET /api/status on the REST port every 5 s
+
+Reports throughput, p50/p99 latency per endpoint, proxy CPU per request and
+proxy memory. The stand-in cloud can be healthy, slow, refusing connections
+(down) or accepting and never answering (blackhole); the `emulate` scenario
+runs the proxy in M8_CLOUD_MODE=emulate with no cloud at all.
+
+Usage:
+  python3 m8_bench.py --m8 2 --m8e 4 --duration 30 --speedup 5
+  python3 m8_bench.py --scenario slow --cloud-delay 1.5
+  python3 m8_bench.py --scenario all --json bench_output.json
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import random
+import resource
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, urlparse
+
+import m8_local_server as m8
+
+SCENARIOS = ("ok", "slow", "down", "blackhole", "emulate")
+
+# Device-side intervals (seconds) observed on real firmware.
+INTERVALS = {
+    "GetDeviceData":    3.0,
+    "PostAirIndex":     10.0,
+    "PostDeviceData":   30.0,
+    "PostDeviceStatus": 10.0,
+    "/api/status":      5.0,
+}
+
+
+# ── Stand-in cloud ────────────────────────────────────────────────────────────
+def _hrv_record(mac: str) -> dict:
+    return {
+        "Mac": mac, "IsPower": "1", "Mode": "2", "Speed": "2",
+        "Function": "0", "Auto": "0", "Mute": "0", "CountDown": "0",
+        "valveangle": "90",
+    }
+
+
+class StandInCloudHandler(BaseHTTPRequestHandler):
+    """Answers the device-facing cloud endpoints with plausible envelopes."""
+    protocol_version = "HTTP/1.1"
+    delay = 0.0
+    blackhole = False
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, body: bytes) -> None:
+        if self.blackhole:
+            time.sleep(3600)
+            return
+        if self.delay:
+            time.sleep(self.delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        now = datetime.now()
+        self._reply(json.dumps([{
+            "message": "99.取值成功!", "success": True,
+            "result": [{"CloudDate": now.strftime("%Y/%m/%d"),
+                        "CloudTime": now.strftime("%H:%M")}],
+        }], ensure_ascii=False).encode("utf-8"))
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        length = int(self.headers.get("Content-Length", 0))
+        form = m8._parse_form(self.rfile.read(length) if length else b"")
+        data = None
+        if path == "/api/App/GetDeviceData":
+            data = m8.device_encrypt(json.dumps({
+                "IsPower": True, "Mode": "3", "Speed": "2", "IsReServe": False,
+                "STime": "0", "ETime": "0", "Version": "1.0.16",
+                "IsUpdate": False, "FirmwareURL": "",
+            }, separators=(",", ":")))
+        elif path == "/api/AppV2/GetDeviceData":
+            mac = (m8.device_decrypt_raw(form.get("Mac", "")) or "").strip()
+            record = _hrv_record(mac) if mac.startswith("C4:") else {
+                "Mac": mac, "IsPower": "1", "Mode": "1", "Speed": "1",
+            }
+            data = m8.device_encrypt_ecb(json.dumps(record, separators=(",", ":")))
+        self._reply(json.dumps(
+            {"ErrorMessage": "OK", "ResponseCode": 200, "data": data},
+            separators=(",", ":"),
+        ).encode("utf-8"))
+
+
+def _start_cloud(scenario: str, delay: float) -> tuple[ThreadingHTTPServer | None, int]:
+    """Start the stand-in cloud; for `down` / `emulate` just reserve a port
+    nobody listens on."""
+    if scenario in ("down", "emulate"):
+        s = socket.socket()
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+        s.close()
+        return None, port
+    handler = type("Handler", (StandInCloudHandler,), {
+        "delay": delay if scenario == "slow" else 0.0,
+        "blackhole": scenario == "blackhole",
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+
+# ── Proxy under test (child process) ──────────────────────────────────────────
+def _proxy_main(conn, cloud_port: int, scenario: str, trace: bool) -> None:
+    logging.getLogger("m8-local").setLevel(logging.ERROR)
+    m8.CLOUD_HOST = "127.0.0.1"
+    m8.CLOUD_PORT = cloud_port
+    m8.CLOUD_MODE = "emulate" if scenario == "emulate" else "proxy"
+    if trace:
+        tracemalloc.start()
+    device = ThreadingHTTPServer(("127.0.0.1", 0), m8.M8Handler)
+    rest = ThreadingHTTPServer(("127.0.0.1", 0), m8.RestHandler)
+    device.daemon_threads = rest.daemon_threads = True
+    for srv in (device, rest):
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+    cpu0 = time.process_time()
+    conn.send((device.server_address[1], rest.server_address[1]))
+    conn.recv()  # block until the parent says stop
+    report = {
+        "cpu_s": time.process_time() - cpu0,
+        "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if trace:
+        current, peak = tracemalloc.get_traced_memory()
+        report["traced_current_kb"] = current // 1024
+        report["traced_peak_kb"] = peak // 1024
+    conn.send(report)
+
+
+# ── Simulated devices ─────────────────────────────────────────────────────────
+class Recorder:
+    """Thread-safe per-endpoint latency / outcome collector."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.latency: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+
+    def add(self, endpoint: str, seconds: float, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self.latency.setdefault(endpoint, []).append(seconds)
+            else:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+
+def _random_mac(prefix: str) -> str:
+    return prefix + ":".join(f"{random.randint(0, 255):02X}" for _ in range(3))
+
+
+def _form(**fields: str) -> bytes:
+    return "&".join(f"{k}={quote(v, safe='')}" for k, v in fields.items()).encode()
+
+
+class SimDevice(threading.Thread):
+    """One ESP talking to the proxy over a keep-alive connection."""
+
+    def __init__(self, kind: str, port: int, rec: Recorder,
+                 stop: threading.Event, speedup: float) -> None:
+        super().__init__(daemon=True)
+        self.kind = kind
+        self.port = port
+        self.rec = rec
+        self.stop_evt = stop
+        self.speedup = speedup
+        self.mac = _random_mac("C4:D8:D5:" if kind == "m8e_hrv" else "AA:BB:CC:")
+        self.conn: http.client.HTTPConnection | None = None
+
+    def _schedule(self) -> list[str]:
+        if self.kind == "m8":
+            return ["PostDeviceStatus", "PostDeviceData", "GetDeviceData"]
+        if self.kind == "m8e_hrv":
+            return ["PostAirIndex", "PostDeviceData", "GetDeviceData"]
+        return ["PostAirIndex", "GetDeviceData"]
+
+    def _request(self, endpoint: str) -> tuple[str, bytes]:
+        if self.kind == "m8":
+            path = f"/api/App/{endpoint}"
+            if endpoint == "PostDeviceStatus":
+                ra = {"Co2": random.randint(400, 1500), "PM25": random.randint(0, 40),
+                      "Temp": random.randint(18, 32), "RH": random.randint(40, 80)}
+            elif endpoint == "PostDeviceData":
+                ra = {"Ispower": 1, "Mode": 19, "Speed": 2}
+            else:
+                return path, _form(mdid="1234", md_mac=self.mac)
+            return path, _form(RA=m8.device_encrypt(json.dumps(ra)), md_mac=self.mac)
+
+        path = f"/api/AppV2/{endpoint}"
+        if endpoint == "GetDeviceData":
+            return path, _form(Mac=m8.device_encrypt_ecb(self.mac))
+        if endpoint == "PostAirIndex" and self.kind == "m8e_hrv":
+            oa = random.randint(15, 30)
+            ra = {"Mac": self.mac, "Temp": "25", "TempOA": str(oa),
+                  "TempSA": str(oa + 2), "TempRA": "25", "TempEX": str(oa + 1)}
+        elif endpoint == "PostAirIndex":
+            ra = {"Mac": self.mac, "Co2": str(random.randint(400, 1500)),
+                  "PM25": str(random.randint(0, 40)), "Temp": "26", "RH": "60"}
+        else:
+            ra = {"Mac": self.mac, "IsPower": "1", "Mode": "2", "Speed": "2",
+                  "Function": "0", "valveangle": "90"}
+        return path, _form(RA=m8.device_encrypt_ecb(json.dumps(ra, separators=(",", ":"))))
+
+    def _send(self, endpoint: str) -> None:
+        path, body = self._request(endpoint)
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+            self.conn.request("POST", path, body=body, headers={
+                "Content-Type": "application/x-www-form-urlencoded",
+            })
+            resp = self.conn.getresponse()
+            resp.read()
+            ok = resp.status == 200
+        except Exception:
+            if self.conn is not None:
+                self.conn.close()
+            self.conn = None
+        self.rec.add(f"{self.kind}:{endpoint}", time.perf_counter() - t0, ok)
+
+    def run(self) -> None:
+        due = {ep: time.monotonic() + random.uniform(0, INTERVALS[ep] / self.speedup)
+               for ep in self._schedule()}
+        while not self.stop_evt.is_set():
+            endpoint, when = min(due.items(), key=lambda kv: kv[1])
+            wait = when - time.monotonic()
+            if wait > 0 and self.stop_evt.wait(wait):
+                break
+            self._send(endpoint)
+            due[endpoint] = time.monotonic() + INTERVALS[endpoint] / self.speedup
+
+
+class SimIntegration(SimDevice):
+    """The HA integration polling the REST API in local mode."""
+
+    def _schedule(self) -> list[str]:
+        return ["/api/status"]
+
+    def _send(self, endpoint: str) -> None:
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+            self.conn.request("GET", endpoint)
+            resp = self.conn.getresponse()
+            resp.read()
+            ok = resp.status == 200
+            # RestHandler speaks HTTP/1.0; reconnect per request like aiohttp does
+            self.conn.close()
+            self.conn = None
+        except Exception:
+            self.conn = None
+        self.rec.add(f"rest:{endpoint}", time.perf_counter() - t0, ok)
+
+
+# ── Run + report ──────────────────────────────────────────────────────────────
+def _pct(sorted_vals: list[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, int(round(p / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+
+def run_scenario(args, scenario: str) -> dict:
+    cloud, cloud_port = _start_cloud(scenario, args.cloud_delay)
+    parent, child = multiprocessing.Pipe()
+    proc = multiprocessing.Process(
+        target=_proxy_main, args=(child, cloud_port, scenario, args.tracemalloc), daemon=True,
+    )
+    proc.start()
+    device_port, rest_port = parent.recv()
+
+    rec = Recorder()
+    stop = threading.Event()
+    fleet: list[SimDevice] = []
+    for _ in range(args.m8):
+        fleet.append(SimDevice("m8", device_port, rec, stop, args.speedup))
+    for _ in range(args.m8e):
+        fleet.append(SimDevice("m8e_hrv", device_port, rec, stop, args.speedup))
+        fleet.append(SimDevice("m8e_sensor", device_port, rec, stop, args.speedup))
+    fleet.append(SimIntegration("rest", rest_port, rec, stop, args.speedup))
+
+    t0 = time.monotonic()
+    for dev in fleet:
+        dev.start()
+    time.sleep(args.duration)
+    stop.set()
+    for dev in fleet:
+        dev.join(timeout=10)
+    elapsed = time.monotonic() - t0
+
+    parent.send("stop")
+    proxy = parent.recv()
+    proc.terminate()
+    proc.join()
+    if cloud is not None:
+        cloud.shutdown()
+
+    endpoints = {}
+    total = 0
+    for ep in sorted(set(rec.latency) | set(rec.errors)):
+        vals = sorted(rec.latency.get(ep, []))
+        total += len(vals) + rec.errors.get(ep, 0)
+        endpoints[ep] = {
+            "count": len(vals),
+            "errors": rec.errors.get(ep, 0),
+            "p50_ms": round(_pct(vals, 50) * 1000, 2),
+            "p99_ms": round(_pct(vals, 99) * 1000, 2),
+            "max_ms": round((vals[-1] if vals else 0) * 1000, 2),
+        }
+    return {
+        "scenario": scenario,
+        "devices": len(fleet) - 1,
+        "elapsed_s": round(elapsed, 2),
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "cpu_ms_per_request": round(proxy["cpu_s"] * 1000 / total, 3) if total else 0.0,
+        "proxy": proxy,
+        "endpoints": endpoints,
+    }
+
+
+def print_report(result: dict) -> None:
+    proxy = result["proxy"]
+    print(f"\n=== scenario={result['scenario']}  devices={result['devices']}  "
+          f"{result['elapsed_s']}s ===")
+    print(f"requests={result['requests']}  throughput={result['throughput_rps']} req/s  "
+          f"cpu/request={result['cpu_ms_per_request']} ms  "
+          f"maxrss={proxy['maxrss_kb'] // 1024} MiB", end="")
+    if "traced_peak_kb" in proxy:
+        print(f"  traced peak={proxy['traced_peak_kb']} KiB", end="")
+    print()
+    print(f"{'endpoint':<34}{'count':>7}{'err':>6}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for ep, s in result["endpoints"].items():
+        print(f"{ep:<34}{s['count']:>7}{s['errors']:>6}"
+              f"{s['p50_ms']:>10}{s['p99_ms']:>10}{s['max_ms']:>10}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--m8", type=int, default=1, help="legacy M8 devices")
+    ap.add_argument("--m8e", type=int, default=2, help="M8-E installations (HRV + wall sensor)")
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds per scenario")
+    ap.add_argument("--speedup", type=float, default=1.0,
+                    help="divide device intervals by this factor")
+    ap.add_argument("--scenario", choices=SCENARIOS + ("all",), default="ok")
+    ap.add_argument("--cloud-delay", type=float, default=1.0,
+                    help="stand-in cloud response delay for --scenario slow")
+    ap.add_argument("--tracemalloc", action="store_true",
+                    help="trace proxy allocations (slower, adds peak KiB)")
+    ap.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    args = ap.parse_args()
+
+    scenarios = SCENARIOS if args.scenario == "all" else (args.scenario,)
+    results = []
+    for scenario in scenarios:
+        result = run_scenario(args, scenario)
+        print_report(result)
+        results.append(result)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.set_start_method("fork")
+    sys.exit(main())
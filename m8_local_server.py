@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-"""M8 HRV Local Control Server v3.2.2 (M8 + M8-E MitM + HRV-only device state filter)
+"""M8 HRV Local Control Server v3.3.0 (M8 + M8-E MitM, local cloud emulation, GetDeviceData cache)
 
 Replaces m8.daguan-tech.com.tw for the M8 device, providing:
   - Local handling of all 4 device HTTP endpoints (port 80)
@@ -17,17 +17,23 @@ Cloud command format (from reverse engineering):
    "STime":"str","ETime":"str","Version":"str","IsUpdate":bool,"FirmwareURL":"str"}
 """
 import base64
+import gzip
 import hashlib
 import http.client
 import json
 import logging
-import re
+import logging.handlers
+import os
+import queue
+import select
+import shutil
 import socket
 import threading
 import time
-from datetime import datetime
+from collections import deque
+from datetime import datetime, timedelta, timezone
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-from urllib.parse import parse_qs, urlparse
+from urllib.parse import parse_qs, unquote_plus, urlencode, urlparse
 
 try:
     from Crypto.Cipher import AES
@@ -76,29 +82,50 @@ def device_decrypt(b64: str) -> dict | None:
 
 def device_decrypt_raw(b64: str) -> str | None:
     """Decrypt base64 AES ciphertext. Tries ECB+ZeroPad (M8-E) first, then CBC+PKCS7 (M8)."""
+    for decrypt in (device_decrypt_ecb, device_decrypt_cbc):
+        text = decrypt(b64)
+        if text and _looks_valid(text):
+            return text
+    return None
+
+
+def device_decrypt_ecb(b64: str) -> str | None:
+    """M8-E ECB+ZeroPad decryption; None unless it yields clean UTF-8."""
+    ct = _ciphertext(b64)
+    if ct is None:
+        return None
+    return _utf8(_zero_unpad(AES.new(DEVICE_KEY, AES.MODE_ECB).decrypt(ct)))
+
+
+def device_decrypt_cbc(b64: str) -> str | None:
+    """Old M8 CBC+PKCS7 decryption; None unless it yields clean UTF-8."""
+    ct = _ciphertext(b64)
+    if ct is None:
+        return None
+    pt = AES.new(DEVICE_KEY, AES.MODE_CBC, DEVICE_IV).decrypt(ct)
+    try:
+        pt = unpad(pt, 16)
+    except ValueError:
+        pt = _zero_unpad(pt)
+    return _utf8(pt)
+
+
+def _ciphertext(b64: str) -> bytes | None:
     try:
         ct = base64.b64decode(b64)
-        if len(ct) % 16 != 0:
-            return None
-        # Try M8-E: ECB + ZeroPad
-        try:
-            pt = AES.new(DEVICE_KEY, AES.MODE_ECB).decrypt(ct)
-            text = _zero_unpad(pt).decode("utf-8", errors="replace")
-            if _looks_valid(text):
-                return text
-        except Exception:
-            pass
-        # Fallback to M8: CBC + PKCS7
-        pt = AES.new(DEVICE_KEY, AES.MODE_CBC, DEVICE_IV).decrypt(ct)
-        try:
-            pt = unpad(pt, 16)
-        except ValueError:
-            pt = _zero_unpad(pt)
-        text = pt.decode("utf-8", errors="replace")
-        return text if _looks_valid(text) else None
-    except Exception as e:
+    except (ValueError, TypeError) as e:
         log.debug("Decrypt error: %s", e)
         return None
+    return ct if ct and len(ct) % 16 == 0 else None
+
+
+def _utf8(pt: bytes) -> str | None:
+    # Strict: the wrong cipher's output is almost never valid UTF-8, while
+    # errors="replace" turned it into U+FFFD, which counts as printable
+    try:
+        return pt.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
 
 
 def _looks_valid(text: str) -> bool:
@@ -149,6 +176,15 @@ _device_state: dict = {
     "last_update": None,
 }
 
+# Per-MAC raw GetDeviceData / PostDeviceData fields (IsPower, Mode, Speed,
+# Function, CountDown, valveangle, ...). Unlike `_device_state` this keeps
+# every device — HRV, wall sensor, bath heater — under its own MAC, which is
+# what the app-facing endpoints on the REST port serve from.
+_device_state_by_mac: dict[str, dict] = {}
+
+# Per-MAC PostDeviceConsumablesTime plaintext (filter usage counters).
+_consumables_by_mac: dict[str, dict] = {}
+
 _device_info: dict = {
     "device_id": None, "mac": None,
 }
@@ -160,6 +196,29 @@ _cloud_auth: dict = {
 
 _pending_command: dict | None = None
 _pending_command_time: float = 0
+# Whether a device has been sent the pending command yet (for its latency)
+_pending_command_delivered = False
+
+# Per-MAC injection commands for M8-E devices (HRV, bath heater, …):
+# MAC -> {"target": {command field: int}, "at": epoch, "delivered": bool}.
+# Unlike `_pending_command`, which only the HRV main unit gets, each applies
+# to its own device's GetDeviceData and carries only the fields to change.
+_pending_by_mac: dict[str, dict] = {}
+# Give up on a per-MAC command the device never confirms
+PENDING_COMMAND_TTL = 300
+
+# Command fields → GetDeviceData plaintext keys (AppV2 sends them as
+# strings of ints)
+_COMMAND_FIELDS = {
+    "ispower": "IsPower",
+    "mode": "Mode",
+    "speed": "Speed",
+    "function": "Function",
+    "auto": "Auto",
+    "mute": "Mute",
+    "countdown": "CountDown",
+    "valveangle": "valveangle",
+}
 
 
 
@@ -184,49 +243,21 @@ def _set_device_state(data: dict) -> None:
              _device_state["ispower"], _device_state["mode"], _device_state["speed"])
 
 
-def _build_command_payload() -> str:
-    """Return encrypted command JSON for GetDeviceData response.
+def _legacy_device_record() -> str:
+    """Encrypted legacy GetDeviceData record echoing the M8's current state.
 
-    Uses cloud-compatible format discovered via reverse engineering.
-    If there's a pending HA command, send it repeatedly until device confirms.
-    Otherwise echo a safe default state.
+    Uses cloud-compatible format discovered via reverse engineering. Stands
+    in for the cloud's answer when there is none; a pending HA command is
+    injected into it like into a cloud answer (see _inject_command).
     """
-    global _pending_command
     with _lock:
-        cmd = _pending_command
-
-    if cmd:
-        ispower = bool(cmd.get("ispower", 1))
-        mode    = int(cmd.get("mode", 3))
-        speed   = int(cmd.get("speed", 1))
-        # Use device's actual mode value if it matches the requested mode category
-        # M8 internal modes: 17=自動, 18=淨化, 19=全熱 (alternates with 1/2/3)
-        dev_mode = _device_state.get("mode")
-        dev_speed = _device_state.get("speed")
-        if dev_speed == speed and dev_mode is not None:
-            # Check if device mode matches requested mode (either cloud or internal value)
-            dev_mode_int = int(dev_mode) if dev_mode is not None else None
-            mode_matches = dev_mode_int in (mode, mode + 16)  # 1↔17, 2↔18, 3↔19
-            if mode_matches:
-                _pending_command = None
-                log.info("[Cmd✓] Device confirmed: Power=%s Mode=%s Speed=%s", ispower, dev_mode_int, speed)
-            else:
-                log.info("[Cmd→Device] Power=%s Mode=%s Speed=%s (dev_mode=%s)", ispower, mode, speed, dev_mode_int)
-        else:
-            log.info("[Cmd→Device] Power=%s Mode=%s Speed=%s (dev_speed=%s)", ispower, mode, speed, dev_speed)
-    else:
-        ispower = bool(_device_state.get("ispower") if _device_state.get("ispower") is not None else True)
-        # Echo device's current mode (use cloud-style value)
+        ispower = _device_state.get("ispower")
         dev_mode = _device_state.get("mode")
-        if dev_mode is not None:
-            mode = int(dev_mode)
-        else:
-            mode = 3
-        speed   = _device_state.get("speed") or 1
-
+        speed = _device_state.get("speed") or 1
     payload = {
-        "IsPower":     ispower,
-        "Mode":        str(mode),
+        "IsPower":     bool(ispower if ispower is not None else True),
+        # Echo device's current mode (M8 internal 17–19 included)
+        "Mode":        str(int(dev_mode) if dev_mode is not None else 3),
         "Speed":       str(speed),
         "IsReServe":   False,
         "STime":       "0",
@@ -247,21 +278,80 @@ log = logging.getLogger("m8-local")
 
 
 CLOUD_HOST = "61.31.209.215"
+CLOUD_PORT = 80
 CLOUD_BASE = f"http://{CLOUD_HOST}"
 CLOUD_HOST_M8  = "m8.daguan-tech.com.tw"   # legacy M8 vhost
 CLOUD_HOST_M8E = "dm03.e-giant.com.tw"     # new M8-E vhost (same IP)
 
 
+# "proxy"   — forward every device request to the real cloud (default)
+# "emulate" — answer the device-facing cloud API locally, zero cloud round trips
+CLOUD_MODE = os.environ.get("M8_CLOUD_MODE", "proxy").strip().lower()
+
+
 def _forward_to_cloud(method: str, path: str, body: bytes = b"",
                        headers: dict | None = None,
-                       host_header: str = CLOUD_HOST_M8) -> bytes | None:
+                       host_header: str = CLOUD_HOST_M8,
+                       deadline: float | None = None) -> bytes | None:
     """Forward a request to the real cloud server, return raw response body.
 
     `host_header` picks the virtual host — CLOUD_HOST_M8 for legacy /api/App/*
-    paths, CLOUD_HOST_M8E for M8-E /api/AppV2/* paths.
+    paths, CLOUD_HOST_M8E for M8-E /api/AppV2/* paths. In emulate mode the
+    local cloud emulator answers instead; paths it doesn't emulate return
+    None so callers take their usual cloud-down fallback. `deadline`
+    (time.monotonic) is the device request's budget: the cloud gets only
+    what is left of it, and None comes back once it is spent.
     """
+    t0 = time.perf_counter()
+    if CLOUD_MODE == "emulate":
+        data = _emulate_cloud(method, path, body)
+    elif deadline is not None and deadline - time.monotonic() < DEADLINE_MIN_CLOUD:
+        _count(f"deadline.local.{_endpoint_name(path)}")
+        data = None
+    else:
+        budget = deadline - time.monotonic() if deadline is not None else None
+        data = _cloud_request(method, path, body, headers, host_header, budget)
+        if data is None and deadline is not None and time.monotonic() >= deadline:
+            _count(f"deadline.local.{_endpoint_name(path)}")
+    if getattr(_capture_ctx, "active", False):
+        _capture_ctx.cloud = data
+        _capture_ctx.cloud_ms = (time.perf_counter() - t0) * 1000
+    return data
+
+
+def _cloud_request(method: str, path: str, body: bytes,
+                   headers: dict | None, host_header: str,
+                   budget: float | None = None) -> bytes | None:
+    """Request to the real cloud; None on any failure.
+
+    The timeout follows the endpoint's observed latency, cut to `budget`
+    when the caller has less time left, and device-facing Get* reads are
+    hedged (see _hedged_request).
+    """
+    name = _endpoint_name(path)
+    timeout, hedge_after = _cloud_limits(name)
+    capped = budget is not None and budget < timeout
+    if capped:
+        timeout = budget
+        if hedge_after is not None:
+            hedge_after = min(hedge_after, budget)
+    if CLOUD_HEDGE and method == "POST" and path.startswith("/api/") and name.startswith("Get"):
+        return _hedged_request(method, path, body, headers, host_header,
+                               name, timeout, hedge_after, capped)
+    return _cloud_attempt(method, path, body, headers, host_header, name, timeout, capped)
+
+
+def _cloud_attempt(method: str, path: str, body: bytes, headers: dict | None,
+                   host_header: str, name: str, timeout: float,
+                   capped: bool = False) -> bytes | None:
+    """One HTTP round trip to the real cloud; None on any failure.
+
+    A `capped` timeout is the request's remaining budget rather than the
+    endpoint's own limit; running out of it is not a cloud timeout.
+    """
+    t0 = time.perf_counter()
     try:
-        conn = http.client.HTTPConnection(CLOUD_HOST, 80, timeout=5)
+        conn = http.client.HTTPConnection(CLOUD_HOST, CLOUD_PORT, timeout=timeout)
         hdrs = {"Host": host_header}
         if headers:
             hdrs.update(headers)
@@ -269,14 +359,602 @@ def _forward_to_cloud(method: str, path: str, body: bytes = b"",
         resp = conn.getresponse()
         data = resp.read()
         conn.close()
+        _observe(f"cloud.{name}", time.perf_counter() - t0)
         log.debug("[Proxy] %s %s (%s) → %d (%d bytes)",
                   method, path, host_header, resp.status, len(data))
         return data
+    except (socket.timeout, TimeoutError):
+        if capped:
+            log.debug("[Proxy] Budget of %.2fs ran out: %s %s", timeout, method, path)
+            return None
+        # Counted at the timeout so the window isn't biased towards fast answers
+        _observe(f"cloud.{name}", timeout)
+        _count(f"cloud_timeout.{name}")
+        log.warning("[Proxy] Forward timed out after %.1fs: %s %s", timeout, method, path)
+        return None
     except Exception as e:
+        _count(f"cloud_error.{name}")
         log.warning("[Proxy] Forward failed: %s %s → %s", method, path, e)
         return None
 
 
+# ── Metrics ───────────────────────────────────────────────────────────────────
+# Counters and rolling latency windows served at /api/metrics. Timings are
+# named "<stage>.<endpoint>": device.* is request-received → response-sent on
+# port 80, cloud.* one successful cloud round trip.
+_METRIC_WINDOW = 512
+_metrics_lock = threading.Lock()
+_counters: dict[str, int] = {}
+_timings: dict[str, deque] = {}
+_started_at = time.time()
+
+
+def _endpoint_name(path: str) -> str:
+    """Last path segment without the query: /api/AppV2/GetDeviceData → GetDeviceData."""
+    return path.split("?", 1)[0].rsplit("/", 1)[-1]
+
+
+def _count(name: str, n: int = 1) -> None:
+    with _metrics_lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def _observe(name: str, seconds: float) -> None:
+    with _metrics_lock:
+        window = _timings.get(name)
+        if window is None:
+            window = _timings[name] = deque(maxlen=_METRIC_WINDOW)
+        window.append(seconds)
+
+
+def _percentile(ordered: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _metrics_snapshot() -> dict:
+    with _metrics_lock:
+        counters = dict(_counters)
+        timings = {name: sorted(window) for name, window in _timings.items()}
+    return {
+        "uptime_s": round(time.time() - _started_at),
+        "counters": dict(sorted(counters.items())),
+        "timings_ms": {
+            name: {
+                "count": len(values),
+                "p50": round(_percentile(values, 0.5) * 1000, 2),
+                "p95": round(_percentile(values, 0.95) * 1000, 2),
+                "max": round(values[-1] * 1000, 2),
+            }
+            for name, values in sorted(timings.items()) if values
+        },
+    }
+
+
+# ── Adaptive timeouts and hedging ─────────────────────────────────────────────
+# Each endpoint's cloud timeout is CLOUD_TIMEOUT_FACTOR × its p99 round trip,
+# within [CLOUD_TIMEOUT_MIN, CLOUD_TIMEOUT_MAX]; until CLOUD_ADAPT_SAMPLES
+# round trips have been seen it is CLOUD_TIMEOUT_MAX, the old fixed value.
+# Device-facing Get* reads are idempotent, so when the first attempt is still
+# out after the endpoint's p95 — or has already failed — a second identical
+# request is sent and whichever answers first is used. hedge.sent.* and
+# hedge.won.* in /api/metrics count how often that happened and how often the
+# duplicate was the one that answered.
+CLOUD_TIMEOUT_MIN = 1.0
+CLOUD_TIMEOUT_MAX = 5.0
+CLOUD_TIMEOUT_FACTOR = 2.0
+CLOUD_ADAPT_SAMPLES = 20
+HEDGE_MIN_DELAY = 0.05
+# Off in the replay tool, whose stand-in cloud serves one recorded answer per request
+CLOUD_HEDGE = True
+
+
+def _cloud_limits(name: str) -> tuple[float, float | None]:
+    """(timeout, hedge delay) for an endpoint; no hedge delay before enough samples."""
+    with _metrics_lock:
+        window = _timings.get(f"cloud.{name}")
+        values = sorted(window) if window and len(window) >= CLOUD_ADAPT_SAMPLES else None
+    if values is None:
+        return CLOUD_TIMEOUT_MAX, None
+    timeout = min(CLOUD_TIMEOUT_MAX,
+                  max(CLOUD_TIMEOUT_MIN, _percentile(values, 0.99) * CLOUD_TIMEOUT_FACTOR))
+    hedge_after = min(timeout, max(HEDGE_MIN_DELAY, _percentile(values, 0.95)))
+    return timeout, hedge_after
+
+
+def _hedged_request(method: str, path: str, body: bytes, headers: dict | None,
+                    host_header: str, name: str, timeout: float,
+                    hedge_after: float | None, capped: bool = False) -> bytes | None:
+    """First answer out of the attempt and, when it is slow or fails, one duplicate."""
+    results: queue.Queue = queue.Queue()
+
+    def attempt(index: int) -> None:
+        results.put((index, _cloud_attempt(method, path, body, headers,
+                                           host_header, name, timeout, capped)))
+
+    def hedge() -> None:
+        _count(f"hedge.sent.{name}")
+        threading.Thread(target=attempt, args=(1,), daemon=True).start()
+
+    started = time.monotonic()
+    deadline = started + timeout
+    hedge_at = started + hedge_after if hedge_after is not None else deadline
+    threading.Thread(target=attempt, args=(0,), daemon=True).start()
+    attempts = outstanding = 1
+    while outstanding:
+        wait = (hedge_at if attempts == 1 else deadline) - time.monotonic()
+        try:
+            index, data = results.get(timeout=max(0.0, wait))
+        except queue.Empty:
+            if attempts == 1 and time.monotonic() < deadline:
+                hedge()
+                attempts, outstanding = 2, outstanding + 1
+                continue
+            break
+        outstanding -= 1
+        if data is not None:
+            if index == 1:
+                _count(f"hedge.won.{name}")
+                log.debug("[Proxy] Hedged %s answered first", name)
+            return data
+        if attempts == 1 and time.monotonic() < deadline:
+            hedge()  # first attempt failed outright: retry within the budget
+            attempts, outstanding = 2, outstanding + 1
+    return None
+
+
+# ── Request deadlines ─────────────────────────────────────────────────────────
+# A device stops waiting for an answer after its firmware's HTTP timeout; an
+# answer sent later is lost, and the device retries or carries on with stale
+# state. Each device request therefore gets a deadline of the device's
+# estimated timeout minus DEADLINE_MARGIN (kept for building and writing the
+# answer), and every cloud call it makes only gets what is left. Once too
+# little is left the handler answers from local state instead: the cached
+# or locally built GetDeviceData, the local time, a plain OK envelope.
+#
+# The estimate is learned per client address. An answer that is slow but
+# still finds the connection open raises it. Hang-ups lower it, but only
+# once DEVICE_TIMEOUT_HANGUPS of them fall within DEVICE_TIMEOUT_RECOVERY
+# seconds (a single Wi-Fi drop proves nothing), and only to the longest of
+# those waits. A lowered estimate drifts back to DEVICE_TIMEOUT_DEFAULT
+# over DEVICE_TIMEOUT_RECOVERY seconds, since answers sent before the
+# deadline can never show that the device would have waited longer.
+# Counters per endpoint:
+# deadline.local (cloud skipped or cut short), deadline.miss (answered after
+# the deadline anyway) and deadline.gave_up (the device had hung up).
+DEVICE_TIMEOUT_DEFAULT = 5.0
+DEVICE_TIMEOUT_MIN = 1.5
+DEADLINE_MARGIN = 0.5
+DEADLINE_MIN_CLOUD = 0.2
+DEVICE_TIMEOUT_HANGUPS = 2
+DEVICE_TIMEOUT_RECOVERY = 600.0
+# Answers faster than this are not worth checking the connection for
+DEADLINE_CHECK_AFTER = 1.0
+
+# client IP -> {"timeout": learned seconds, "at": monotonic time it was
+# learned, "hangups": [(monotonic, elapsed), ...] within the recovery window}
+_device_timeouts: dict[str, dict] = {}
+
+
+def _device_timeout(ip: str, now: float) -> float:
+    """Current timeout estimate for `ip`. Caller must hold `_lock`."""
+    learned = _device_timeouts.get(ip)
+    if learned is None:
+        return DEVICE_TIMEOUT_DEFAULT
+    timeout = learned["timeout"]
+    if timeout >= DEVICE_TIMEOUT_DEFAULT:
+        return timeout
+    recovered = min(1.0, (now - learned["at"]) / DEVICE_TIMEOUT_RECOVERY)
+    return timeout + (DEVICE_TIMEOUT_DEFAULT - timeout) * recovered
+
+
+def _device_deadline(ip: str, received_at: float) -> float:
+    """time.monotonic() by which a request received at `received_at` must be answered."""
+    with _lock:
+        timeout = _device_timeout(ip, received_at)
+    return received_at + timeout - DEADLINE_MARGIN
+
+
+def _learn_device_timeout(ip: str, elapsed: float, waited: bool) -> None:
+    """Adjust a device's timeout estimate after an answer `elapsed` s in."""
+    now = time.monotonic()
+    with _lock:
+        current = _device_timeout(ip, now)
+        learned = _device_timeouts.setdefault(
+            ip, {"timeout": current, "at": now, "hangups": []})
+        if waited:
+            if elapsed > current:
+                learned["timeout"], learned["at"] = elapsed, now
+            return
+        hangups = [h for h in learned["hangups"] if now - h[0] < DEVICE_TIMEOUT_RECOVERY]
+        hangups.append((now, elapsed))
+        learned["hangups"] = hangups
+        if len(hangups) < DEVICE_TIMEOUT_HANGUPS:
+            return
+        lowered = max(DEVICE_TIMEOUT_MIN, max(e for _, e in hangups))
+        if lowered >= current:
+            return
+        learned["timeout"], learned["at"] = lowered, now
+    log.info("[Deadline] %s hung up %d times, timeout estimate now %.1fs",
+             ip, len(hangups), lowered)
+
+
+def _peer_closed(sock) -> bool:
+    """True if the client has closed its side of the connection."""
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b""
+    except OSError:
+        return True
+
+
+# ── Long-hold GetDeviceData ───────────────────────────────────────────────────
+# A queued command reaches a device on its next GetDeviceData poll, so it
+# waits for whatever is left of the poll interval. With M8_LONG_HOLD=<s>
+# (add-on option `long_hold`) a poll with nothing to deliver is held open
+# instead, for at most that long and never past the request's deadline less
+# LONG_HOLD_RESERVE, and answered as soon as a command is queued or a
+# background refresh brings a changed cloud record for the MAC. The device
+# then polls less often but learns of commands at once. command.to_device
+# and command.to_device_held in /api/metrics time queue → first delivery
+# for answers to ordinary and to held polls.
+LONG_HOLD_MAX = float(os.environ.get("M8_LONG_HOLD", 0))
+LONG_HOLD_RESERVE = 1.5
+LONG_HOLD_MIN = 0.5
+
+_hold_cond = threading.Condition(_lock)
+# Wake-up counters held polls watch: "" for commands, a MAC for a change of
+# its cloud record
+_hold_seq: dict[str, int] = {}
+
+
+def _wake_held(key: str = "") -> None:
+    """Release held polls waiting on `key`. Caller must hold `_lock`."""
+    _hold_seq[key] = _hold_seq.get(key, 0) + 1
+    _hold_cond.notify_all()
+
+
+def _set_pending_command(target: dict) -> None:
+    """Make `target` the injection command. Caller must hold `_lock`."""
+    global _pending_command, _pending_command_time, _pending_command_delivered
+    _pending_command = target
+    _pending_command_time = time.time()
+    _pending_command_delivered = False
+    _wake_held()
+
+
+def _note_command_delivered(held: bool, mac: str | None = None) -> None:
+    """Time from queueing the pending command (`mac`'s own, else the shared
+    one) to its first delivery."""
+    global _pending_command_delivered
+    with _lock:
+        pending = _pending_by_mac.get(mac) if mac else None
+        if pending:
+            if pending["delivered"]:
+                return
+            pending["delivered"] = True
+            latency = time.time() - pending["at"]
+        else:
+            if _pending_command is None or _pending_command_delivered:
+                return
+            _pending_command_delivered = True
+            latency = time.time() - _pending_command_time
+    _observe("command.to_device_held" if held else "command.to_device", latency)
+
+
+def _hold_poll(key: str, deadline: float) -> bool:
+    """Hold a GetDeviceData poll until something is worth sending; True if it was held."""
+    now = time.monotonic()
+    until = min(now + LONG_HOLD_MAX, deadline - LONG_HOLD_RESERVE)
+    if until - now < LONG_HOLD_MIN:
+        return False
+    with _lock:
+        if _pending_command is not None or key in _pending_by_mac:
+            return False
+        seen = (_hold_seq.get("", 0), _hold_seq.get(key, 0))
+        woken = _hold_cond.wait_for(
+            lambda: (_hold_seq.get("", 0), _hold_seq.get(key, 0)) != seen,
+            timeout=until - now,
+        )
+    _count("hold.woken" if woken else "hold.expired")
+    return True
+
+
+# ── GetDeviceData cache ───────────────────────────────────────────────────────
+# The HRV and the paired M8-E sensor poll /api/AppV2/GetDeviceData (the
+# legacy M8 /api/App/GetDeviceData) every few seconds, but the cloud record
+# behind the answer only changes when a command is issued. Each MAC's last
+# cloud answer is kept: younger than
+# DEVICE_CACHE_TTL it is served as is; older, it is still served while the
+# cloud is asked again in the background (stale-while-revalidate); past
+# DEVICE_CACHE_MAX_AGE the poll waits for the cloud like before. Local
+# commands drop every entry (a generation counter keeps refreshes that were
+# already in flight from storing the old record). If the cloud is down the
+# last answer is served whatever its age. Proxy mode only — the emulator's
+# records change with every PostDeviceData. M8_DEVICE_CACHE_TTL=0 disables it.
+DEVICE_CACHE_TTL = float(os.environ.get("M8_DEVICE_CACHE_TTL", 10))
+DEVICE_CACHE_MAX_AGE = 120
+
+_cache_lock = threading.Lock()
+# MAC (M8_KEY for the legacy M8) -> {"resp", "data_enc", "span", "plain",
+# "at"} plus the record's injection "template" once compiled
+_device_cache: dict[str, dict] = {}
+_device_cache_refreshing: set[str] = set()
+_device_cache_gen = 0
+
+
+def _device_cache_enabled() -> bool:
+    return DEVICE_CACHE_TTL > 0 and CLOUD_MODE == "proxy"
+
+
+def _device_cache_entry(resp: bytes, proto: "_DeviceProtocol") -> dict:
+    """Decode a GetDeviceData cloud answer once, for serving and injection."""
+    data_enc, span = _envelope_data(resp)
+    return {
+        "resp": resp, "data_enc": data_enc, "span": span,
+        "plain": proto.parse(data_enc) if data_enc else None,
+        "at": time.monotonic(),
+    }
+
+
+def _device_cache_put(mac: str, entry: dict, gen: int) -> None:
+    """Remember `entry` unless a command invalidated the cache since `gen`."""
+    if entry["plain"] is None or not _device_cache_enabled():
+        return
+    with _cache_lock:
+        if gen == _device_cache_gen:
+            _device_cache[mac] = entry
+
+
+def _device_cache_get(mac: str) -> tuple[dict | None, int]:
+    """Cached entry for `mac` (or None) and the current generation."""
+    with _cache_lock:
+        return _device_cache.get(mac), _device_cache_gen
+
+
+def _device_cache_drop_if_changed(mac: str, reported: dict,
+                                  proto: "_DeviceProtocol") -> None:
+    """Drop `mac`'s cached answer when the device reports a different state.
+
+    The cloud record follows PostDeviceData, so once a device has applied a
+    command (or was changed at the unit) its cached answer is out of date.
+    """
+    with _cache_lock:
+        entry = _device_cache.get(mac)
+        if entry is None or all(
+                proto.same(k, v, entry["plain"][k])
+                for k, v in reported.items() if k in entry["plain"] and k != "Mac"):
+            return
+        del _device_cache[mac]
+    _count("cache.drop")
+
+
+def _invalidate_device_cache(reason: str) -> None:
+    """Drop every cached answer; the next poll of each MAC asks the cloud."""
+    global _device_cache_gen
+    with _cache_lock:
+        _device_cache_gen += 1
+        dropped = len(_device_cache)
+        _device_cache.clear()
+    _count("cache.invalidate")
+    log.debug("[Cache] Invalidated %d entries (%s)", dropped, reason)
+
+
+def _refresh_device_cache(mac: str, path: str, body: bytes, gen: int,
+                          proto: "_DeviceProtocol") -> None:
+    """Background revalidation of one MAC's entry; one at a time per MAC."""
+    with _cache_lock:
+        if mac in _device_cache_refreshing:
+            return
+        _device_cache_refreshing.add(mac)
+
+    def run():
+        try:
+            resp = _forward_to_cloud(
+                "POST", path, body,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                host_header=proto.host,
+            )
+            if not resp:
+                _count("cache.refresh_failed")
+                return
+            entry = _device_cache_entry(resp, proto)
+            previous, _ = _device_cache_get(mac)
+            _device_cache_put(mac, entry, gen)
+            if entry["plain"] and proto.record_state:
+                proto.record_state(entry["plain"], mac=mac)
+            _count("cache.refresh")
+            if previous is None or previous["plain"] != entry["plain"]:
+                with _lock:
+                    _wake_held(mac)
+        finally:
+            with _cache_lock:
+                _device_cache_refreshing.discard(mac)
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def _local_device_data_entry(mac: str, proto: "_DeviceProtocol") -> dict | None:
+    """GetDeviceData answer built from the MAC's last reported state.
+
+    Echoes what the device already runs, so on its own it changes nothing;
+    a pending command is injected into it like into a cloud answer.
+    """
+    if proto is _M8:
+        return _device_cache_entry(_envelope(_legacy_device_record()), proto)
+    with _lock:
+        state = _device_state_by_mac.get(mac)
+        plain = {k: v for k, v in state.items() if k != "last_update"} if state else None
+    if not plain:
+        return None
+    data = proto.encrypt(json.dumps(plain, separators=(",", ":"), ensure_ascii=False))
+    return _device_cache_entry(_envelope(data), proto)
+
+
+def _forward_and_invalidate(*args) -> None:
+    """Forward a cloud write, then drop the cached answers it made stale."""
+    _forward_to_cloud(*args)
+    _invalidate_device_cache("cloud write")
+    with _lock:
+        _wake_held()
+
+
+# ── Cloud clock ───────────────────────────────────────────────────────────────
+# getCloudTimes.asp is answered from the host's UTC clock plus the offset of
+# the cloud's wall clock, which serves Taiwan time (UTC+8, no DST). In proxy
+# mode a background check compares that offset against the real cloud every
+# CLOCK_CHECK_INTERVAL and adopts the measured one when they differ by more
+# than CLOCK_DRIFT_TOLERANCE, which also absorbs a skewed host clock. The
+# cloud only reports HH:MM, so minutes are all the check can resolve.
+CLOCK_DEFAULT_OFFSET = 8 * 3600
+CLOCK_CHECK_INTERVAL = 6 * 3600
+CLOCK_DRIFT_TOLERANCE = 90
+
+_clock = {
+    "offset_s": CLOCK_DEFAULT_OFFSET,
+    "source": "default",       # "default" or "cloud"
+    "checked_at": None,        # monotonic time of the last check attempt
+    "last_drift_s": None,      # measured offset minus the offset in use then
+    "checking": False,
+}
+
+
+def _cloud_now() -> datetime:
+    """Current time on the cloud's wall clock."""
+    with _lock:
+        offset = _clock["offset_s"]
+    return datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=offset)
+
+
+def _parse_cloud_times(body: bytes) -> datetime | None:
+    """CloudDate/CloudTime from a getCloudTimes.asp answer."""
+    try:
+        result = json.loads(body)[0]["result"][0]
+        return datetime.strptime(
+            f"{result['CloudDate']} {result['CloudTime']}", "%Y/%m/%d %H:%M")
+    except Exception:
+        return None
+
+
+def _check_cloud_clock(path: str) -> None:
+    """Measure the cloud's UTC offset in the background, at most once per interval."""
+    now = time.monotonic()
+    with _lock:
+        checked_at = _clock["checked_at"]
+        if _clock["checking"] or (
+                checked_at is not None and now - checked_at < CLOCK_CHECK_INTERVAL):
+            return
+        _clock["checking"] = True
+        _clock["checked_at"] = now
+
+    def run():
+        try:
+            sent = datetime.now(timezone.utc).replace(tzinfo=None)
+            body = _cloud_request("GET", path, b"", None, CLOUD_HOST_M8)
+            received = datetime.now(timezone.utc).replace(tzinfo=None)
+            cloud = _parse_cloud_times(body) if body else None
+            if cloud is None:
+                _count("clock.check_failed")
+                return
+            # The cloud truncates to the minute: its clock read mid-minute
+            # on average, at about the midpoint of the round trip.
+            utc = sent + (received - sent) / 2
+            measured = (cloud + timedelta(seconds=30) - utc).total_seconds()
+            _count("clock.check")
+            with _lock:
+                drift = measured - _clock["offset_s"]
+                _clock["last_drift_s"] = round(drift)
+                if abs(drift) > CLOCK_DRIFT_TOLERANCE:
+                    _clock["offset_s"] = round(measured / 60) * 60
+                    _clock["source"] = "cloud"
+                    log.warning("[Clock] Cloud clock is %+.0fs off ours, offset now UTC%+.2fh",
+                                drift, _clock["offset_s"] / 3600)
+        finally:
+            with _lock:
+                _clock["checking"] = False
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+# ── Local cloud emulation ─────────────────────────────────────────────────────
+# Per-MAC records the emulator keeps in place of the cloud database. Each
+# Post<Name> request stores its decrypted RA under record[<Name>]; the matching
+# Get<Name> serves it back re-encrypted. That pairing holds for every endpoint
+# the firmware uses: PostDeviceData ↔ GetDeviceData, PostAirIndex ↔
+# GetAirIndex, PostDeviceConsumablesTime ↔ GetDeviceConsumablesTime.
+_cloud_records: dict[str, dict] = {}
+
+_OK_ENVELOPE = {"ErrorMessage": "OK", "ResponseCode": 200, "data": None}
+
+
+def _cloud_times_response() -> bytes:
+    """getCloudTimes.asp body, built from the synchronized local clock."""
+    now = _cloud_now()
+    resp = [{
+        "message": "99.取值成功!",
+        "success": True,
+        "result": [{
+            "CloudDate": now.strftime("%Y/%m/%d"),
+            "CloudTime": now.strftime("%H:%M"),
+        }],
+    }]
+    return json.dumps(resp, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _envelope(data: str | None) -> bytes:
+    return json.dumps({**_OK_ENVELOPE, "data": data},
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _emulate_cloud(method: str, path: str, body: bytes) -> bytes | None:
+    """Answer a device-facing cloud request from `_cloud_records`.
+
+    Covers getCloudTimes plus Post*/Get* under both /api/App (legacy M8,
+    CBC) and /api/AppV2 (M8-E, ECB). Anything else returns None.
+    """
+    if path.startswith("/app/getCloudTimes.asp"):
+        return _cloud_times_response()
+    if method != "POST":
+        return None
+    if path.startswith("/api/AppV2/"):
+        legacy = False
+    elif path.startswith("/api/App/"):
+        legacy = True
+    else:
+        return None
+
+    endpoint = path.rsplit("/", 1)[-1]
+    form = _scan_form(body)
+    if endpoint.startswith("Post"):
+        data = device_decrypt(form.get("RA", ""))
+        if not isinstance(data, dict):
+            return _envelope(None)
+        mac = data.get("Mac") or form.get("md_mac") or form.get("Mac") or ""
+        key = mac.strip().upper() if not legacy else "M8"
+        with _lock:
+            record = _cloud_records.setdefault(key, {})
+            record[endpoint[4:]] = data
+        return _envelope(None)
+
+    if not endpoint.startswith("Get"):
+        return _envelope(None)
+
+    if legacy:
+        # Legacy GetDeviceData carries the cloud's command format, which
+        # _legacy_device_record already produces from the stored state.
+        if endpoint == "GetDeviceData":
+            return _envelope(_legacy_device_record())
+        return _envelope(None)
+
+    mac = (device_decrypt_raw(form.get("Mac", "")) or "").strip().upper()
+    with _lock:
+        stored = _cloud_records.get(mac, {}).get(endpoint[3:])
+    if stored is None:
+        return _envelope(None)
+    return _envelope(device_encrypt_ecb(
+        json.dumps(stored, separators=(",", ":"), ensure_ascii=False)))
+
+
 def _set_sensor_m8e(data: dict, mac: str | None = None) -> None:
     """Update per-MAC sensor state from a PostAirIndex plaintext payload.
 
@@ -285,6 +963,7 @@ def _set_sensor_m8e(data: dict, mac: str | None = None) -> None:
     We store both under their own MAC and rebuild a merged view for readers.
     """
     mac_key = (mac or data.get("Mac") or "unknown").upper()
+    pushed = {}
     with _lock:
         slot = _sensor_by_mac.setdefault(mac_key, dict(_SENSOR_TEMPLATE))
         for in_key, out_key in (
@@ -294,9 +973,10 @@ def _set_sensor_m8e(data: dict, mac: str | None = None) -> None:
             ("TempRA", "temp_ra"), ("TempEX", "temp_ex"),
         ):
             if in_key in data:
-                slot[out_key] = data.get(in_key)
+                slot[out_key] = pushed[out_key] = data.get(in_key)
         slot["last_update"] = datetime.now().isoformat()
         _rebuild_merged_sensor()
+    _record_history(mac_key, pushed)
     log.info("[AirIndex %s] CO2=%s PM2.5=%s Temp=%s RH=%s OA=%s SA=%s RA=%s EX=%s",
              mac_key[-8:] if mac_key != "UNKNOWN" else "unknown",
              data.get("Co2"), data.get("PM25"), data.get("Temp"), data.get("RH"),
@@ -349,13 +1029,18 @@ def _is_hrv_device_state(data: dict) -> bool:
     return "valveangle" in data or "Function" in data
 
 
-def _set_device_state_m8e(data: dict) -> None:
+def _set_device_state_m8e(data: dict, mac: str | None = None) -> None:
     """Update shared device state from M8-E GetDeviceData plaintext.
 
-    Ignores responses that don't look like the HRV main unit (e.g. the
-    paired M8-E sensor module's stub state) so the two devices don't
-    flip-flop our stored state.
+    The per-MAC slot is always updated. The shared `_device_state` ignores
+    responses that don't look like the HRV main unit (e.g. the paired M8-E
+    sensor module's stub state) so the two devices don't flip-flop it.
     """
+    if mac:
+        with _lock:
+            slot = _device_state_by_mac.setdefault(mac.upper(), {})
+            slot.update(data)
+            slot["last_update"] = datetime.now().isoformat()
     if not _is_hrv_device_state(data):
         log.debug("[DeviceData ignored] non-HRV source: %s", data)
         return
@@ -369,47 +1054,186 @@ def _set_device_state_m8e(data: dict) -> None:
              data.get("Function"), data.get("Auto"), data.get("valveangle"))
 
 
-def _inject_appv2_command(cloud_resp: bytes) -> bytes:
-    """If a pending HA command exists, replace the encrypted data field in
-    the cloud's GetDeviceData response with an ECB-encrypted modified version.
-    Leaves the outer cloud JSON envelope intact."""
+def _resolve_mac(mac: str) -> str | None:
+    """Key of a device seen on port 80 matching `mac`, with or without colons.
+
+    Caller must hold `_lock`.
+    """
+    if mac in _device_state_by_mac:
+        return mac
+    bare = mac.replace(":", "")
+    for key in _device_state_by_mac:
+        if key.replace(":", "") == bare:
+            return key
+    return None
+
+
+def _pending_for(mac: str | None) -> dict | None:
+    """Live per-MAC pending entry, dropping it once expired. Caller must hold `_lock`."""
+    pending = _pending_by_mac.get(mac) if mac else None
+    if pending and time.time() - pending["at"] > PENDING_COMMAND_TTL:
+        del _pending_by_mac[mac]
+        log.warning("[Cmd %s] Not confirmed in %ds, dropped: %s",
+                    mac[-8:], PENDING_COMMAND_TTL, pending["target"])
+        return None
+    return pending
+
+
+# ── Command injection ─────────────────────────────────────────────────────────
+# A pending command reaches a device by rewriting the `data` record of its
+# GetDeviceData answer. Both families go through the same engine: the record
+# is decrypted and parsed once (and kept with the cached answer), compiled on
+# first use into a %-template with a slot per command key, and each injection
+# just fills the slots and re-encrypts. What differs per family lives in a
+# _DeviceProtocol: the cipher, the cloud vhost, the command fields the
+# firmware takes and how it spells them — the legacy M8 wants IsPower as a
+# JSON boolean under CBC, the M8-E "1"/"0" strings under ECB — and how its
+# reported state confirms a command.
+_encode_json = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _flag_int(value) -> int | None:
+    """A reported or commanded value as an int (booleans and "true"/"false" too)."""
+    if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+        return int(value.strip().lower() == "true")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class _DeviceProtocol:
+    """GetDeviceData record format of one device family."""
+
+    def __init__(self, name: str, host: str, fields: dict, power: tuple[str, str],
+                 encrypt, decrypt, mode_aliases: bool = False,
+                 shared_marker: str | None = None, record_state=None):
+        self.name = name
+        self.host = host
+        self.fields = fields            # command field -> record key
+        self.power = power              # IsPower off/on as JSON
+        self.encrypt = encrypt
+        self.decrypt = decrypt
+        self.mode_aliases = mode_aliases  # reports Mode 17–19 for 1–3
+        # Record key the shared `_pending_command` needs (None: every record)
+        self.shared_marker = shared_marker
+        # Called with each cloud record and its MAC, if the record is state
+        self.record_state = record_state
+        self._slot_keys = frozenset(fields.values())
+
+    def parse(self, data_enc: str) -> dict | None:
+        """Decrypted `data` as a non-empty record, else None."""
+        text = self.decrypt(data_enc)
+        try:
+            plain = json.loads(text) if text else None
+        except ValueError:
+            return None
+        return plain if isinstance(plain, dict) and plain else None
+
+    def compile(self, plain: dict) -> tuple[str, tuple, tuple]:
+        """`plain` as a %-template with a slot per command key, in record order."""
+        parts, slots, values = [], [], []
+        for key, value in plain.items():
+            if key in self._slot_keys:
+                parts.append(_encode_json(key) + ":%s")
+                slots.append(key)
+                values.append(_encode_json(value))
+            else:
+                parts.append(f"{_encode_json(key)}:{_encode_json(value)}".replace("%", "%%"))
+        return "{" + ",".join(parts) + "}", tuple(slots), tuple(values)
+
+    def encode(self, field: str, value) -> str:
+        """A command value as this family's JSON."""
+        if field == "ispower":
+            return self.power[1 if int(value) else 0]
+        return '"%d"' % int(value)
+
+    def render(self, entry: dict, cmd: dict) -> str:
+        """Encrypted `data` of the entry's record with `cmd` written over it."""
+        template = entry.get("template")
+        if template is None:
+            template = entry["template"] = self.compile(entry["plain"])
+        text, slots, values = template
+        overrides = {self.fields[f]: self.encode(f, v) for f, v in cmd.items()}
+        text = text % tuple(overrides.pop(k, v) for k, v in zip(slots, values))
+        if overrides:
+            # Keys the cloud record lacks go at the end
+            text = text[:-1] + "".join(
+                f",{_encode_json(k)}:{v}" for k, v in overrides.items()) + "}"
+        return self.encrypt(text)
+
+    def same(self, key: str, reported, value) -> bool:
+        """Whether a reported record value equals `value`."""
+        a, b = _flag_int(reported), _flag_int(value)
+        if a is None or b is None:
+            return str(reported) == str(value)
+        return a == b or (self.mode_aliases and key == "Mode" and a == b + 16)
+
+    def confirmed(self, state: dict, cmd: dict) -> bool:
+        """Whether reported `state` (record keys) already carries out `cmd`."""
+        return all(
+            self.same(self.fields[f], state.get(self.fields[f]), v)
+            for f, v in cmd.items())
+
+
+_M8 = _DeviceProtocol(
+    "M8", CLOUD_HOST_M8,
+    {"ispower": "IsPower", "mode": "Mode", "speed": "Speed"}, ("false", "true"),
+    device_encrypt, device_decrypt_cbc, mode_aliases=True,
+)
+_M8E = _DeviceProtocol(
+    "M8-E", CLOUD_HOST_M8E, _COMMAND_FIELDS, ('"0"', '"1"'),
+    device_encrypt_ecb, device_decrypt_ecb,
+    shared_marker="valveangle", record_state=_set_device_state_m8e,
+)
+# Device cache / hold key of the legacy M8, which identifies by mdid
+M8_KEY = "M8"
+
+
+def _shared_state() -> dict:
+    """`_device_state` under record keys. Caller must hold `_lock`."""
+    return {"IsPower": _device_state.get("ispower"),
+            "Mode": _device_state.get("mode"),
+            "Speed": _device_state.get("speed")}
+
+
+def _inject_command(entry: dict, key: str, proto: _DeviceProtocol) -> bytes:
+    """`entry`'s GetDeviceData answer with any pending HA command injected.
+
+    `key`'s own pending command wins; the shared `_pending_command` goes to
+    records with the protocol's marker (the M8-E HRV main unit's
+    `valveangle`, any legacy M8 record). Only the encrypted `data` value
+    changes; the cloud's envelope is kept byte for byte. A command the
+    reported state already matches is cleared.
+    """
     global _pending_command
     with _lock:
-        cmd = _pending_command
+        pending = _pending_for(key)
+        shared = _pending_command
+        if pending:
+            cmd = pending["target"]
+        elif shared and (proto.shared_marker is None
+                         or proto.shared_marker in entry["plain"]):
+            cmd = {f: v for f, v in shared.items() if f in proto.fields}
+        else:
+            cmd = None
     if not cmd:
-        return cloud_resp
-    try:
-        j = json.loads(cloud_resp)
-    except Exception:
-        return cloud_resp
-    enc_data = j.get("data") if isinstance(j, dict) else None
-    if not isinstance(enc_data, str) or not enc_data:
-        return cloud_resp
-    plain = device_decrypt_raw(enc_data)
-    if not plain:
-        return cloud_resp
-    try:
-        obj = json.loads(plain)
-    except Exception:
-        return cloud_resp
-    # Apply overrides
-    obj["IsPower"] = "1" if int(cmd.get("ispower", 1)) else "0"
-    obj["Mode"]    = str(int(cmd.get("mode", 2)))
-    obj["Speed"]   = str(int(cmd.get("speed", 1)))
-    new_plain = json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
-    new_enc = device_encrypt_ecb(new_plain)
-    # Replace encrypted data value in raw bytes preserving envelope
-    injected = cloud_resp.replace(
-        enc_data.encode("utf-8"), new_enc.encode("utf-8")
-    )
-    log.info("[HA→M8-E] Inject IsPower=%s Mode=%s Speed=%s (plain=%s)",
-             obj["IsPower"], obj["Mode"], obj["Speed"], new_plain)
-    # Clear pending if current device state already matches
+        return entry["resp"]
+    new_enc = proto.render(entry, cmd)
+    if entry["span"]:
+        injected = _splice_envelope(entry["resp"], entry["span"], new_enc)
+    else:
+        injected = entry["resp"].replace(entry["data_enc"].encode(), new_enc.encode())
+    label = key[-8:] if pending else "shared"
+    log.info("[HA→%s %s] Inject %s", proto.name, label,
+             {proto.fields[f]: v for f, v in cmd.items()})
     with _lock:
-        ds = _device_state
-        if (str(ds.get("ispower")) == obj["IsPower"] and
-            str(ds.get("mode"))    == obj["Mode"] and
-            str(ds.get("speed"))   == obj["Speed"]):
+        if pending:
+            if (_pending_by_mac.get(key) is pending and
+                    proto.confirmed(_device_state_by_mac.get(key) or {}, cmd)):
+                del _pending_by_mac[key]
+                log.info("[Cmd✓ %s] Device matches target, cleared pending", label)
+        elif _pending_command is shared and proto.confirmed(_shared_state(), cmd):
             _pending_command = None
             log.info("[Cmd✓] Device matches target, cleared pending")
     return injected
@@ -420,6 +1244,136 @@ def _parse_form(body_bytes: bytes) -> dict:
     return {k: v[0] for k, v in qs.items()}
 
 
+# ── Lean request pipeline ──────────────────────────────────────────────────────
+# The device handlers only ever look at a handful of form fields and at the
+# base64 `data` string of the cloud envelope. Scanning for those directly
+# avoids decoding the whole body, parse_qs' per-field lists, and a json.loads
+# of every cloud response just to find (and later bytes.replace) one value.
+_FORM_FIELDS = frozenset((
+    b"RA", b"Mac", b"u_id", b"AuthCode",
+    # legacy M8 device identity, see _save_device_info
+    b"mdid", b"device_id", b"DeviceId", b"md_mac", b"mac",
+))
+_DATA_KEY = b'"data":"'
+
+
+def _scan_form(body: bytes) -> dict:
+    """Single pass over a urlencoded body, keeping only `_FORM_FIELDS`.
+
+    First occurrence wins and values are unquoted like parse_qs does.
+    """
+    form = {}
+    pos, end = 0, len(body)
+    while pos < end:
+        amp = body.find(b"&", pos)
+        if amp < 0:
+            amp = end
+        eq = body.find(b"=", pos, amp)
+        if eq > 0:
+            key = body[pos:eq]
+            if key in _FORM_FIELDS:
+                name = key.decode("ascii")
+                if name not in form:
+                    value = body[eq + 1:amp]
+                    if b"%" in value or b"+" in value:
+                        form[name] = unquote_plus(value.decode("ascii", errors="replace"))
+                    else:
+                        form[name] = value.decode("ascii", errors="replace")
+        pos = amp + 1
+    return form
+
+
+def _envelope_data_span(resp: bytes) -> tuple[int, int] | None:
+    """Offsets of the `data` string value inside a compact cloud envelope,
+    or None when it is null, absent, escaped or laid out differently."""
+    start = resp.find(_DATA_KEY)
+    if start < 0:
+        return None
+    start += len(_DATA_KEY)
+    stop = resp.find(b'"', start)
+    if stop <= start or resp.find(b"\\", start, stop) >= 0:
+        return None
+    return start, stop
+
+
+def _envelope_data(resp: bytes) -> tuple[str | None, tuple[int, int] | None]:
+    """The envelope's encrypted `data` value and its span for splicing.
+
+    Falls back to json.loads for envelopes the fast path does not recognise;
+    those can be read but not spliced (span None).
+    """
+    span = _envelope_data_span(resp)
+    if span:
+        return resp[span[0]:span[1]].decode("ascii", errors="replace"), span
+    try:
+        j = json.loads(resp)
+    except Exception:
+        return None, None
+    data = j.get("data") if isinstance(j, dict) else None
+    return (data if isinstance(data, str) and data else None), None
+
+
+def _splice_envelope(resp: bytes, span: tuple[int, int], data: str) -> bytes:
+    """Replace the `data` value at `span`, leaving the rest byte-for-byte."""
+    return b"".join((resp[:span[0]], data.encode("ascii"), resp[span[1]:]))
+
+
+# ── Traffic capture ───────────────────────────────────────────────────────────
+# M8_CAPTURE_FILE=/config/m8_capture.jsonl writes one compact JSON line per
+# device request: path, form, decrypted RA/Mac, cloud response, our response
+# and timings. The file rotates at M8_CAPTURE_MAX_BYTES and rotated files are
+# gzipped. m8_replay.py plays a capture back through the handlers.
+CAPTURE_FILE = os.environ.get("M8_CAPTURE_FILE", "").strip()
+CAPTURE_MAX_BYTES = int(os.environ.get("M8_CAPTURE_MAX_BYTES", 5 * 1024 * 1024))
+CAPTURE_BACKUPS = 5
+
+_capture_log: logging.Logger | None = None
+# Per-handler-thread scratch for the request being captured
+_capture_ctx = threading.local()
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def _init_capture(path: str) -> None:
+    global _capture_log
+    handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=CAPTURE_MAX_BYTES, backupCount=CAPTURE_BACKUPS, encoding="utf-8",
+    )
+    handler.namer = lambda name: name + ".gz"
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    cap = logging.getLogger("m8-capture")
+    cap.propagate = False
+    cap.setLevel(logging.INFO)
+    cap.handlers[:] = [handler]
+    _capture_log = cap
+
+
+def _capture_write(method: str, path: str, ctx) -> None:
+    def text(b):
+        return b.decode("utf-8", errors="replace") if b is not None else None
+
+    form = _parse_form(ctx.body) if ctx.body else {}
+    record = {
+        "ts": round(ctx.ts, 3),
+        "method": method,
+        "path": path,
+        "form": form,
+        "ra": device_decrypt_raw(form["RA"]) if form.get("RA") else None,
+        "mac": device_decrypt_raw(form["Mac"]) if form.get("Mac") else None,
+        "cloud": text(ctx.cloud),
+        "cloud_ms": round(ctx.cloud_ms, 2) if ctx.cloud_ms is not None else None,
+        "status": ctx.status,
+        "resp": text(ctx.resp),
+        "ms": round((time.perf_counter() - ctx.t0) * 1000, 2),
+    }
+    _capture_log.info(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+
+
 class M8Handler(BaseHTTPRequestHandler):
     """Handles all requests from the M8 device on port 80."""
     protocol_version = "HTTP/1.1"
@@ -428,29 +1382,75 @@ class M8Handler(BaseHTTPRequestHandler):
     def log_message(self, fmt, *args):
         pass
 
+    def handle_one_request(self):
+        if _capture_log is None:
+            return super().handle_one_request()
+        ctx = _capture_ctx
+        ctx.active = True
+        ctx.ts = time.time()
+        ctx.t0 = time.perf_counter()
+        ctx.body = b""
+        ctx.cloud = ctx.cloud_ms = ctx.resp = ctx.status = None
+        try:
+            super().handle_one_request()
+        finally:
+            ctx.active = False
+            if self.raw_requestline and self.command:
+                try:
+                    _capture_write(self.command, self.path, ctx)
+                except Exception as e:
+                    log.debug("Capture write failed: %s", e)
+
     def _read_body(self) -> bytes:
         length = int(self.headers.get("Content-Length", 0))
-        return self.rfile.read(length) if length else b""
+        body = self.rfile.read(length) if length else b""
+        self._received_at = time.monotonic()
+        self._deadline = _device_deadline(self.client_address[0], self._received_at)
+        self._held = False
+        if getattr(_capture_ctx, "active", False):
+            _capture_ctx.body = body
+        return body
 
     def _send_json(self, obj, content_type="application/json", status=200):
         body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._send_body(body, content_type=content_type, status=status)
+
+    def _send_body(self, body: bytes, content_type="application/json", status=200):
+        if getattr(_capture_ctx, "active", False):
+            _capture_ctx.resp = body
+            _capture_ctx.status = status
+        name = _endpoint_name(self.path)
+        elapsed = time.monotonic() - self._received_at
+        if elapsed > DEADLINE_CHECK_AFTER and not self._device_waiting(name, elapsed):
+            self.close_connection = True
+            return
         self.send_response(status)
         self.send_header("Content-Type", f"{content_type}; charset=utf-8")
         self.send_header("Content-Length", str(len(body)))
         self.end_headers()
         self.wfile.write(body)
+        _observe(f"device.{name}", time.monotonic() - self._received_at)
+
+    def _device_waiting(self, name: str, elapsed: float) -> bool:
+        """Whether the device is still there for a slow answer; learns its timeout."""
+        ip = self.client_address[0]
+        if _peer_closed(self.connection):
+            _count(f"deadline.gave_up.{name}")
+            _learn_device_timeout(ip, elapsed, waited=False)
+            return False
+        if time.monotonic() > self._deadline:
+            _count(f"deadline.miss.{name}")
+        _learn_device_timeout(ip, elapsed, waited=True)
+        return True
 
     def _proxy_response(self, method, path, body=b""):
         """Forward to cloud and send response back to M8."""
         ct = self.headers.get("Content-Type", "")
         cloud_resp = _forward_to_cloud(method, path, body,
-                                        {"Content-Type": ct} if ct else None)
+                                        {"Content-Type": ct} if ct else None,
+                                        deadline=self._deadline)
         if cloud_resp:
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json; charset=utf-8")
-            self.send_header("Content-Length", str(len(cloud_resp)))
-            self.end_headers()
-            self.wfile.write(cloud_resp)
+            self._send_body(cloud_resp)
         else:
             # Cloud unreachable, fall back to local response
             return False
@@ -459,19 +1459,11 @@ class M8Handler(BaseHTTPRequestHandler):
     def do_GET(self):
         path = urlparse(self.path).path
         if path == "/app/getCloudTimes.asp":
-            # Try cloud first, fall back to local
-            body = self._read_body()
-            if not self._proxy_response("GET", self.path):
-                now = datetime.now()
-                resp = [{
-                    "message": "99.取值成功!",
-                    "success": True,
-                    "result": [{
-                        "CloudDate": now.strftime("%Y/%m/%d"),
-                        "CloudTime": now.strftime("%H:%M"),
-                    }],
-                }]
-                self._send_json(resp, content_type="text/html")
+            # Always answered locally; the cloud is only asked for drift checks
+            self._read_body()
+            self._send_body(_cloud_times_response(), content_type="text/html")
+            if CLOUD_MODE == "proxy":
+                _check_cloud_clock(self.path)
         else:
             self.send_response(404)
             self.end_headers()
@@ -479,13 +1471,10 @@ class M8Handler(BaseHTTPRequestHandler):
     def _proxy_or_local(self, method, path, body):
         """Forward to cloud; if cloud is down, return local OK response."""
         cloud_resp = _forward_to_cloud(method, path, body,
-                                        {"Content-Type": "application/x-www-form-urlencoded"})
+                                        {"Content-Type": "application/x-www-form-urlencoded"},
+                                        deadline=self._deadline)
         if cloud_resp:
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json; charset=utf-8")
-            self.send_header("Content-Length", str(len(cloud_resp)))
-            self.end_headers()
-            self.wfile.write(cloud_resp)
+            self._send_body(cloud_resp)
         else:
             self._send_json({"ErrorMessage":"OK","ResponseCode":200,"data":None})
 
@@ -515,7 +1504,7 @@ class M8Handler(BaseHTTPRequestHandler):
     def do_POST(self):
         path = urlparse(self.path).path
         body = self._read_body()
-        form = _parse_form(body)
+        form = _scan_form(body)
         self._save_device_info(form)
 
         if path == "/api/App/PostDeviceStatus":
@@ -528,82 +1517,17 @@ class M8Handler(BaseHTTPRequestHandler):
             data = device_decrypt(form.get("RA", ""))
             if data:
                 _set_device_state(data)
+                reported = dict(data)
+                if "Ispower" in reported:
+                    reported["IsPower"] = reported.pop("Ispower")
+                _device_cache_drop_if_changed(M8_KEY, reported, _M8)
             self._proxy_or_local("POST", path, body)
 
         elif path == "/api/App/GetDeviceData":
-            global _pending_command
-            # Always get cloud response first
-            cloud_resp = _forward_to_cloud("POST", path, body,
-                                            {"Content-Type": "application/x-www-form-urlencoded"})
-            cloud_data_enc = None  # encrypted data field from cloud
-            if cloud_resp:
-                try:
-                    cloud_json = json.loads(cloud_resp)
-                    cloud_data_enc = cloud_json.get("data")
-                    if cloud_data_enc:
-                        cloud_dec = device_decrypt(cloud_data_enc)
-                        log.info("[Cloud→M8] %s", cloud_dec)
-                except Exception:
-                    pass
-
-            with _lock:
-                cmd = _pending_command
-
-            if cmd and cloud_resp and cloud_data_enc:
-                # Inject: replace "data" value in cloud's RAW response bytes
-                # This preserves exact cloud JSON format (compact, key order, etc.)
-                cloud_raw_text = device_decrypt_raw(cloud_data_enc)
-                if cloud_raw_text:
-                    modified = cloud_raw_text
-                    modified = re.sub(r'"Speed"\s*:\s*"[^"]*"',
-                                      f'"Speed":"{cmd.get("speed", 1)}"', modified)
-                    modified = re.sub(r'"Mode"\s*:\s*"[^"]*"',
-                                      f'"Mode":"{cmd.get("mode", 3)}"', modified)
-                    power_str = "true" if cmd.get("ispower", 1) else "false"
-                    modified = re.sub(r'"IsPower"\s*:\s*(true|false)',
-                                      f'"IsPower":{power_str}', modified)
-                    new_enc = device_encrypt(modified)
-                    # Replace data value in cloud's raw bytes, preserving outer format
-                    injected = cloud_resp.replace(
-                        cloud_data_enc.encode() if isinstance(cloud_data_enc, str)
-                        else cloud_data_enc,
-                        new_enc.encode(),
-                    )
-                    log.info("[HA→M8] Injecting speed=%s mode=%s (len %d→%d)",
-                             cmd.get("speed"), cmd.get("mode"),
-                             len(cloud_resp), len(injected))
-                    self.send_response(200)
-                    self.send_header("Content-Type", "application/json; charset=utf-8")
-                    self.send_header("Content-Length", str(len(injected)))
-                    self.end_headers()
-                    self.wfile.write(injected)
-                else:
-                    # Can't decrypt cloud data, send raw cloud response
-                    self.send_response(200)
-                    self.send_header("Content-Type", "application/json; charset=utf-8")
-                    self.send_header("Content-Length", str(len(cloud_resp)))
-                    self.end_headers()
-                    self.wfile.write(cloud_resp)
-                # Log device state (pending stays until replaced by new command)
-                dev_speed = _device_state.get("speed")
-                dev_mode = _device_state.get("mode")
-                log.debug("[Cmd] Injecting: target speed=%s mode=%s, device speed=%s mode=%s",
-                          cmd.get("speed"), cmd.get("mode"), dev_speed, dev_mode)
-            elif cmd:
-                # Cloud unreachable + HA command → pure local mode
-                cmd_enc = _build_command_payload()
-                self._send_json({"ErrorMessage":"OK","ResponseCode":200,"data":cmd_enc})
-            elif cloud_resp:
-                # No HA command → pass through cloud response exactly
-                self.send_response(200)
-                self.send_header("Content-Type", "application/json; charset=utf-8")
-                self.send_header("Content-Length", str(len(cloud_resp)))
-                self.end_headers()
-                self.wfile.write(cloud_resp)
-            else:
-                # Cloud unreachable + no command → echo current state
-                cmd_enc = _build_command_payload()
-                self._send_json({"ErrorMessage":"OK","ResponseCode":200,"data":cmd_enc})
+            if LONG_HOLD_MAX > 0:
+                self._hold_device_data(path, body, M8_KEY, _M8)
+            # Never None: without a cloud answer the M8's own state is echoed
+            self._send_body(self._device_data_response(path, body, M8_KEY, _M8))
 
         elif path.startswith("/api/AppV2/"):
             self._handle_appv2(path, body, form)
@@ -619,12 +1543,12 @@ class M8Handler(BaseHTTPRequestHandler):
 
         Pipeline:
           1. Decrypt incoming RA/Mac, update shared sensor/device state.
-          2. Forward original body to dm03 cloud with correct Host header.
+          2. Forward original body to dm03 cloud with correct Host header
+             (GetDeviceData: answered from the per-MAC cache when possible).
           3. For GetDeviceData, decode cloud response and optionally inject
              pending HA command by rewriting the encrypted data field.
           4. Return (possibly modified) cloud response to the device.
         """
-        global _pending_command
         endpoint = path.rsplit("/", 1)[-1]
 
         # 1. Incoming payload
@@ -654,40 +1578,387 @@ class M8Handler(BaseHTTPRequestHandler):
         elif endpoint == "PostDeviceConsumablesTime" and req_obj:
             log.info("[Consumables %s] %s",
                      (source_mac or "unknown")[-8:], req_obj)
+            if source_mac:
+                with _lock:
+                    _consumables_by_mac[source_mac.upper()] = dict(req_obj)
         elif endpoint == "PostDeviceData" and req_obj:
-            _set_device_state_m8e(req_obj)
+            _set_device_state_m8e(req_obj, mac=source_mac)
+            if source_mac:
+                _device_cache_drop_if_changed(source_mac.upper(), req_obj, _M8E)
+
+        if endpoint == "GetDeviceData" and source_mac:
+            if LONG_HOLD_MAX > 0:
+                self._hold_device_data(path, body, source_mac.upper(), _M8E)
+            resp = self._device_data_response(path, body, source_mac.upper(), _M8E)
+            if resp:
+                self._send_body(resp)
+            else:
+                self._send_json({"ErrorMessage": "OK", "ResponseCode": 200, "data": None})
+            return
 
         # 2. Forward to dm03 cloud
         cloud_resp = _forward_to_cloud(
             "POST", path, body,
             headers={"Content-Type": "application/x-www-form-urlencoded"},
             host_header=CLOUD_HOST_M8E,
+            deadline=self._deadline,
         )
 
         # 3. Decode cloud response to update state (GetDeviceData) & inject
         if cloud_resp:
-            try:
-                jr = json.loads(cloud_resp)
-                data_enc = jr.get("data") if isinstance(jr, dict) else None
-                if isinstance(data_enc, str) and data_enc:
-                    plain = device_decrypt(data_enc)
-                    if plain and endpoint == "GetDeviceData":
-                        _set_device_state_m8e(plain)
-            except Exception:
-                pass
-
             if endpoint == "GetDeviceData":
-                cloud_resp = _inject_appv2_command(cloud_resp)
+                entry = _device_cache_entry(cloud_resp, _M8E)
+                if entry["plain"]:
+                    _set_device_state_m8e(entry["plain"], mac=source_mac)
+                    cloud_resp = _inject_command(entry, "", _M8E)
 
-            self.send_response(200)
-            self.send_header("Content-Type", "application/json; charset=utf-8")
-            self.send_header("Content-Length", str(len(cloud_resp)))
-            self.end_headers()
-            self.wfile.write(cloud_resp)
+            self._send_body(cloud_resp)
         else:
             # Cloud unreachable → minimal OK envelope so device keeps functioning
             self._send_json({"ErrorMessage": "OK", "ResponseCode": 200, "data": None})
 
+    def _device_data_response(self, path: str, body: bytes, mac: str,
+                              proto: _DeviceProtocol) -> bytes | None:
+        """GetDeviceData answer for `mac` with any pending command injected.
+
+        Served from the per-MAC cache when it is young enough (revalidated in
+        the background once past the TTL), otherwise from the cloud. When
+        the cloud is unreachable or the request's deadline runs out, the
+        cached answer of any age or one built from the MAC's last reported
+        state; None if there is neither.
+        """
+        entry, gen = _device_cache_get(mac)
+        age = time.monotonic() - entry["at"] if entry else None
+        if entry is None or age >= DEVICE_CACHE_MAX_AGE:
+            cloud_resp = _forward_to_cloud(
+                "POST", path, body,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                host_header=proto.host,
+                deadline=self._deadline,
+            )
+            if cloud_resp:
+                if _device_cache_enabled():
+                    _count("cache.miss")
+                entry = _device_cache_entry(cloud_resp, proto)
+                _device_cache_put(mac, entry, gen)
+                log.debug("[Cloud→%s] %s", proto.name, entry["plain"])
+                if entry["plain"] and proto.record_state:
+                    proto.record_state(entry["plain"], mac=mac)
+            elif entry is not None:
+                _count("cache.fallback")
+                log.info("[Cache %s] No cloud answer, serving %.0fs old answer",
+                         mac[-8:], age)
+            else:
+                entry = _local_device_data_entry(mac, proto)
+                if entry is None:
+                    return None
+                _count("local.GetDeviceData")
+        elif age >= DEVICE_CACHE_TTL:
+            _count("cache.stale")
+            _refresh_device_cache(mac, path, body, gen, proto)
+        else:
+            _count("cache.hit")
+
+        if entry["plain"] is None:
+            return entry["resp"]
+        resp = _inject_command(entry, mac, proto)
+        if resp is not entry["resp"]:
+            _note_command_delivered(self._held, mac)
+        return resp
+
+    def _hold_device_data(self, path: str, body: bytes, mac: str,
+                          proto: _DeviceProtocol) -> None:
+        """Long-hold a GetDeviceData poll, revalidating its cache meanwhile."""
+        entry, gen = _device_cache_get(mac)
+        if _device_cache_enabled() and (
+                entry is None or time.monotonic() - entry["at"] >= DEVICE_CACHE_TTL):
+            _refresh_device_cache(mac, path, body, gen, proto)
+        self._held = _hold_poll(mac, self._deadline)
+
+
+# ── Sensor history ─────────────────────────────────────────────────────────────
+# Each PostAirIndex reading is folded into per-MAC, per-field rollups as it
+# arrives: a raw ring buffer plus 1 min / 1 h / 1 day buckets holding
+# [start, min, max, sum, count, last]. /api/history answers chart queries from
+# the coarsest rollup that still resolves the requested bucket, so a week of
+# CO2 is a few hundred rows instead of every 10 s sample. Memory only; the
+# series start over when the add-on restarts.
+_HISTORY_FIELDS = ("co2", "pm25", "temp", "rh", "temp_oa", "temp_sa", "temp_ra", "temp_ex")
+_HISTORY_RAW_KEEP = 4320  # ~12 h at one PostAirIndex per 10 s
+# (name, bucket width s, buckets kept)
+_HISTORY_ROLLUPS = (("1m", 60, 2 * 1440), ("1h", 3600, 90 * 24), ("1d", 86400, 2 * 365))
+
+_history_lock = threading.Lock()
+# mac -> field -> {"raw": deque[(ts, value)], "1m": deque[bucket], "1h": ..., "1d": ...}
+_history: dict[str, dict[str, dict[str, deque]]] = {}
+
+
+def _record_history(mac: str, values: dict, ts: float | None = None) -> None:
+    """Append one reading per numeric field and update its open buckets."""
+    ts = time.time() if ts is None else ts
+    with _history_lock:
+        by_field = _history.setdefault(mac, {})
+        for field in _HISTORY_FIELDS:
+            try:
+                value = float(values[field])
+            except (KeyError, TypeError, ValueError):
+                continue
+            series = by_field.get(field)
+            if series is None:
+                series = {"raw": deque(maxlen=_HISTORY_RAW_KEEP)}
+                for name, _, keep in _HISTORY_ROLLUPS:
+                    series[name] = deque(maxlen=keep)
+                by_field[field] = series
+            series["raw"].append((ts, value))
+            for name, width, _ in _HISTORY_ROLLUPS:
+                start = ts - ts % width
+                buckets = series[name]
+                b = buckets[-1] if buckets else None
+                if b is not None and b[0] == start:
+                    if value < b[1]:
+                        b[1] = value
+                    if value > b[2]:
+                        b[2] = value
+                    b[3] += value
+                    b[4] += 1
+                    b[5] = value
+                else:
+                    buckets.append([start, value, value, value, 1, value])
+
+
+def _lttb(data: list, threshold: int) -> list:
+    """Largest-Triangle-Three-Buckets downsampling of [(ts, value), ...]."""
+    n = len(data)
+    if threshold >= n or threshold < 3:
+        return list(data)
+    sampled = [data[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        nxt_start = int((i + 1) * every) + 1
+        nxt_end = min(int((i + 2) * every) + 1, n)
+        span = data[nxt_start:nxt_end] or [data[-1]]
+        avg_x = sum(p[0] for p in span) / len(span)
+        avg_y = sum(p[1] for p in span) / len(span)
+        ax, ay = data[a]
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            bx, by = data[j]
+            area = abs((ax - avg_x) * (by - ay) - (ax - bx) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(data[best])
+        a = best
+    sampled.append(data[-1])
+    return sampled
+
+
+def _history_query(mac: str, field: str, start: float, end: float,
+                   bucket: float, mode: str = "agg", points: int = 500) -> dict | None:
+    """Aggregate (or LTTB-downsample) one series over [start, end)."""
+    with _history_lock:
+        series = _history.get(mac, {}).get(field)
+        if series is None:
+            return None
+        # Coarsest rollup that still resolves `bucket`; step coarser only
+        # when the finer one doesn't reach back to `start`.
+        source = "raw"
+        oldest = series["raw"][0][0] if series["raw"] else end
+        for name, width, _ in _HISTORY_ROLLUPS:
+            first = series[name][0][0] if series[name] else end
+            if width <= bucket or (oldest > start and first < oldest):
+                source, oldest = name, first
+        if source == "raw":
+            rows = [(t, v, v, v, 1, v) for t, v in series["raw"] if start <= t < end]
+        else:
+            rows = [tuple(b) for b in series[source] if start <= b[0] < end]
+
+    if mode == "lttb":
+        pts = _lttb([(r[0], r[3] / r[4]) for r in rows], points)
+        return {"mac": mac, "field": field, "mode": "lttb", "source": source,
+                "points": [[round(t, 3), round(v, 2)] for t, v in pts]}
+
+    out: list[list] = []
+    for t, lo, hi, total, count, last in rows:
+        b_start = t - t % bucket if bucket > 0 else t
+        cur = out[-1] if out else None
+        if cur is not None and cur[0] == b_start:
+            cur[1] = min(cur[1], lo)
+            cur[2] = max(cur[2], hi)
+            cur[3] += total
+            cur[4] += count
+            cur[5] = last
+        else:
+            out.append([b_start, lo, hi, total, count, last])
+    return {
+        "mac": mac, "field": field, "mode": "agg", "source": source, "bucket": bucket,
+        "columns": ["ts", "min", "max", "mean", "last"],
+        "points": [[round(b[0], 3), b[1], b[2], round(b[3] / b[4], 2), b[5]] for b in out],
+    }
+
+
+def _parse_time(value: str | None, default: float) -> float:
+    """Epoch seconds, ISO 8601, or relative to now like -7d / -12h / -30m."""
+    if not value:
+        return default
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if value[0] == "-" and value[-1] in units:
+        return time.time() - float(value[1:-1]) * units[value[-1]]
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+# ── App-facing cloud API – port 8765 ──────────────────────────────────────────
+# Local stand-ins for the dm03 /AppV2/*.asp endpoints the HA integration calls
+# in cloud mode, answered from the live per-MAC state captured above. The
+# integration reaches them through get_api_urls(model, local_base=...). A MAC
+# we have no local data for is forwarded to the real cloud unchanged.
+_APP_FILTER_KEYS = (
+    "HighUsedTime", "HighAlarmTime", "HighResetTime",
+    "PrimaryUsedTime", "PrimaryAlarmTime", "PrimaryResetTime",
+)
+
+
+def _as_flag(value) -> int:
+    return 1 if str(value).strip().lower() in ("1", "true") else 0
+
+
+def _str_or_empty(value) -> str:
+    return "" if value is None else str(value)
+
+
+def _is_recent(ts: str | None, window: float = 60) -> bool:
+    if not ts:
+        return False
+    try:
+        return (datetime.now() - datetime.fromisoformat(ts)).total_seconds() < window
+    except ValueError:
+        return False
+
+
+def _app_result(result: list | None = None, message: str = "99.取值成功!") -> list:
+    entry: dict = {"message": message, "success": True}
+    if result is not None:
+        entry["result"] = result
+    return [entry]
+
+
+def _app_air_index(mac: str) -> dict | None:
+    """co2/pm25/temp/rh for a MAC. Like the cloud, air quality missing from
+    the MAC's own slot (the HRV unit) is taken from the merged view."""
+    slot = _sensor_by_mac.get(mac)
+    if slot is None:
+        return None
+    return {
+        k: _str_or_empty(slot.get(k) if slot.get(k) is not None else _sensor.get(k))
+        for k in ("co2", "pm25", "temp", "rh")
+    }
+
+
+def _app_home_device_detail(mac: str) -> list | None:
+    state = _device_state_by_mac.get(mac)
+    if state is None:
+        return None
+    air = _app_air_index(mac) or {"co2": "", "pm25": "", "temp": "", "rh": ""}
+    mdid = _device_info.get("device_id") if _device_info.get("mac") == mac else None
+    return [{
+        "mdid": mdid or mac,
+        "mac": mac,
+        **air,
+        "speed": _str_or_empty(state.get("Speed")),
+        "mode": _str_or_empty(state.get("Mode")),
+        "ispower": _as_flag(state.get("IsPower")),
+        "isOnLine": 1 if _is_recent(state.get("last_update")) else 0,
+    }]
+
+
+def _app_device_function(mac: str) -> list | None:
+    state = _device_state_by_mac.get(mac)
+    if state is None or "Function" not in state:
+        return None
+    countdown = _str_or_empty(state.get("CountDown"))
+    return _app_result([{
+        "IsPower": _as_flag(state.get("IsPower")),
+        "Function": [
+            {"Parameters": "Function", "ParametersSub": [
+                {"Data": _str_or_empty(state.get("Function")), "Selected": "1"}]},
+            {"Parameters": "Speed", "ParametersSub": [
+                {"Data": _str_or_empty(state.get("Speed")), "Selected": "1"}]},
+            {"Parameters": "CountDown", "ParametersSub": [
+                {"FunctionTitle": "SetCountDown",
+                 "Data": _str_or_empty(state.get("SetCountDown", countdown))},
+                {"FunctionTitle": "CountDown", "Data": countdown}]},
+        ],
+    }])
+
+
+def _app_filter_alarm(mac: str) -> list | None:
+    cons = _consumables_by_mac.get(mac)
+    if not cons or not any(k in cons for k in _APP_FILTER_KEYS):
+        return None
+    return _app_result([{k: cons.get(k) for k in _APP_FILTER_KEYS}])
+
+
+# App write form fields → command fields; an empty value means "unchanged"
+_APP_WRITE_FIELDS = {
+    "getDevicePower.asp": {"IsPower": "ispower"},
+    "getDeviceFunctionEdit.asp": {
+        "Mode": "mode", "Speed": "speed", "Function": "function",
+        "SetCountDown": "countdown", "Auto": "auto", "Mute": "mute",
+    },
+}
+
+
+def _queue_device_command(mac: str, **fields: int) -> None:
+    """Merge a write into `mac`'s pending injection command."""
+    with _lock:
+        pending = _pending_by_mac.get(mac)
+        target = dict(pending["target"]) if pending else {}
+        target.update(fields)
+        _pending_by_mac[mac] = {"target": target, "at": time.time(), "delivered": False}
+        _wake_held()
+    _invalidate_device_cache("device command")
+    log.info("[HA→Cmd %s] %s", mac[-8:], target)
+
+
+def _sync_cloud_record(mac: str, fields: dict) -> bool:
+    """Repeat a local command as app writes to dm03 in the background.
+
+    Keeps the cloud's record (and its next GetDeviceData answer) in step
+    with the injected command. Needs the u_id / AuthCode captured from app
+    traffic; False without them.
+    """
+    with _lock:
+        u_id = _cloud_auth.get("u_id")
+        auth_code = _cloud_auth.get("auth_code")
+    if not u_id or not auth_code:
+        return False
+    writes = []
+    for name, form_fields in _APP_WRITE_FIELDS.items():
+        values = {key: fields.get(field) for key, field in form_fields.items()}
+        if all(v is None for v in values.values()):
+            continue
+        form = {"Mac": mac, "u_id": u_id, "AuthCode": auth_code, "ShareMidno": ""}
+        form.update({k: "" if v is None else str(v) for k, v in values.items()})
+        writes.append((f"/AppV2/{name}", urlencode(form).encode()))
+    if not writes:
+        return False
+
+    def run():
+        for path, body in writes:
+            _forward_to_cloud("POST", path, body,
+                              {"Content-Type": "application/x-www-form-urlencoded"},
+                              CLOUD_HOST_M8E)
+        _invalidate_device_cache("cloud write")
+        with _lock:
+            _wake_held()
+
+    threading.Thread(target=run, daemon=True).start()
+    return True
+
 
 # ── REST API – port 8765 (for HA integration) ─────────────────────────────────
 class RestHandler(BaseHTTPRequestHandler):
@@ -709,6 +1980,71 @@ class RestHandler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(body)
 
+    def _send_raw(self, body: bytes, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle_app_api(self, path: str) -> None:
+        """Serve /AppV2/*.asp app endpoints locally, forwarding the rest."""
+        body = self._read_body()
+        form = _parse_form(body)
+        mac = form.get("Mac", "").strip().upper()
+        name = path.rsplit("/", 1)[-1]
+        cloud_args = (
+            "POST", path, body,
+            {"Content-Type": "application/x-www-form-urlencoded"},
+            CLOUD_HOST_M8E,
+        )
+
+        result = None
+        if name == "getHomeDeviceDetail.asp":
+            with _lock:
+                result = _app_home_device_detail(mac)
+        elif name == "getDeviceAirIndex.asp":
+            with _lock:
+                air = _app_air_index(mac)
+            result = _app_result([air]) if air else None
+        elif name == "getDeviceFunction.asp":
+            with _lock:
+                result = _app_device_function(mac)
+        elif name == "getDeviceFilterAlarm.asp":
+            with _lock:
+                result = _app_filter_alarm(mac)
+        elif name in _APP_WRITE_FIELDS and mac:
+            # Any device that polls through us (HRV, bath heater, …) gets
+            # the write as its own pending command
+            with _lock:
+                device = _resolve_mac(mac)
+            try:
+                overrides = {
+                    field: _as_flag(form[key]) if field == "ispower" else int(form[key])
+                    for key, field in _APP_WRITE_FIELDS[name].items()
+                    if form.get(key, "") != ""
+                }
+            except ValueError:
+                overrides = {}
+            if overrides and device:
+                # Inject on the next GetDeviceData poll right away, and keep
+                # the cloud record in step in the background so its next
+                # response doesn't revert the device.
+                _queue_device_command(device, **overrides)
+                threading.Thread(target=_forward_and_invalidate, args=cloud_args,
+                                 daemon=True).start()
+                result = _app_result(message="99.修改成功!")
+
+        if result is not None:
+            self._send_json(result)
+            return
+        cloud_resp = _forward_to_cloud(*cloud_args)
+        if cloud_resp:
+            self._send_raw(cloud_resp)
+        else:
+            self._send_json([{"message": "no local data and cloud unreachable",
+                              "success": False}])
+
     def do_GET(self):
         path = urlparse(self.path).path
         if path == "/api/sensor":
@@ -727,6 +2063,7 @@ class RestHandler(BaseHTTPRequestHandler):
                     "sensor_by_mac": {mac: dict(slot) for mac, slot in _sensor_by_mac.items()},
                     "state":  dict(_device_state),
                     "pending_command": _pending_command,
+                    "pending_by_mac": {mac: p["target"] for mac, p in _pending_by_mac.items()},
                 })
         elif path == "/api/device_info":
             with _lock:
@@ -737,9 +2074,82 @@ class RestHandler(BaseHTTPRequestHandler):
         elif path == "/api/auth":
             with _lock:
                 self._send_json(dict(_cloud_auth))
+        elif path == "/api/cloud_records":
+            with _lock:
+                self._send_json({
+                    "cloud_mode": CLOUD_MODE,
+                    "records": {mac: dict(rec) for mac, rec in _cloud_records.items()},
+                })
+        elif path == "/api/history":
+            self._handle_history()
+        elif path == "/api/metrics":
+            now = time.monotonic()
+            with _cache_lock:
+                entries = {
+                    mac: {"age_s": round(now - entry["at"], 1),
+                          "refreshing": mac in _device_cache_refreshing}
+                    for mac, entry in _device_cache.items()
+                }
+            with _lock:
+                clock = {k: v for k, v in _clock.items() if k != "checked_at"}
+            with _metrics_lock:
+                cloud_names = [n[6:] for n in _timings if n.startswith("cloud.")]
+            limits = {}
+            for name in sorted(cloud_names):
+                timeout, hedge_after = _cloud_limits(name)
+                limits[name] = {"timeout_s": round(timeout, 2),
+                                "hedge_after_s": round(hedge_after, 3)
+                                if hedge_after is not None else None}
+            with _lock:
+                now = time.monotonic()
+                device_timeouts = {ip: round(_device_timeout(ip, now), 2)
+                                   for ip in _device_timeouts}
+            self._send_json({
+                **_metrics_snapshot(),
+                "long_hold_s": LONG_HOLD_MAX,
+                "device_timeouts_s": device_timeouts,
+                "clock": clock,
+                "cloud_limits": limits,
+                "device_cache": {
+                    "enabled": _device_cache_enabled(),
+                    "ttl_s": DEVICE_CACHE_TTL,
+                    "max_age_s": DEVICE_CACHE_MAX_AGE,
+                    "entries": entries,
+                },
+            })
         else:
             self._send_json({"error": "not found"}, status=404)
 
+    def _handle_history(self) -> None:
+        """GET /api/history?mac=&field=&start=&end=&bucket=&mode=agg|lttb&points="""
+        q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        mac = q.get("mac", "").strip().upper()
+        field = q.get("field", "")
+        if not mac or not field:
+            with _history_lock:
+                series = {m: sorted(f) for m, f in _history.items()}
+            self._send_json({
+                "series": series,
+                "rollups": {name: width for name, width, _ in _HISTORY_ROLLUPS},
+            })
+            return
+        try:
+            end = _parse_time(q.get("end"), time.time())
+            start = _parse_time(q.get("start"), end - 86400)
+            points = max(3, int(q.get("points", 500)))
+            bucket = float(q.get("bucket") or max(1.0, (end - start) / points))
+            mode = q.get("mode", "agg")
+            if mode not in ("agg", "lttb") or end <= start or bucket <= 0:
+                raise ValueError("need start < end, bucket > 0, mode agg|lttb")
+        except ValueError as e:
+            self._send_json({"error": str(e)}, status=400)
+            return
+        result = _history_query(mac, field, start, end, bucket, mode, points)
+        if result is None:
+            self._send_json({"error": "no such series"}, status=404)
+        else:
+            self._send_json(result)
+
     @staticmethod
     def _send_cloud_command(target: dict) -> bool:
         """Send command to cloud via getDeviceMod.asp using captured auth."""
@@ -769,12 +2179,33 @@ class RestHandler(BaseHTTPRequestHandler):
         return False
 
     def do_POST(self):
-        global _pending_command, _pending_command_time
+        global _pending_command
         path = urlparse(self.path).path
-        if path == "/api/command":
+        if path.startswith("/AppV2/"):
+            self._handle_app_api(path)
+        elif path == "/api/command":
             try:
                 body = self._read_body()
                 cmd = json.loads(body)
+                mac = str(cmd.get("mac") or "").strip().upper()
+                with _lock:
+                    device = _resolve_mac(mac) if mac else None
+                if mac and not device:
+                    # Never fall back to the shared HRV command for a MAC
+                    # that hasn't polled yet
+                    self._send_json({"error": f"unknown mac {mac}"}, status=404)
+                    return
+                if device:
+                    # Per-device command: only the given fields change
+                    fields = {f: int(cmd[f]) for f in _COMMAND_FIELDS if cmd.get(f) is not None}
+                    if not fields:
+                        self._send_json({"error": "no command fields"}, status=400)
+                        return
+                    _queue_device_command(device, **fields)
+                    cloud_ok = _sync_cloud_record(device, fields)
+                    self._send_json({"ok": True, "mac": device,
+                                     "fields": sorted(fields), "cloud": cloud_ok})
+                    return
                 target = {
                     "ispower": int(cmd.get("ispower", 1)),
                     "mode":    int(cmd.get("mode", 3)),
@@ -782,31 +2213,51 @@ class RestHandler(BaseHTTPRequestHandler):
                 }
                 # Try cloud API first (if auth is available)
                 cloud_ok = self._send_cloud_command(target)
-                if not cloud_ok:
+                _invalidate_device_cache("command")
+                if cloud_ok:
+                    with _lock:
+                        _wake_held()
+                else:
                     # Fallback: inject via GetDeviceData
                     with _lock:
-                        _pending_command = target
-                        _pending_command_time = time.time()
+                        _set_pending_command(target)
                     log.info("[HA→Cmd] No auth/cloud, using injection: %s", target)
                 self._send_json({"ok": True, "cloud": cloud_ok})
             except Exception as e:
                 self._send_json({"error": str(e)}, status=400)
         elif path == "/api/command/clear":
+            try:
+                mac = str(json.loads(self._read_body() or b"{}").get("mac") or "").strip().upper()
+            except (ValueError, AttributeError):
+                mac = ""
             with _lock:
-                _pending_command = None
-            log.info("[HA→Cmd] Cleared pending command")
+                device = _resolve_mac(mac) if mac else None
+                if device:
+                    _pending_by_mac.pop(device, None)
+                elif not mac:
+                    _pending_command = None
+                    _pending_by_mac.clear()
+            if mac and not device:
+                self._send_json({"error": f"unknown mac {mac}"}, status=404)
+                return
+            _invalidate_device_cache("command cleared")
+            log.info("[HA→Cmd] Cleared pending command %s", mac or "(all)")
             self._send_json({"ok": True})
         else:
             self._send_json({"error": "not found"}, status=404)
 
 
 if __name__ == "__main__":
-    log.info("=== M8 Local Control Server v3.2.2 (M8 + M8-E MitM + HRV-only device state filter) ===")
+    log.info("=== M8 Local Control Server v3.3.0 (M8 + M8-E MitM, local cloud emulation, GetDeviceData cache) ===")
 
     rest_server = ThreadingHTTPServer(("0.0.0.0", 8765), RestHandler)
     rest_thread = threading.Thread(target=rest_server.serve_forever, daemon=True)
     rest_thread.start()
     log.info("[REST API] Listening on 0.0.0.0:8765")
+    log.info("[Cloud]    Mode: %s", CLOUD_MODE)
+    if CAPTURE_FILE:
+        _init_capture(CAPTURE_FILE)
+        log.info("[Capture]  Writing device traffic to %s", CAPTURE_FILE)
 
     device_server = ThreadingHTTPServer(("0.0.0.0", 80), M8Handler)
     log.info("[Device]   Listening on 0.0.0.0:80")
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Replay an m8_local_server capture through the device handlers.
+
+Reads the JSON lines written with M8_CAPTURE_FILE (rotated .gz files too),
+answers the proxy's cloud forwarding from the recorded cloud responses and
+re-sends every device request in order, either at the recorded pace or as
+fast as possible. M8Handler runs single-threaded in the main thread so
+--profile attributes the handler work, and --trace-state prints the shared
+device state after each GetDeviceData, which is how flip-flops like a
+command being re-applied on the next poll show up.
+
+Requests made against the REST port (commands from Home Assistant) are not
+part of a capture; their effects show up only through the recorded traffic.
+
+Usage:
+  python3 m8_replay.py /config/m8_capture.jsonl
+  python3 m8_replay.py m8_capture.jsonl.1.gz m8_capture.jsonl --speed 1
+  python3 m8_replay.py m8_capture.jsonl --profile --trace-state --mac C4:...
+"""
+import argparse
+import cProfile
+import gzip
+import http.client
+import json
+import logging
+import pstats
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
+from urllib.parse import urlencode, urlparse
+
+import m8_local_server as m8
+
+
+def load_capture(paths: list[str], mac: str | None = None) -> list[dict]:
+    """All records from the given files, oldest first."""
+    records = []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if mac and (rec.get("mac") or "").strip().upper() != mac.upper():
+                    continue
+                records.append(rec)
+    records.sort(key=lambda r: r.get("ts", 0))
+    return records
+
+
+# ── Recorded cloud ────────────────────────────────────────────────────────────
+class RecordedCloudHandler(BaseHTTPRequestHandler):
+    """Serves the recorded cloud responses per path, in capture order.
+
+    A request whose recorded cloud answer was None (timeout / unreachable) is
+    answered by dropping the connection, so the proxy takes its fallback path.
+    """
+    protocol_version = "HTTP/1.1"
+    responses: dict[str, deque] = {}
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        queue = self.responses.get(urlparse(self.path).path)
+        body = queue.popleft() if queue else None
+        if body is None:
+            self.close_connection = True
+            return
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = _reply
+
+
+def _start_cloud(records: list[dict]) -> ThreadingHTTPServer:
+    responses: dict[str, deque] = {}
+    for rec in records:
+        if rec.get("cloud_ms") is not None:
+            responses.setdefault(urlparse(rec["path"]).path, deque()).append(rec.get("cloud"))
+    RecordedCloudHandler.responses = responses
+    cloud = ThreadingHTTPServer(("127.0.0.1", 0), RecordedCloudHandler)
+    cloud.daemon_threads = True
+    threading.Thread(target=cloud.serve_forever, daemon=True).start()
+    return cloud
+
+
+# ── Client ────────────────────────────────────────────────────────────────────
+def _state_line() -> str:
+    with m8._lock:
+        state = dict(m8._device_state)
+        pending = m8._pending_command
+    keys = ("ispower", "mode", "speed", "last_update")
+    shown = " ".join(f"{k}={state.get(k)}" for k in keys if k in state)
+    return f"{shown} pending={pending}"
+
+
+def _pct(sorted_vals: list[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, int(round(p / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[idx]
+
+
+def _run_client(port: int, records: list[dict], args, result: dict) -> None:
+    latency: dict[str, list[float]] = {}
+    mismatches = errors = 0
+    t_start = time.monotonic()
+    ts0 = records[0].get("ts", 0) if records else 0
+    for i, rec in enumerate(records):
+        if args.speed > 0:
+            wait = (rec.get("ts", ts0) - ts0) / args.speed - (time.monotonic() - t_start)
+            if wait > 0:
+                time.sleep(wait)
+        body = urlencode(rec.get("form") or {}).encode("utf-8")
+        headers = {"Connection": "close"}
+        if rec["method"] == "POST":
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        path = urlparse(rec["path"]).path
+        t0 = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            conn.request(rec["method"], rec["path"], body=body or None, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read().decode("utf-8", errors="replace")
+            conn.close()
+        except OSError as e:
+            errors += 1
+            print(f"#{i} {path}: {e}", file=sys.stderr)
+            continue
+        latency.setdefault(path, []).append(time.perf_counter() - t0)
+        if rec.get("resp") is not None and data != rec["resp"] and "getCloudTimes" not in path:
+            mismatches += 1
+            if args.verbose:
+                print(f"#{i} {path} differs\n  recorded: {rec['resp']}\n  replayed: {data}")
+        if args.trace_state and path.endswith("GetDeviceData"):
+            print(f"#{i} {path} {_state_line()}")
+    result.update(
+        elapsed=time.monotonic() - t_start, latency=latency,
+        mismatches=mismatches, errors=errors,
+    )
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("capture", nargs="+", help="capture files (.jsonl or rotated .gz)")
+    ap.add_argument("--speed", type=float, default=0.0,
+                    help="1 = recorded pace, 2 = twice as fast, 0 = as fast as possible")
+    ap.add_argument("--mac", help="only replay records for this device MAC")
+    ap.add_argument("--profile", metavar="N", nargs="?", const=25, type=int,
+                    help="cProfile the device handlers and print the top N functions")
+    ap.add_argument("--trace-state", action="store_true",
+                    help="print shared device state after every GetDeviceData")
+    ap.add_argument("--verbose", action="store_true", help="show responses that differ")
+    args = ap.parse_args()
+
+    records = load_capture(args.capture, args.mac)
+    if not records:
+        print("no records", file=sys.stderr)
+        return 1
+    logging.getLogger("m8-local").setLevel(logging.ERROR)
+    cloud = _start_cloud(records)
+    m8.CLOUD_HOST = "127.0.0.1"
+    m8.CLOUD_PORT = cloud.server_address[1]
+    m8.CLOUD_MODE = "proxy"
+    # Every recorded GetDeviceData must reach the stand-in cloud, exactly once
+    m8.DEVICE_CACHE_TTL = 0
+    m8.CLOUD_HEDGE = False
+
+    device = HTTPServer(("127.0.0.1", 0), m8.M8Handler)
+    device.timeout = 0.2
+    result: dict = {}
+    client = threading.Thread(
+        target=_run_client, args=(device.server_address[1], records, args, result), daemon=True,
+    )
+    profiler = cProfile.Profile() if args.profile else None
+    client.start()
+    if profiler:
+        profiler.enable()
+    while client.is_alive():
+        device.handle_request()
+    if profiler:
+        profiler.disable()
+    device.server_close()
+    cloud.shutdown()
+
+    total = sum(len(v) for v in result["latency"].values())
+    print(f"replayed {total}/{len(records)} requests in {result['elapsed']:.2f}s  "
+          f"mismatched={result['mismatches']}  errors={result['errors']}")
+    print(f"{'endpoint':<34}{'count':>7}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for path, vals in sorted(result["latency"].items()):
+        vals.sort()
+        print(f"{path:<34}{len(vals):>7}{_pct(vals, 50) * 1000:>10.2f}"
+              f"{_pct(vals, 99) * 1000:>10.2f}{vals[-1] * 1000:>10.2f}")
+    if profiler:
+        print()
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(args.profile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+"""Test setup: import paths for the add-on and the integration.
+
+m8_local_server.py and m8_bench.py sit at the repository root. The
+integration's __init__.py imports Home Assistant; without it installed,
+`custom_components.lifegear_hrv` is registered as a bare package so the
+modules that don't need Home Assistant (analytics, const, ...) can still be
+imported and tested on their own. Tests of the Home Assistant parts skip.
+"""
+from __future__ import annotations
+
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+try:
+    import homeassistant  # noqa: F401
+except ImportError:
+    for _name, _path in (
+        ("custom_components", ROOT / "custom_components"),
+        ("custom_components.lifegear_hrv", ROOT / "custom_components" / "lifegear_hrv"),
+    ):
+        if _name not in sys.modules:
+            _package = types.ModuleType(_name)
+            _package.__path__ = [str(_path)]
+            sys.modules[_name] = _package
@@ -0,0 +1,81 @@
+"""Streaming HRV analytics."""
+from __future__ import annotations
+
+import pytest
+
+from custom_components.lifegear_hrv import analytics
+from custom_components.lifegear_hrv.analytics import HRVAnalytics
+from custom_components.lifegear_hrv.const import AIR_HEAT_CAPACITY
+
+# Rated m³/h at the top speed (4)
+RATED = 160
+
+
+def test_efficiency_from_duct_temperatures():
+    hrv = HRVAnalytics()
+    out = hrv.update(0, oa=10, sa=18, ra=20, ex=12, speed=2, powered=True)
+    assert out["md_hrv_efficiency_now"] == 80.0
+    assert out["md_hrv_efficiency"] == 80.0
+    assert out["md_hrv_exhaust_efficiency"] == 80.0
+    assert out["md_hrv_efficiency_1h"] == 80.0
+
+
+def test_efficiency_held_without_gradient():
+    hrv = HRVAnalytics()
+    hrv.update(0, oa=10, sa=18, ra=20, ex=12, speed=2, powered=True)
+    out = hrv.update(60, oa=20, sa=20, ra=20.2, ex=20, speed=2, powered=True)
+    assert out["md_hrv_efficiency_now"] is None
+    assert out["md_hrv_efficiency"] == 80.0
+
+
+def test_efficiency_is_smoothed():
+    hrv = HRVAnalytics()
+    hrv.update(0, oa=10, sa=18, ra=20, ex=None, speed=2, powered=True)
+    out = hrv.update(analytics.SMOOTHING_TAU, oa=10, sa=16, ra=20, ex=None, speed=2, powered=True)
+    assert out["md_hrv_efficiency_now"] == 60.0
+    assert 60.0 < out["md_hrv_efficiency"] < 80.0
+    assert out["md_hrv_efficiency_1h"] == 70.0
+
+
+def test_recovered_power_and_energy():
+    hrv = HRVAnalytics()
+    power = AIR_HEAT_CAPACITY * 120 / 3600 * 8
+    out = hrv.update(0, oa=10, sa=18, ra=20, ex=None, speed=3, powered=True, rated_airflow=RATED)
+    assert out["md_hrv_recovered_power"] == round(power)
+    assert out["md_hrv_airflow"] == 120
+    out = hrv.update(300, oa=10, sa=18, ra=20, ex=None, speed=3, powered=True,
+                     rated_airflow=RATED)
+    assert out["md_hrv_recovered_energy"] == pytest.approx(power * 300 / 3_600_000, abs=1e-3)
+
+
+def test_no_recovery_when_off_or_across_gaps():
+    hrv = HRVAnalytics()
+    out = hrv.update(0, oa=10, sa=18, ra=20, ex=None, speed=3, powered=False,
+                     rated_airflow=RATED)
+    assert out["md_hrv_recovered_power"] == 0
+    assert out["md_hrv_airflow"] == 0
+    hrv.update(1, oa=10, sa=18, ra=20, ex=None, speed=3, powered=True, rated_airflow=RATED)
+    out = hrv.update(1 + analytics.MAX_GAP + 1, oa=10, sa=18, ra=20, ex=None, speed=3,
+                     powered=True, rated_airflow=RATED)
+    assert out["md_hrv_recovered_energy"] == 0.0
+
+
+def test_supply_against_gradient_is_not_recovery():
+    hrv = HRVAnalytics()
+    out = hrv.update(0, oa=10, sa=8, ra=20, ex=None, speed=3, powered=True, rated_airflow=RATED)
+    assert out["md_hrv_recovered_power"] == 0
+
+
+def test_no_recovered_power_without_rated_airflow():
+    hrv = HRVAnalytics()
+    hrv.update(0, oa=10, sa=18, ra=20, ex=None, speed=3, powered=True)
+    out = hrv.update(60, oa=10, sa=18, ra=20, ex=None, speed=3, powered=True)
+    assert out["md_hrv_recovered_power"] is None
+    assert out["md_hrv_recovered_energy"] == 0.0
+
+
+def test_seed_energy_only_raises_total():
+    hrv = HRVAnalytics()
+    hrv.seed_energy(1.5)
+    hrv.seed_energy(0.5)
+    assert hrv.energy_kwh == 1.5
@@ -0,0 +1,226 @@
+"""Per-account AuthCode management."""
+from __future__ import annotations
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.lifegear_hrv import auth, crypto  # noqa: E402
+from custom_components.lifegear_hrv.auth import (  # noqa: E402
+    AccountTokenManager,
+    get_token_manager,
+    release_token_manager,
+)
+from custom_components.lifegear_hrv.const import (  # noqa: E402
+    DEVICE_MODEL_BATH_HEATER,
+    DEVICE_MODEL_M8,
+    DEVICE_MODEL_M8E,
+    DOMAIN,
+)
+
+
+class _Session:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def login(monkeypatch):
+    """Stand-in cloud login handing out numbered AuthCodes."""
+    codes = iter(range(1, 100))
+
+    async def _login(session, account, password, model=None):
+        await asyncio.sleep(0.01)
+        return {"u_id": account, "auth_code": f"code{next(codes)}"}
+
+    mock = AsyncMock(side_effect=_login)
+    monkeypatch.setattr(crypto, "async_login", mock)
+    monkeypatch.setattr(auth.aiohttp, "ClientSession", _Session)
+    return mock
+
+
+@pytest.fixture(autouse=True)
+def store(monkeypatch):
+    """In-memory stand-in for the account's auth Store (empty by default)."""
+    store = MagicMock(async_load=AsyncMock(return_value=None))
+    monkeypatch.setattr(auth, "auth_store", lambda hass, account, model: store)
+    monkeypatch.setattr(crypto, "_recent_logins", {})
+    return store
+
+
+@pytest.fixture
+def probe(monkeypatch):
+    """Stand-in for the cheap authenticated probe (accepts by default)."""
+    mock = AsyncMock(return_value=True)
+    monkeypatch.setattr(crypto, "async_probe_auth", mock)
+    return mock
+
+
+def _manager() -> AccountTokenManager:
+    hass = MagicMock()
+    hass.data = {}
+    hass.async_create_task = lambda coro: asyncio.get_running_loop().create_task(coro)
+    hass.config_entries.async_entries.return_value = []
+    manager = AccountTokenManager(hass, "0912")
+    manager._password = "pw"
+    return manager
+
+
+def test_concurrent_refreshes_share_one_login(login):
+    async def run():
+        manager = _manager()
+        results = await asyncio.gather(*(manager.async_refresh() for _ in range(5)))
+        return manager, results
+
+    manager, results = asyncio.run(run())
+    assert results == [True] * 5
+    assert login.await_count == 1
+    assert manager.auth_code == "code1"
+    assert manager.valid
+
+
+def test_refresh_for_a_request_older_than_the_code_returns_at_once(login):
+    async def run():
+        manager = _manager()
+        started = auth.time.monotonic()
+        await manager.async_refresh()
+        return await manager.async_refresh(issued_before=started)
+
+    assert asyncio.run(run())
+    assert login.await_count == 1
+
+
+def test_cooldown_limits_logins_unless_forced(login):
+    async def run():
+        manager = _manager()
+        await manager.async_refresh()
+        cooled = await manager.async_refresh()
+        forced = await manager.async_refresh(force=True)
+        return manager, cooled, forced
+
+    manager, cooled, forced = asyncio.run(run())
+    assert (cooled, forced) == (False, True)
+    assert login.await_count == 2
+    assert manager.auth_code == "code2"
+
+
+def test_failed_login_invalidates(login):
+    login.side_effect = ValueError("Login failed: bad password")
+
+    async def run():
+        manager = _manager()
+        return manager, await manager.async_refresh()
+
+    manager, ok = asyncio.run(run())
+    assert not ok
+    assert not manager.valid
+
+
+def _stored(verified_ago: float) -> dict:
+    return {
+        "user_id": "0912",
+        "auth_code": "stored",
+        "verified_at": time.time() - verified_ago,
+        "devices": [],
+    }
+
+
+def test_recently_validated_stored_code_needs_no_network(store, login, probe):
+    store.async_load.return_value = _stored(60)
+
+    async def run():
+        manager = _manager()
+        return manager, await manager.async_ensure_valid()
+
+    manager, ok = asyncio.run(run())
+    assert ok
+    assert manager.auth_code == "stored"
+    assert probe.await_count == 0
+    assert login.await_count == 0
+
+
+def test_older_stored_code_is_probed_instead_of_logging_in(store, login, probe):
+    store.async_load.return_value = _stored(auth.IDLE_PROBE_AFTER + 60)
+
+    async def run():
+        manager = _manager()
+        return manager, await manager.async_ensure_valid()
+
+    manager, ok = asyncio.run(run())
+    assert ok
+    assert probe.await_count == 1
+    assert login.await_count == 0
+    assert manager.auth_code == "stored"
+
+
+def test_rejected_stored_code_logs_in_and_saves(store, login, probe):
+    store.async_load.return_value = _stored(auth.IDLE_PROBE_AFTER + 60)
+    probe.return_value = False
+
+    async def run():
+        manager = _manager()
+        return manager, await manager.async_ensure_valid()
+
+    manager, ok = asyncio.run(run())
+    assert ok
+    assert login.await_count == 1
+    assert manager.auth_code == "code1"
+    store.async_delay_save.assert_called_with(manager._data_to_store, 1)
+    assert manager._data_to_store()["auth_code"] == "code1"
+
+
+@pytest.mark.parametrize("error", [asyncio.TimeoutError(), KeyError("mdid")])
+def test_probe_timeout_or_odd_answer_keeps_the_stored_code(store, login, probe, error):
+    store.async_load.return_value = _stored(auth.IDLE_PROBE_AFTER + 60)
+    probe.side_effect = error
+
+    async def run():
+        manager = _manager()
+        return manager, await manager.async_ensure_valid()
+
+    manager, ok = asyncio.run(run())
+    assert ok
+    assert login.await_count == 0
+    assert manager.auth_code == "stored"
+
+
+def test_ensure_valid_never_raises(store, login):
+    store.async_load.return_value = _stored(auth.IDLE_PROBE_AFTER + 60)
+
+    async def run():
+        manager = _manager()
+        manager._async_probe = AsyncMock(side_effect=RuntimeError("boom"))
+        return await manager.async_ensure_valid()
+
+    assert asyncio.run(run()) is False
+
+
+def test_one_manager_per_account_and_platform():
+    hass = MagicMock()
+    hass.data = {}
+    m8 = get_token_manager(hass, "0912", DEVICE_MODEL_M8)
+    m8e = get_token_manager(hass, "0912", DEVICE_MODEL_M8E)
+    assert m8 is not m8e
+    assert get_token_manager(hass, "0912", DEVICE_MODEL_BATH_HEATER) is m8e
+    assert get_token_manager(hass, "0999", DEVICE_MODEL_M8) is not m8
+
+
+def test_manager_is_dropped_with_its_last_entry(monkeypatch):
+    monkeypatch.setattr(auth, "async_track_time_interval", MagicMock())
+    hass = MagicMock()
+    hass.data = {}
+    manager = get_token_manager(hass, "0912", DEVICE_MODEL_M8)
+    for entry_id in ("a", "b"):
+        manager.attach(MagicMock(entry_id=entry_id, data={}))
+    release_token_manager(hass, manager, "a")
+    assert get_token_manager(hass, "0912", DEVICE_MODEL_M8) is manager
+    release_token_manager(hass, manager, "b")
+    assert hass.data[DOMAIN] == {}
+    assert get_token_manager(hass, "0912", DEVICE_MODEL_M8) is not manager
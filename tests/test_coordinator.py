@@ -0,0 +1,351 @@
+"""LifegearHRVCoordinator behavior that doesn't need a running Home Assistant."""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from homeassistant.helpers.update_coordinator import UpdateFailed  # noqa: E402
+
+from custom_components.lifegear_hrv import coordinator as coordinator_module  # noqa: E402
+from custom_components.lifegear_hrv.const import (  # noqa: E402
+    DEVICE_MODEL_BATH_HEATER,
+    DEVICE_MODEL_M8,
+    DEVICE_MODEL_M8E,
+    get_api_urls,
+)
+from custom_components.lifegear_hrv.coordinator import (  # noqa: E402
+    SNAPSHOT_MAX_AGE,
+    LifegearHRVCoordinator,
+)
+from custom_components.lifegear_hrv.health import (  # noqa: E402
+    BACKEND_ADDON,
+    BACKEND_CLOUD,
+    HALF_OPEN,
+    BackendRouter,
+)
+from custom_components.lifegear_hrv.models import HRVSnapshot, snapshot_from_dict  # noqa: E402
+from custom_components.lifegear_hrv.scheduler import Superseded  # noqa: E402
+from custom_components.lifegear_hrv.stats import CoordinatorStats  # noqa: E402
+
+
+def _coordinator(**attrs) -> LifegearHRVCoordinator:
+    """A coordinator with only the given attributes set (no hass, no entry)."""
+    coordinator = object.__new__(LifegearHRVCoordinator)
+    for name, value in attrs.items():
+        setattr(coordinator, name, value)
+    return coordinator
+
+
+# ── Field-level notification ──────────────────────────────────────────────────
+
+def _listening(changed, notify_all=False, success=True):
+    """Coordinator with a CO2 entity, a mode entity and a context-less one."""
+    calls = {"co2": MagicMock(), "mode": MagicMock(), "any": MagicMock()}
+    coordinator = _coordinator(
+        _changed_keys=changed,
+        _notify_all=notify_all,
+        _notified_success=True,
+        last_update_success=success,
+        _listeners={
+            1: (calls["co2"], frozenset({"co2"})),
+            2: (calls["mode"], frozenset({"mode"})),
+            3: (calls["any"], None),
+        },
+    )
+    return coordinator, calls
+
+
+def _notified(calls) -> set[str]:
+    return {name for name, call in calls.items() if call.called}
+
+
+def test_only_entities_of_changed_fields_are_notified():
+    coordinator, calls = _listening({"co2"})
+    coordinator.async_update_listeners()
+    assert _notified(calls) == {"co2", "any"}
+
+
+def test_unchanged_payload_notifies_nobody():
+    coordinator, calls = _listening(set())
+    coordinator.async_update_listeners()
+    assert _notified(calls) == set()
+
+
+@pytest.mark.parametrize("state", [
+    {"changed": None},
+    {"changed": set(), "notify_all": True},
+    {"changed": set(), "success": False},
+])
+def test_first_refresh_command_and_availability_notify_everyone(state):
+    coordinator, calls = _listening(**state)
+    coordinator.async_update_listeners()
+    assert _notified(calls) == {"co2", "mode", "any"}
+
+
+def _polling(previous=None, backends=(BACKEND_CLOUD,)) -> LifegearHRVCoordinator:
+    """Coordinator ready for _async_update_data with a mocked fetch."""
+    router = BackendRouter(list(backends))
+    return _coordinator(
+        _model=DEVICE_MODEL_M8, data=previous, _tokens=None,
+        router=router, _notified_route=router.route, stats=CoordinatorStats(),
+        _async_fetch_data=AsyncMock(), restored_at=None, _store=MagicMock(),
+        _poll=None, _poll_lane=0,
+    )
+
+
+def test_update_parses_snapshot_and_records_changed_fields():
+    previous = snapshot_from_dict(DEVICE_MODEL_M8, {"md_co2": "600", "md_mode": "1"})
+    coordinator = _polling(previous)
+    coordinator._async_fetch_data.return_value = {"md_co2": 650, "md_mode": "17", "md_pm25": "3"}
+    snapshot = asyncio.run(coordinator._async_update_data())
+    assert isinstance(snapshot, HRVSnapshot)
+    assert coordinator._changed_keys == {"co2", "pm25", "stats"}
+
+
+
+def test_overlapping_refreshes_share_one_poll():
+    coordinator = _polling()
+
+    async def _fetch():
+        await asyncio.sleep(0.01)
+        return {"md_co2": 600}
+
+    coordinator._async_fetch_data.side_effect = _fetch
+
+    async def run():
+        return await asyncio.gather(
+            coordinator._async_update_data(), coordinator._async_update_data(),
+        )
+
+    first, second = asyncio.run(run())
+    assert first is second
+    assert coordinator._async_fetch_data.await_count == 1
+
+
+def test_superseded_poll_shares_the_newer_result():
+    coordinator = _polling()
+
+    async def run():
+        newer = asyncio.get_running_loop().create_future()
+        coordinator._poll = newer
+        coordinator._async_fetch_data.side_effect = Superseded("entry/status")
+        stale = asyncio.ensure_future(coordinator._async_poll())
+        await asyncio.sleep(0)
+        newer.set_result("snapshot")
+        return await stale
+
+    assert asyncio.run(run()) == "snapshot"
+    assert coordinator._changed_keys == set()
+    assert coordinator.router.get(BACKEND_CLOUD).window.failure_rate == 0.0
+
+
+def test_good_read_rearms_relogin():
+    coordinator = _polling()
+    coordinator._relogin_attempted = True
+    coordinator._async_fetch_data.return_value = {"md_co2": 600}
+    asyncio.run(coordinator._async_update_data())
+    assert coordinator._relogin_attempted is False
+
+
+def test_bath_heater_relogs_in_once_per_failing_streak():
+    coordinator = _coordinator(
+        _local_mode=False, _model=DEVICE_MODEL_BATH_HEATER,
+        _has_cloud_creds=True, _relogin_attempted=False,
+        _async_update_bath_heater=AsyncMock(side_effect=[ValueError("rejected"), {"md_power": 1}]),
+        _async_relogin=AsyncMock(return_value=True),
+    )
+    assert asyncio.run(coordinator._async_fetch_data()) == {"md_power": 1}
+    assert coordinator._relogin_attempted is False
+    coordinator._async_update_bath_heater.side_effect = [ValueError("rejected"), ValueError("again")]
+    with pytest.raises(UpdateFailed):
+        asyncio.run(coordinator._async_fetch_data())
+    assert coordinator._async_relogin.await_count == 2
+
+
+class _Response:
+    def __init__(self, body) -> None:
+        self._body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def text(self) -> str:
+        return json.dumps(self._body)
+
+
+class _Session:
+    """aiohttp.ClientSession stand-in answering POSTs by URL."""
+
+    answers: dict = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def post(self, url, **_kwargs):
+        return _Response(self.answers[url])
+
+
+def _bath_heater(monkeypatch, function_ok: bool, air_ok: bool) -> LifegearHRVCoordinator:
+    urls = get_api_urls(DEVICE_MODEL_BATH_HEATER)
+    rejected = [{"success": False, "message": "AuthCode error"}]
+    monkeypatch.setattr(_Session, "answers", {
+        urls["device_function"]: [{"success": True, "result": [{"IsPower": 1}]}]
+        if function_ok else rejected,
+        urls["air_index"]: [{"success": True, "result": [{"co2": 500}]}] if air_ok else rejected,
+    })
+    monkeypatch.setattr(coordinator_module.aiohttp, "ClientSession", _Session)
+    return _coordinator(
+        _model=DEVICE_MODEL_BATH_HEATER, _tokens=None, _user_id="0912", _auth_code="1",
+        mac="AA:BB", data=None, router=BackendRouter([BACKEND_CLOUD]),
+        _addon_urls=None, _cloud_urls=urls,
+        stats=CoordinatorStats(), _poll_count=1, _call=lambda key: contextlib.nullcontext(),
+    )
+
+
+def test_bath_heater_read_rejected_on_both_calls_fails(monkeypatch):
+    coordinator = _bath_heater(monkeypatch, function_ok=False, air_ok=False)
+    with pytest.raises(UpdateFailed):
+        asyncio.run(coordinator._async_update_bath_heater())
+
+
+def test_bath_heater_read_with_one_call_accepted_succeeds(monkeypatch):
+    coordinator = _bath_heater(monkeypatch, function_ok=True, air_ok=False)
+    result = asyncio.run(coordinator._async_update_bath_heater())
+    assert result["md_ispower"] == 1
+
+# ── Backend routing ───────────────────────────────────────────────────────────
+
+def test_read_fails_over_to_the_next_backend():
+    coordinator = _polling(backends=(BACKEND_ADDON, BACKEND_CLOUD))
+    used = []
+
+    async def _fetch():
+        used.append(coordinator._backend)
+        if coordinator._backend == BACKEND_ADDON:
+            raise UpdateFailed("add-on down")
+        return {"md_co2": 600}
+
+    coordinator._async_fetch_data.side_effect = _fetch
+    snapshot = asyncio.run(coordinator._async_update_data())
+    assert used == [BACKEND_ADDON, BACKEND_CLOUD]
+    assert snapshot.co2 == 600
+    assert coordinator.router.route == BACKEND_CLOUD
+    assert coordinator.router.get(BACKEND_ADDON).window.failure_rate == 1.0
+
+
+def test_read_fails_when_every_backend_fails():
+    coordinator = _polling(backends=(BACKEND_ADDON, BACKEND_CLOUD))
+    coordinator._async_fetch_data.side_effect = UpdateFailed("down")
+    with pytest.raises(UpdateFailed):
+        asyncio.run(coordinator._async_update_data())
+    assert coordinator.stats.updates.failure_rate == 1.0
+
+
+def test_concurrent_attempts_keep_their_own_backend():
+    coordinator = _coordinator(router=BackendRouter([BACKEND_ADDON, BACKEND_CLOUD]))
+    seen = {}
+
+    async def attempt(name, delay):
+        with coordinator._on_backend(name):
+            await asyncio.sleep(delay)
+            seen[name] = coordinator._backend
+
+    async def run():
+        await asyncio.gather(attempt(BACKEND_ADDON, 0.02), attempt(BACKEND_CLOUD, 0.01))
+
+    asyncio.run(run())
+    assert seen == {BACKEND_ADDON: BACKEND_ADDON, BACKEND_CLOUD: BACKEND_CLOUD}
+
+
+def test_backend_outside_an_attempt_is_the_route():
+    coordinator = _polling(backends=(BACKEND_ADDON, BACKEND_CLOUD))
+    coordinator._tokens = MagicMock(auth_code="1", valid=True)
+    used = []
+
+    async def send():
+        used.append(coordinator._backend)
+        return coordinator._backend == BACKEND_CLOUD
+
+    assert asyncio.run(coordinator._async_routed_write(send))
+    assert used == [BACKEND_ADDON, BACKEND_CLOUD]
+    assert coordinator._backend == coordinator.router.route == BACKEND_CLOUD
+
+
+class _CommandResponse(_Response):
+    status = 200
+
+    async def json(self):
+        return self._body
+
+
+class _CommandSession(_Session):
+    def post(self, url, **_kwargs):
+        return _CommandResponse({"ok": False})
+
+
+def test_signed_out_local_command_leaves_the_cloud_trial(monkeypatch):
+    monkeypatch.setattr(coordinator_module.aiohttp, "ClientSession", _CommandSession)
+    coordinator = _coordinator(
+        _model=DEVICE_MODEL_M8, mac=None, data=None, _tokens=None, _auth_code="",
+        _local_mode=True, _local_server="http://addon", stats=CoordinatorStats(),
+        router=BackendRouter([BACKEND_ADDON, BACKEND_CLOUD]),
+    )
+    cloud = coordinator.router.get(BACKEND_CLOUD).breaker
+    cloud.state = HALF_OPEN
+    assert not asyncio.run(coordinator._async_set_control_local(1, 3, 2))
+    assert not cloud.trial_in_flight
+    assert cloud.allow()
+
+# ── Snapshot persistence ──────────────────────────────────────────────────────
+
+def _restoring(stored) -> LifegearHRVCoordinator:
+    return _coordinator(
+        _model=DEVICE_MODEL_M8, data=None, restored_at=None, mac="AA", device_id="1",
+        _store=MagicMock(async_load=AsyncMock(return_value=stored)),
+    )
+
+
+def test_recent_snapshot_is_restored():
+    saved_at = time.time() - 600
+    coordinator = _restoring({"saved_at": saved_at, "model": DEVICE_MODEL_M8, "data": {"md_co2": 700}})
+    assert asyncio.run(coordinator.async_restore_snapshot())
+    assert coordinator.data.co2 == 700
+    assert coordinator.restored_at == saved_at
+
+
+@pytest.mark.parametrize(
+    "stored",
+    [
+        None,
+        {"saved_at": time.time(), "model": DEVICE_MODEL_M8E, "data": {"md_co2": 700}},
+        {"saved_at": time.time() - SNAPSHOT_MAX_AGE - 60, "model": DEVICE_MODEL_M8, "data": {}},
+    ],
+)
+def test_missing_foreign_or_stale_snapshot_is_refused(stored):
+    coordinator = _restoring(stored)
+    assert not asyncio.run(coordinator.async_restore_snapshot())
+    assert coordinator.data is None
+
+
+def test_first_live_refresh_after_restore_notifies_everyone_and_saves():
+    restored = snapshot_from_dict(DEVICE_MODEL_M8, {"md_co2": 700})
+    coordinator = _polling(restored)
+    coordinator.restored_at = time.time() - 60
+    coordinator._async_fetch_data.return_value = {"md_co2": 700}
+    asyncio.run(coordinator._async_update_data())
+    assert coordinator._changed_keys is None
+    assert coordinator.restored_at is None
+    coordinator._store.async_delay_save.assert_called_once()
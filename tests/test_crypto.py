@@ -0,0 +1,100 @@
+"""Cloud login helpers."""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("cryptography")
+
+from custom_components.lifegear_hrv import crypto  # noqa: E402
+from custom_components.lifegear_hrv.const import (  # noqa: E402
+    DEVICE_MODEL_M8,
+    DEVICE_MODEL_M8E,
+    get_api_urls,
+)
+
+
+class _Response:
+    def __init__(self, body) -> None:
+        self._body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def text(self) -> str:
+        return json.dumps(self._body)
+
+
+class FakeSession:
+    """Answers POSTs by URL with canned JSON bodies, recording each call."""
+
+    def __init__(self, answers: dict) -> None:
+        self.answers = answers
+        self.posted: list[tuple[str, str]] = []
+
+    def post(self, url, data=None, **_kwargs):
+        payload = data.decode() if isinstance(data, bytes) else data
+        self.posted.append((url, payload))
+        return _Response(self.answers[url])
+
+
+@pytest.fixture(autouse=True)
+def _no_logins(monkeypatch):
+    monkeypatch.setattr(crypto, "_recent_logins", {})
+
+
+def _m8_session(success: bool = True) -> FakeSession:
+    urls = get_api_urls(DEVICE_MODEL_M8)
+    return FakeSession({
+        urls["login"]: [{"success": success, "message": "ok" if success else "bad password"}],
+        urls["list"]: [{"mdid": 7, "md_mac": "AA:BB", "md_wisdom": "Living room"}],
+    })
+
+
+def test_login_is_remembered_for_the_account():
+    session = _m8_session()
+    result = asyncio.run(crypto.async_login(session, "0912", "pw", DEVICE_MODEL_M8))
+    user_id, auth_code, at = crypto.recent_login("0912", 120)
+    assert (user_id, auth_code) == ("0912", result["auth_code"])
+    assert at <= time.monotonic()
+    assert crypto.recent_login("0999", 120) is None
+
+
+def test_login_is_remembered_per_platform():
+    asyncio.run(crypto.async_login(_m8_session(), "0912", "pw", DEVICE_MODEL_M8))
+    assert crypto.recent_login("0912", 120, DEVICE_MODEL_M8) is not None
+    assert crypto.recent_login("0912", 120, DEVICE_MODEL_M8E) is None
+
+
+def test_failed_login_is_not_remembered():
+    with pytest.raises(ValueError):
+        asyncio.run(crypto.async_login(_m8_session(False), "0912", "pw", DEVICE_MODEL_M8))
+    assert crypto.recent_login("0912", 120) is None
+
+
+def test_recent_login_expires():
+    crypto._recent_logins[("0912", False)] = ("0912", "1234567891", time.monotonic() - 30)
+    assert crypto.recent_login("0912", 120) is not None
+    assert crypto.recent_login("0912", 30) is None
+
+
+def test_probe_auth_on_m8():
+    urls = get_api_urls(DEVICE_MODEL_M8)
+    accepted = FakeSession({urls["list"]: [{"mdid": 7}]})
+    rejected = FakeSession({urls["list"]: [{"mdid": ""}]})
+    assert asyncio.run(crypto.async_probe_auth(accepted, "0912", "1", DEVICE_MODEL_M8))
+    assert not asyncio.run(crypto.async_probe_auth(rejected, "0912", "1", DEVICE_MODEL_M8))
+
+
+@pytest.mark.parametrize("answer", [{"error": "busy"}, ["html"]])
+def test_probe_auth_malformed_answer_is_unreachable(answer):
+    session = FakeSession({get_api_urls(DEVICE_MODEL_M8)["list"]: answer})
+    with pytest.raises(ConnectionError):
+        asyncio.run(crypto.async_probe_auth(session, "0912", "1", DEVICE_MODEL_M8))
@@ -0,0 +1,179 @@
+"""Circuit breaker transitions and backend routing."""
+from __future__ import annotations
+
+import pytest
+
+from custom_components.lifegear_hrv import health
+from custom_components.lifegear_hrv.health import (
+    BACKEND_ADDON,
+    BACKEND_CLOUD,
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    BackendRouter,
+    CircuitBreaker,
+    LatencyWindow,
+)
+
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(health.time, "monotonic", clock)
+    return clock
+
+
+def _fail(breaker: CircuitBreaker, window: LatencyWindow, times: int) -> None:
+    for _ in range(times):
+        window.add(False, 0.1)
+        breaker.record(False, window)
+
+
+# ── CircuitBreaker ────────────────────────────────────────────────────────────
+
+def test_opens_after_consecutive_failures(clock):
+    breaker, window = CircuitBreaker(), LatencyWindow()
+    _fail(breaker, window, health.CONSECUTIVE_FAILURES - 1)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    _fail(breaker, window, 1)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_in == health.OPEN_SECONDS
+
+
+def test_opens_on_failure_rate(clock):
+    breaker, window = CircuitBreaker(), LatencyWindow()
+    for i in range(health.MIN_SAMPLES):
+        ok = i % 2 == 0
+        window.add(ok, 0.1)
+        breaker.record(ok, window)
+    assert breaker.state == OPEN
+
+
+def test_half_open_admits_one_trial(clock):
+    breaker, window = CircuitBreaker(), LatencyWindow()
+    _fail(breaker, window, health.CONSECUTIVE_FAILURES)
+    clock.now += health.OPEN_SECONDS - 1
+    assert not breaker.allow()
+    clock.now += 1
+    assert [breaker.allow() for _ in range(3)] == [True, False, False]
+    assert breaker.state == HALF_OPEN
+    assert breaker.trial_in_flight
+    breaker.record(True, window)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_released_trial_can_be_claimed_again(clock):
+    breaker, window = CircuitBreaker(), LatencyWindow()
+    _fail(breaker, window, health.CONSECUTIVE_FAILURES)
+    clock.now += health.OPEN_SECONDS
+    assert breaker.allow()
+    breaker.release()
+    assert not breaker.trial_in_flight
+    assert breaker.allow()
+
+
+def test_unrecorded_trial_expires(clock):
+    breaker, window = CircuitBreaker(), LatencyWindow()
+    _fail(breaker, window, health.CONSECUTIVE_FAILURES)
+    clock.now += health.OPEN_SECONDS
+    assert breaker.allow()
+    clock.now += health.TRIAL_TIMEOUT
+    assert breaker.allow()
+
+
+def test_failed_trial_doubles_back_off(clock):
+    breaker, window = CircuitBreaker(), LatencyWindow()
+    _fail(breaker, window, health.CONSECUTIVE_FAILURES)
+    open_for = health.OPEN_SECONDS
+    while open_for < health.MAX_OPEN_SECONDS:
+        clock.now += open_for
+        assert breaker.allow()
+        _fail(breaker, window, 1)
+        open_for = min(open_for * 2, health.MAX_OPEN_SECONDS)
+        assert breaker.state == OPEN
+        assert breaker.retry_in == open_for
+    clock.now += open_for
+    assert breaker.allow()
+    breaker.record(True, window)
+    assert breaker.state == CLOSED
+    _fail(breaker, window, health.CONSECUTIVE_FAILURES)
+    assert breaker.retry_in == health.OPEN_SECONDS
+
+
+# ── BackendRouter ─────────────────────────────────────────────────────────────
+
+def _router() -> BackendRouter:
+    return BackendRouter([BACKEND_ADDON, BACKEND_CLOUD], preferred=BACKEND_ADDON)
+
+
+def _names(backends) -> list[str]:
+    return [b.name for b in backends]
+
+
+def test_preferred_first_unless_clearly_slower(clock):
+    router = _router()
+    assert _names(router.candidates()) == [BACKEND_ADDON, BACKEND_CLOUD]
+    router.get(BACKEND_ADDON).record(True, 0.5)
+    router.get(BACKEND_CLOUD).record(True, 0.4)
+    assert _names(router.candidates()) == [BACKEND_ADDON, BACKEND_CLOUD]
+    router.get(BACKEND_CLOUD).window = LatencyWindow()
+    router.get(BACKEND_CLOUD).record(True, 0.2)
+    assert _names(router.candidates()) == [BACKEND_CLOUD, BACKEND_ADDON]
+
+
+def test_open_backend_is_skipped(clock):
+    router = _router()
+    for _ in range(health.CONSECUTIVE_FAILURES):
+        router.get(BACKEND_ADDON).record(False, 5.0)
+    assert _names(router.candidates()) == [BACKEND_CLOUD]
+
+
+def test_no_candidates_while_a_trial_is_out(clock):
+    router = _router()
+    for backend in router.backends:
+        for _ in range(health.CONSECUTIVE_FAILURES):
+            backend.record(False, 5.0)
+    clock.now += health.OPEN_SECONDS
+    assert _names(router.candidates()) == [BACKEND_ADDON, BACKEND_CLOUD]
+    assert router.candidates() == []
+
+
+def test_all_open_forces_one_trial_on_the_soonest(clock):
+    router = _router()
+    for backend in router.backends:
+        for _ in range(health.CONSECUTIVE_FAILURES):
+            backend.record(False, 5.0)
+        clock.now += 1
+    # The add-on opened first, so it is the one whose back-off ends soonest
+    assert _names(router.candidates()) == [BACKEND_ADDON]
+    addon = router.get(BACKEND_ADDON)
+    assert addon.breaker.state == HALF_OPEN
+    assert addon.breaker.trial_in_flight
+    assert router.candidates() == []
+    addon.record(False, 5.0)
+    assert addon.breaker.state == OPEN
+    assert addon.breaker.retry_in == 2 * health.OPEN_SECONDS
+
+
+def test_route_changes_are_counted(clock):
+    router = _router()
+    router.used(router.get(BACKEND_ADDON))
+    assert router.route_changes == 0
+    router.used(router.get(BACKEND_CLOUD))
+    router.used(router.get(BACKEND_CLOUD))
+    assert router.route == BACKEND_CLOUD
+    assert router.route_changes == 1
+    assert router.diagnostics()["last_route_change"]["from"] == BACKEND_ADDON
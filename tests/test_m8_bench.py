@@ -0,0 +1,57 @@
+"""m8_bench helpers and its stand-in cloud."""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+import m8_bench as bench
+import m8_local_server as m8
+
+
+@pytest.fixture
+def cloud(monkeypatch):
+    """Point the proxy's cloud forwarding at a healthy stand-in cloud."""
+    server, port = bench._start_cloud("ok", 0)
+    monkeypatch.setattr(m8, "CLOUD_HOST", "127.0.0.1")
+    monkeypatch.setattr(m8, "CLOUD_PORT", port)
+    yield port
+    server.shutdown()
+    server.server_close()
+
+
+def test_pct():
+    values = [float(v) for v in range(1, 101)]
+    assert bench._pct(values, 50) == 51.0
+    assert bench._pct(values, 99) == 99.0
+    assert bench._pct(values, 100) == 100.0
+    assert bench._pct([], 99) == 0.0
+
+
+def test_recorder_splits_latency_and_errors():
+    rec = bench.Recorder()
+    rec.add("m8:GetDeviceData", 0.01, True)
+    rec.add("m8:GetDeviceData", 0.02, True)
+    rec.add("m8:GetDeviceData", 5.0, False)
+    assert rec.latency == {"m8:GetDeviceData": [0.01, 0.02]}
+    assert rec.errors == {"m8:GetDeviceData": 1}
+
+
+def test_form_quotes_ciphertext():
+    assert bench._form(RA="a+b/c==", Mac="AA:BB") == b"RA=a%2Bb%2Fc%3D%3D&Mac=AA%3ABB"
+
+
+def test_forwarding_reaches_stand_in_cloud(cloud):
+    mac = "C4:D8:D5:00:00:01"
+    resp = m8._forward_to_cloud(
+        "POST", "/api/AppV2/GetDeviceData", bench._form(Mac=m8.device_encrypt_ecb(mac)),
+        {"Content-Type": "application/x-www-form-urlencoded"}, m8.CLOUD_HOST_M8E)
+    record = json.loads(m8.device_decrypt_raw(json.loads(resp)["data"]))
+    assert record == bench._hrv_record(mac)
+
+
+def test_down_cloud_forwards_nothing(monkeypatch):
+    _server, port = bench._start_cloud("down", 0)
+    monkeypatch.setattr(m8, "CLOUD_HOST", "127.0.0.1")
+    monkeypatch.setattr(m8, "CLOUD_PORT", port)
+    assert m8._forward_to_cloud("POST", "/api/App/GetDeviceData", b"") is None
@@ -0,0 +1,698 @@
+"""Pure helpers of the add-on, one section per feature."""
+from __future__ import annotations
+
+import http.client
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+import m8_local_server as m8
+from m8_bench import _form
+
+
+@pytest.fixture(autouse=True)
+def _reset_state(monkeypatch):
+    """Give every test empty module state."""
+    monkeypatch.setattr(m8, "_cloud_records", {})
+    monkeypatch.setattr(m8, "_device_state", {
+        "ispower": None, "mode": None, "speed": None, "last_update": None})
+    monkeypatch.setattr(m8, "_device_state_by_mac", {})
+    monkeypatch.setattr(m8, "_consumables_by_mac", {})
+    monkeypatch.setattr(m8, "_sensor_by_mac", {})
+    monkeypatch.setattr(m8, "_sensor", dict(m8._SENSOR_TEMPLATE))
+    monkeypatch.setattr(m8, "_history", {})
+    monkeypatch.setattr(m8, "_pending_command", None)
+    monkeypatch.setattr(m8, "_pending_command_delivered", False)
+    monkeypatch.setattr(m8, "_pending_by_mac", {})
+    monkeypatch.setattr(m8, "_cloud_auth", {})
+    monkeypatch.setattr(m8, "_hold_seq", {})
+    monkeypatch.setattr(m8, "_device_cache", {})
+    monkeypatch.setattr(m8, "_device_cache_refreshing", set())
+    monkeypatch.setattr(m8, "_device_cache_gen", 0)
+    monkeypatch.setattr(m8, "_device_timeouts", {})
+    monkeypatch.setattr(m8, "_timings", {})
+    monkeypatch.setattr(m8, "_counters", {})
+    monkeypatch.setattr(m8, "_clock", {
+        "offset_s": m8.CLOCK_DEFAULT_OFFSET, "source": "default",
+        "checked_at": None, "last_drift_s": None, "checking": False})
+
+
+# ── Local cloud emulation ─────────────────────────────────────────────────────
+
+MAC = "C4:D8:D5:00:00:01"
+
+
+def test_emulated_post_is_served_back_by_get(monkeypatch):
+    monkeypatch.setattr(m8, "CLOUD_MODE", "emulate")
+    record = {"Mac": MAC, "IsPower": "1", "Mode": "2", "Speed": "3"}
+    ra = m8.device_encrypt_ecb(json.dumps(record))
+    assert json.loads(m8._forward_to_cloud(
+        "POST", "/api/AppV2/PostDeviceData", _form(RA=ra)))["data"] is None
+    resp = m8._forward_to_cloud(
+        "POST", "/api/AppV2/GetDeviceData", _form(Mac=m8.device_encrypt_ecb(MAC.lower())))
+    envelope = json.loads(resp)
+    assert envelope["ResponseCode"] == 200
+    assert m8.device_decrypt(envelope["data"]) == record
+
+
+def test_emulated_get_without_post_has_no_data():
+    resp = m8._emulate_cloud(
+        "POST", "/api/AppV2/GetAirIndex", _form(Mac=m8.device_encrypt_ecb(MAC)))
+    assert json.loads(resp)["data"] is None
+
+
+def test_emulated_cloud_times():
+    resp = json.loads(m8._emulate_cloud("GET", "/app/getCloudTimes.asp?x=1", b""))
+    assert resp[0]["success"] is True
+    assert set(resp[0]["result"][0]) == {"CloudDate", "CloudTime"}
+
+
+def test_emulator_ignores_other_paths():
+    assert m8._emulate_cloud("GET", "/api/AppV2/GetDeviceData", b"") is None
+    assert m8._emulate_cloud("POST", "/other", b"") is None
+
+
+# ── App-facing cloud API ──────────────────────────────────────────────────────
+
+def test_device_state_is_kept_per_mac():
+    m8._set_device_state_m8e({"IsPower": "0", "Mode": "1", "Speed": "1"}, mac="aa:bb")
+    assert m8._device_state_by_mac["AA:BB"]["IsPower"] == "0"
+    # A non-HRV record leaves the shared state alone
+    assert m8._device_state["ispower"] is None
+
+
+def test_app_home_device_detail_from_live_state():
+    assert m8._app_home_device_detail(MAC) is None
+    m8._set_device_state_m8e(
+        {"Mac": MAC, "IsPower": "1", "Mode": "2", "Speed": "3", "valveangle": "90"}, mac=MAC)
+    m8._set_sensor_m8e({"Mac": MAC, "Co2": "700", "Temp": "25"})
+    [detail] = m8._app_home_device_detail(MAC)
+    assert detail["mac"] == MAC
+    assert (detail["ispower"], detail["mode"], detail["speed"]) == (1, "2", "3")
+    assert detail["co2"] == "700"
+    assert detail["isOnLine"] == 1
+
+
+def test_app_device_function_needs_function_field():
+    m8._set_device_state_m8e({"IsPower": "1", "Speed": "2"}, mac=MAC)
+    assert m8._app_device_function(MAC) is None
+    m8._set_device_state_m8e({"Function": "3", "CountDown": "15"}, mac=MAC)
+    [result] = m8._app_device_function(MAC)
+    function, speed, countdown = result["result"][0]["Function"]
+    assert function["ParametersSub"][0]["Data"] == "3"
+    assert speed["ParametersSub"][0]["Data"] == "2"
+    assert [d["Data"] for d in countdown["ParametersSub"]] == ["15", "15"]
+
+
+def test_app_filter_alarm_from_consumables():
+    assert m8._app_filter_alarm(MAC) is None
+    m8._consumables_by_mac[MAC] = {"HighUsedTime": "120", "PrimaryUsedTime": "30"}
+    [result] = m8._app_filter_alarm(MAC)
+    assert result["result"][0]["HighUsedTime"] == "120"
+    assert result["result"][0]["HighAlarmTime"] is None
+
+
+# ── Lean request pipeline ─────────────────────────────────────────────────────
+
+def test_scan_form_keeps_known_fields_first_value_wins():
+    form = m8._scan_form(b"RA=abc%2Bdef%3D%3D&junk=1&Mac=a+b&RA=second&u_id=42&AuthCode=")
+    assert form == {"RA": "abc+def==", "Mac": "a b", "u_id": "42", "AuthCode": ""}
+
+
+def test_scan_form_matches_parse_form_on_known_fields():
+    body = b"mdid=7&md_mac=AA%3ABB&Mac=x%2Fy&noeq&=v&RA=r"
+    parsed = {k: v for k, v in m8._parse_form(body).items() if k.encode() in m8._FORM_FIELDS}
+    assert m8._scan_form(body) == parsed
+
+
+def test_splice_envelope_replaces_only_data():
+    resp = m8._envelope("OLD+/==")
+    span = m8._envelope_data_span(resp)
+    assert resp[span[0]:span[1]] == b"OLD+/=="
+    spliced = m8._splice_envelope(resp, span, "NEW")
+    assert json.loads(spliced) == {**json.loads(resp), "data": "NEW"}
+    assert spliced.replace(b"NEW", b"OLD+/==") == resp
+
+
+def test_envelope_without_plain_data_has_no_span():
+    assert m8._envelope_data_span(m8._envelope(None)) is None
+    assert m8._envelope_data_span(b'{"data":"a\\/b"}') is None
+    assert m8._envelope_data(b'{"data": "a\\/b"}') == ("a/b", None)
+
+
+# ── Sensor history ────────────────────────────────────────────────────────────
+
+def test_lttb_keeps_endpoints_and_threshold():
+    data = [(float(t), float((t * 7) % 13)) for t in range(100)]
+    sampled = m8._lttb(data, 10)
+    assert len(sampled) == 10
+    assert sampled[0] == data[0] and sampled[-1] == data[-1]
+    assert [p[0] for p in sampled] == sorted(p[0] for p in sampled)
+    assert all(p in data for p in sampled)
+
+
+def test_lttb_keeps_a_spike():
+    data = [(float(t), 0.0) for t in range(50)]
+    data[25] = (25.0, 100.0)
+    assert (25.0, 100.0) in m8._lttb(data, 5)
+
+
+def test_lttb_short_series_unchanged():
+    data = [(0.0, 1.0), (1.0, 2.0)]
+    assert m8._lttb(data, 10) == data
+    assert m8._lttb(data * 5, 2) == data * 5
+
+
+def test_history_query_aggregates_buckets():
+    start = 1_700_000_040.0  # a whole minute
+    for i in range(12):
+        m8._record_history("AA", {"co2": 600 + i, "pm25": "x"}, ts=start + i * 10)
+    assert m8._history_query("AA", "pm25", start, start + 120, 60) is None
+    assert m8._history_query("BB", "co2", start, start + 120, 60) is None
+    result = m8._history_query("AA", "co2", start, start + 120, 60)
+    assert result["source"] == "1m"
+    assert result["points"] == [
+        [start, 600.0, 605.0, 602.5, 605.0],
+        [start + 60, 606.0, 611.0, 608.5, 611.0],
+    ]
+
+
+def test_history_query_raw_and_lttb():
+    start = 1_700_000_040.0
+    for i in range(30):
+        m8._record_history("AA", {"temp": 20 + i % 5}, ts=start + i * 10)
+    raw = m8._history_query("AA", "temp", start, start + 300, 10)
+    assert raw["source"] == "raw"
+    assert len(raw["points"]) == 30
+    lttb = m8._history_query("AA", "temp", start, start + 300, 10, mode="lttb", points=8)
+    assert lttb["mode"] == "lttb"
+    assert len(lttb["points"]) == 8
+
+
+def test_parse_time_forms():
+    assert m8._parse_time(None, 5.0) == 5.0
+    assert m8._parse_time("1700000000", 0) == 1700000000.0
+    assert m8._parse_time("-2h", 0) == pytest.approx(m8.time.time() - 7200, abs=5)
+    assert m8._parse_time("2023-11-14T22:13:20+00:00", 0) == 1700000000.0
+
+
+# ── GetDeviceData cache ───────────────────────────────────────────────────────
+
+GET_DEVICE_DATA = "/api/AppV2/GetDeviceData"
+
+
+@pytest.fixture
+def cloud(monkeypatch):
+    """Proxy-mode cloud answering GetDeviceData with `cloud.record`."""
+    monkeypatch.setattr(m8, "CLOUD_MODE", "proxy")
+    monkeypatch.setattr(m8, "DEVICE_CACHE_TTL", 10.0)
+    monkeypatch.setattr(m8, "_refresh_device_cache", MagicMock())
+    cloud = MagicMock()
+    cloud.record = {"Mac": MAC, "IsPower": "1", "Mode": "2", "Speed": "3"}
+    cloud.up = True
+    cloud.side_effect = lambda *args, **kwargs: m8._envelope(
+        m8.device_encrypt_ecb(json.dumps(cloud.record))) if cloud.up else None
+    monkeypatch.setattr(m8, "_forward_to_cloud", cloud)
+    return cloud
+
+
+def _poll() -> dict | None:
+    handler = object.__new__(m8.M8Handler)
+    handler._deadline = None
+    resp = handler._device_data_response(GET_DEVICE_DATA, b"", MAC, m8._M8E)
+    return resp and m8.device_decrypt(json.loads(resp)["data"])
+
+
+def _age_cache(seconds: float) -> None:
+    m8._device_cache[MAC]["at"] -= seconds
+
+
+def test_fresh_answer_is_served_from_cache(cloud):
+    assert _poll()["Speed"] == "3"
+    cloud.record = {**cloud.record, "Speed": "1"}
+    assert _poll()["Speed"] == "3"
+    assert cloud.call_count == 1
+    assert m8._device_state_by_mac[MAC]["Speed"] == "3"
+
+
+def test_stale_answer_is_served_while_revalidating(cloud):
+    _poll()
+    _age_cache(m8.DEVICE_CACHE_TTL)
+    assert _poll()["Speed"] == "3"
+    assert cloud.call_count == 1
+    m8._refresh_device_cache.assert_called_once()
+
+
+def test_command_invalidates_cache(cloud):
+    _poll()
+    cloud.record = {**cloud.record, "Speed": "1"}
+    m8._invalidate_device_cache("test")
+    assert _poll()["Speed"] == "1"
+    assert cloud.call_count == 2
+
+
+def test_refresh_from_before_an_invalidation_is_dropped(cloud):
+    _, gen = m8._device_cache_get(MAC)
+    m8._invalidate_device_cache("test")
+    m8._device_cache_put(MAC, m8._device_cache_entry(cloud(), m8._M8E), gen)
+    assert m8._device_cache_get(MAC)[0] is None
+
+
+def test_old_answer_is_served_when_cloud_is_down(cloud):
+    _poll()
+    _age_cache(m8.DEVICE_CACHE_MAX_AGE)
+    cloud.up = False
+    assert _poll()["Speed"] == "3"
+
+
+def test_last_reported_state_is_served_when_cloud_is_down_and_nothing_cached(cloud):
+    cloud.up = False
+    assert _poll() is None
+    m8._set_device_state_m8e({"Mac": MAC, "IsPower": "1", "Mode": "2", "Speed": "2"}, mac=MAC)
+    assert _poll()["Speed"] == "2"
+
+
+def test_cache_is_off_outside_proxy_mode(cloud, monkeypatch):
+    monkeypatch.setattr(m8, "CLOUD_MODE", "emulate")
+    _poll()
+    _poll()
+    assert cloud.call_count == 2
+
+
+# ── Cloud clock ───────────────────────────────────────────────────────────────
+
+CLOUD_TIMES = "/app/getCloudTimes.asp"
+
+
+class _InlineThread:
+    """threading.Thread stand-in that runs its target on start()."""
+
+    def __init__(self, target, daemon=None):
+        self._target = target
+
+    def start(self):
+        self._target()
+
+
+def _cloud_times(offset_hours: float) -> bytes:
+    """A getCloudTimes.asp answer from a cloud `offset_hours` ahead of UTC."""
+    now = datetime.now(timezone.utc) + timedelta(hours=offset_hours)
+    return json.dumps([{"success": True, "result": [{
+        "CloudDate": now.strftime("%Y/%m/%d"), "CloudTime": now.strftime("%H:%M")}]}]).encode()
+
+
+@pytest.fixture
+def clock_check(monkeypatch):
+    """Run clock checks inline against a cloud answering `clock_check.return_value`."""
+    monkeypatch.setattr(m8.threading, "Thread", _InlineThread)
+    request = MagicMock(return_value=_cloud_times(8))
+    monkeypatch.setattr(m8, "_cloud_request", request)
+    return request
+
+
+def test_cloud_times_answer_uses_the_cloud_offset():
+    answer = m8._parse_cloud_times(m8._cloud_times_response())
+    expected = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=8)
+    assert abs((answer - expected).total_seconds()) < 61
+
+
+def test_unparsable_cloud_times():
+    assert m8._parse_cloud_times(b"<html>") is None
+    assert m8._parse_cloud_times(b'[{"result": []}]') is None
+
+
+def test_clock_check_keeps_offset_within_tolerance(clock_check):
+    m8._check_cloud_clock(CLOUD_TIMES)
+    assert m8._clock["offset_s"] == m8.CLOCK_DEFAULT_OFFSET
+    assert m8._clock["source"] == "default"
+    assert abs(m8._clock["last_drift_s"]) <= m8.CLOCK_DRIFT_TOLERANCE
+
+
+def test_clock_check_adopts_drifted_cloud_offset(clock_check):
+    clock_check.return_value = _cloud_times(9)
+    m8._check_cloud_clock(CLOUD_TIMES)
+    assert m8._clock["offset_s"] == 9 * 3600
+    assert m8._clock["source"] == "cloud"
+
+
+def test_clock_check_runs_once_per_interval(clock_check):
+    m8._check_cloud_clock(CLOUD_TIMES)
+    m8._check_cloud_clock(CLOUD_TIMES)
+    assert clock_check.call_count == 1
+    assert not m8._clock["checking"]
+
+
+def test_failed_clock_check_keeps_offset(clock_check):
+    clock_check.return_value = None
+    m8._check_cloud_clock(CLOUD_TIMES)
+    assert m8._clock["offset_s"] == m8.CLOCK_DEFAULT_OFFSET
+
+
+# ── Adaptive timeouts and hedging ─────────────────────────────────────────────
+
+def _observe_many(name: str, seconds: float, count: int = m8.CLOUD_ADAPT_SAMPLES) -> None:
+    for _ in range(count):
+        m8._observe(f"cloud.{name}", seconds)
+
+
+def test_cloud_limits_start_at_the_fixed_timeout():
+    _observe_many("GetDeviceData", 0.1, m8.CLOUD_ADAPT_SAMPLES - 1)
+    assert m8._cloud_limits("GetDeviceData") == (m8.CLOUD_TIMEOUT_MAX, None)
+
+
+def test_cloud_limits_follow_observed_latency():
+    _observe_many("GetDeviceData", 0.1)
+    assert m8._cloud_limits("GetDeviceData") == (m8.CLOUD_TIMEOUT_MIN, 0.1)
+    _observe_many("GetAirIndex", 2.0)
+    assert m8._cloud_limits("GetAirIndex") == (4.0, 2.0)
+    _observe_many("PostDeviceData", 10.0)
+    assert m8._cloud_limits("PostDeviceData")[0] == m8.CLOUD_TIMEOUT_MAX
+
+
+def _attempts(monkeypatch, answers: list) -> list:
+    """Make attempt i sleep answers[i][0] s and return answers[i][1]; log the calls."""
+    calls = []
+
+    def attempt(*args):
+        delay, data = answers[len(calls)]
+        calls.append(time.monotonic())
+        time.sleep(delay)
+        return data
+
+    monkeypatch.setattr(m8, "_cloud_attempt", attempt)
+    return calls
+
+
+def _hedged(hedge_after: float | None) -> bytes | None:
+    return m8._hedged_request("POST", "/api/AppV2/GetDeviceData", b"", None,
+                              m8.CLOUD_HOST_M8E, "GetDeviceData", 1.0, hedge_after)
+
+
+def test_fast_answer_is_not_hedged(monkeypatch):
+    calls = _attempts(monkeypatch, [(0, b"first")])
+    assert _hedged(0.2) == b"first"
+    assert len(calls) == 1
+
+
+def test_slow_answer_is_hedged_and_the_duplicate_wins(monkeypatch):
+    calls = _attempts(monkeypatch, [(0.5, b"first"), (0, b"second")])
+    assert _hedged(0.05) == b"second"
+    assert len(calls) == 2
+    assert m8._counters == {"hedge.sent.GetDeviceData": 1, "hedge.won.GetDeviceData": 1}
+
+
+def test_failed_attempt_is_retried_once_within_the_timeout(monkeypatch):
+    calls = _attempts(monkeypatch, [(0, None), (0, b"second")])
+    assert _hedged(None) == b"second"
+    assert len(calls) == 2
+
+
+def test_hedged_request_gives_up_after_two_failures(monkeypatch):
+    calls = _attempts(monkeypatch, [(0, None), (0, None)])
+    assert _hedged(0.05) is None
+    assert len(calls) == 2
+
+
+# ── Request deadlines ─────────────────────────────────────────────────────────
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(m8.time, "monotonic", clock)
+    return clock
+
+
+def test_deadline_leaves_a_reply_margin(clock):
+    expected = clock.now + m8.DEVICE_TIMEOUT_DEFAULT - m8.DEADLINE_MARGIN
+    assert m8._device_deadline("ip", clock.now) == expected
+
+
+def test_single_hangup_does_not_lower_timeout(clock):
+    m8._learn_device_timeout("ip", 2.0, waited=False)
+    assert m8._device_timeout("ip", clock.now) == m8.DEVICE_TIMEOUT_DEFAULT
+
+
+def test_repeated_hangups_lower_to_longest(clock):
+    m8._learn_device_timeout("ip", 2.0, waited=False)
+    clock.now += 30
+    m8._learn_device_timeout("ip", 3.0, waited=False)
+    assert m8._device_timeout("ip", clock.now) == 3.0
+
+
+def test_hangups_outside_window_do_not_add_up(clock):
+    m8._learn_device_timeout("ip", 2.0, waited=False)
+    clock.now += m8.DEVICE_TIMEOUT_RECOVERY
+    m8._learn_device_timeout("ip", 2.0, waited=False)
+    assert m8._device_timeout("ip", clock.now) == m8.DEVICE_TIMEOUT_DEFAULT
+
+
+def test_lowered_timeout_recovers(clock):
+    for _ in range(m8.DEVICE_TIMEOUT_HANGUPS):
+        m8._learn_device_timeout("ip", 0.5, waited=False)
+    lowered = m8._device_timeout("ip", clock.now)
+    assert lowered == m8.DEVICE_TIMEOUT_MIN
+    halfway = m8._device_timeout("ip", clock.now + m8.DEVICE_TIMEOUT_RECOVERY / 2)
+    assert halfway == pytest.approx((lowered + m8.DEVICE_TIMEOUT_DEFAULT) / 2)
+    later = clock.now + 2 * m8.DEVICE_TIMEOUT_RECOVERY
+    assert m8._device_timeout("ip", later) == m8.DEVICE_TIMEOUT_DEFAULT
+
+
+def test_long_wait_raises_timeout(clock):
+    m8._learn_device_timeout("ip", 4.0, waited=True)
+    assert m8._device_timeout("ip", clock.now) == m8.DEVICE_TIMEOUT_DEFAULT
+    m8._learn_device_timeout("ip", 7.5, waited=True)
+    assert m8._device_timeout("ip", clock.now + 10_000) == 7.5
+
+
+def test_spent_deadline_skips_the_cloud(clock, monkeypatch):
+    request = MagicMock(return_value=b"answer")
+    monkeypatch.setattr(m8, "_cloud_request", request)
+    deadline = clock.now + m8.DEADLINE_MIN_CLOUD / 2
+    assert m8._forward_to_cloud("POST", GET_DEVICE_DATA, b"", deadline=deadline) is None
+    assert request.call_count == 0
+    assert m8._counters == {"deadline.local.GetDeviceData": 1}
+
+
+def test_cloud_gets_the_remaining_budget(clock, monkeypatch):
+    request = MagicMock(return_value=b"answer")
+    monkeypatch.setattr(m8, "_cloud_request", request)
+    assert m8._forward_to_cloud("POST", GET_DEVICE_DATA, b"", deadline=clock.now + 3) == b"answer"
+    assert request.call_args.args[-1] == 3
+
+
+# ── Long-hold GetDeviceData ───────────────────────────────────────────────────
+
+COMMAND = {"ispower": 1, "mode": 2, "speed": 3}
+
+
+@pytest.fixture
+def long_hold(monkeypatch):
+    monkeypatch.setattr(m8, "LONG_HOLD_MAX", 0.6)
+
+
+def _later(action, delay: float = 0.05) -> None:
+    timer = threading.Timer(delay, action)
+    timer.daemon = True
+    timer.start()
+
+
+def _queue_command() -> None:
+    with m8._lock:
+        m8._set_pending_command(dict(COMMAND))
+
+
+def test_hold_needs_time_before_the_deadline(long_hold):
+    deadline = time.monotonic() + m8.LONG_HOLD_RESERVE + m8.LONG_HOLD_MIN / 2
+    assert not m8._hold_poll(MAC, deadline)
+
+
+def test_pending_command_is_not_held(long_hold):
+    _queue_command()
+    assert not m8._hold_poll(MAC, time.monotonic() + 10)
+
+
+def test_queued_command_releases_held_poll(long_hold):
+    _later(_queue_command)
+    started = time.monotonic()
+    assert m8._hold_poll(MAC, started + 10)
+    assert time.monotonic() - started < 0.5
+    assert m8._counters == {"hold.woken": 1}
+
+
+def test_changed_record_releases_only_its_mac(long_hold):
+    def wake(key):
+        with m8._lock:
+            m8._wake_held(key)
+
+    _later(lambda: wake(MAC))
+    started = time.monotonic()
+    assert m8._hold_poll(MAC, started + 10)
+    assert time.monotonic() - started < 0.5
+    _later(lambda: wake("C4:D8:D5:00:00:02"))
+    assert m8._hold_poll(MAC, time.monotonic() + 10)
+    assert m8._counters == {"hold.woken": 1, "hold.expired": 1}
+
+
+def test_command_delivery_is_timed_once():
+    _queue_command()
+    m8._note_command_delivered(held=True)
+    m8._note_command_delivered(held=False)
+    assert set(m8._timings) == {"command.to_device_held"}
+    assert len(m8._timings["command.to_device_held"]) == 1
+
+
+# ── Command injection ─────────────────────────────────────────────────────────
+
+M8_RECORD = {"IsPower": True, "Mode": "17", "Speed": "2", "IsReServe": False}
+M8E_RECORD = {"Mac": MAC, "IsPower": "1", "Mode": "2", "Speed": "2",
+              "Function": "0", "valveangle": "90"}
+
+
+def _entry(record: dict, proto=m8._M8E) -> dict:
+    plaintext = json.dumps(record, separators=(",", ":"))
+    return m8._device_cache_entry(m8._envelope(proto.encrypt(plaintext)), proto)
+
+
+def _inject(record: dict, mac: str = MAC, proto=m8._M8E) -> tuple[dict, bytes]:
+    entry = _entry(record, proto)
+    return entry, m8._inject_command(entry, mac, proto)
+
+
+def _injected(resp: bytes, proto=m8._M8E) -> dict:
+    return json.loads(proto.decrypt(json.loads(resp)["data"]))
+
+
+def test_decrypt_tells_cbc_from_ecb():
+    for i in range(200):
+        record = json.dumps({"IsPower": True, "Mode": str(i % 3 + 1), "X": "y" * (i % 40)})
+        assert m8.device_decrypt_raw(m8.device_encrypt(record)) == record
+        record = json.dumps({"Mac": "AA", "IsPower": "1", "n": i})
+        assert m8.device_decrypt_raw(m8.device_encrypt_ecb(record)) == record
+
+
+def test_inject_nothing_pending_returns_cloud_answer():
+    entry, resp = _inject(M8E_RECORD)
+    assert resp is entry["resp"]
+
+
+def test_inject_shared_command_into_m8_record():
+    m8._pending_command = {"ispower": 0, "mode": 3, "speed": 1}
+    entry, resp = _inject(M8_RECORD, m8.M8_KEY, m8._M8)
+    assert _injected(resp, m8._M8) == {
+        "IsPower": False, "Mode": "3", "Speed": "1", "IsReServe": False}
+    # Envelope kept byte for byte around the new data
+    span = entry["span"]
+    assert resp[:span[0]] == entry["resp"][:span[0]]
+    assert resp.endswith(entry["resp"][span[1]:])
+    assert m8._pending_command is not None
+
+
+def test_m8_confirms_internal_mode_alias():
+    m8._pending_command = {"ispower": 1, "mode": 1, "speed": 2}
+    m8._device_state.update(ispower=1, mode=17, speed=2)
+    _inject(M8_RECORD, m8.M8_KEY, m8._M8)
+    assert m8._pending_command is None
+
+
+def test_inject_per_mac_command_until_confirmed():
+    m8._queue_device_command(MAC, ispower=0, speed=3)
+    _, resp = _inject(M8E_RECORD)
+    assert _injected(resp) == {**M8E_RECORD, "IsPower": "0", "Speed": "3"}
+    assert MAC in m8._pending_by_mac
+    m8._device_state_by_mac[MAC] = {"IsPower": "0", "Speed": "3"}
+    _inject(M8E_RECORD)
+    assert MAC not in m8._pending_by_mac
+
+
+def test_per_mac_command_only_reaches_its_device():
+    m8._queue_device_command("C4:D8:D5:00:00:02", mode=1)
+    entry, resp = _inject(M8E_RECORD)
+    assert resp is entry["resp"]
+
+
+def test_queued_writes_merge_per_device():
+    m8._queue_device_command(MAC, function=2)
+    m8._queue_device_command(MAC, countdown=30)
+    assert m8._pending_by_mac[MAC]["target"] == {"function": 2, "countdown": 30}
+    _, resp = _inject(M8E_RECORD)
+    assert _injected(resp) == {**M8E_RECORD, "Function": "2", "CountDown": "30"}
+
+
+def test_inject_adds_keys_the_record_lacks():
+    m8._queue_device_command(MAC, mode=1)
+    record = {"Mac": MAC, "IsPower": "1", "note": "100%"}
+    _, resp = _inject(record)
+    assert _injected(resp) == {**record, "Mode": "1"}
+
+
+def test_shared_command_needs_the_hrv_marker():
+    m8._pending_command = {"ispower": 0, "mode": 2, "speed": 1}
+    sensor = {k: v for k, v in M8E_RECORD.items() if k != "valveangle"}
+    entry, resp = _inject(sensor)
+    assert resp is entry["resp"]
+    _, resp = _inject(M8E_RECORD)
+    assert _injected(resp)["IsPower"] == "0"
+
+
+def test_unconfirmed_command_expires():
+    m8._queue_device_command(MAC, speed=3)
+    m8._pending_by_mac[MAC]["at"] -= m8.PENDING_COMMAND_TTL + 1
+    entry, resp = _inject(M8E_RECORD)
+    assert resp is entry["resp"]
+    assert MAC not in m8._pending_by_mac
+
+
+# ── REST command API ──────────────────────────────────────────────────────────
+
+@pytest.fixture
+def rest():
+    """The add-on's REST server on a free port; yields a POST helper."""
+    server = m8.ThreadingHTTPServer(("127.0.0.1", 0), m8.RestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def post(path: str, payload: dict) -> tuple[int, dict]:
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+        try:
+            conn.request("POST", path, json.dumps(payload),
+                         {"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            return resp.status, json.loads(resp.read())
+        finally:
+            conn.close()
+
+    yield post
+    server.shutdown()
+    server.server_close()
+
+
+def test_command_for_unknown_mac_is_rejected(rest):
+    status, _ = rest("/api/command", {"mac": MAC, "countdown": 30})
+    assert status == 404
+    assert m8._pending_command is None
+    assert m8._pending_by_mac == {}
+    assert rest("/api/command/clear", {"mac": MAC})[0] == 404
+
+
+def test_command_for_known_mac_is_queued_without_colons(rest):
+    m8._device_state_by_mac[MAC] = {"IsPower": "1"}
+    status, reply = rest("/api/command", {"mac": MAC.replace(":", ""), "countdown": 30})
+    assert status == 200
+    assert reply == {"ok": True, "mac": MAC, "fields": ["countdown"], "cloud": False}
+    assert m8._pending_by_mac[MAC]["target"] == {"countdown": 30}
+    assert m8._pending_command is None
+    assert rest("/api/command/clear", {"mac": MAC}) == (200, {"ok": True})
+    assert m8._pending_by_mac == {}
@@ -0,0 +1,79 @@
+"""Traffic capture records and their replay."""
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import m8_local_server as m8
+import m8_replay as replay
+from m8_bench import _form
+
+MAC = "C4:D8:D5:00:00:01"
+
+
+@pytest.fixture
+def capture(monkeypatch, tmp_path):
+    """Capture into a temporary file; yields its path."""
+    monkeypatch.setattr(m8, "_capture_log", None)
+    path = tmp_path / "m8_capture.jsonl"
+    m8._init_capture(str(path))
+    yield path
+    for handler in logging.getLogger("m8-capture").handlers:
+        handler.close()
+    logging.getLogger("m8-capture").handlers.clear()
+
+
+def test_capture_record_decrypts_ra_and_mac(capture):
+    ra = {"Mac": MAC, "Co2": "700"}
+    ctx = SimpleNamespace(
+        ts=1700000000.0, t0=time.perf_counter(),
+        body=_form(RA=m8.device_encrypt_ecb(json.dumps(ra)), Mac=m8.device_encrypt_ecb(MAC)),
+        cloud=b'{"data":null}', cloud_ms=12.345, status=200, resp=b"{}",
+    )
+    m8._capture_write("POST", "/api/AppV2/PostAirIndex", ctx)
+    [record] = replay.load_capture([str(capture)])
+    assert record["path"] == "/api/AppV2/PostAirIndex"
+    assert json.loads(record["ra"]) == ra
+    assert record["mac"] == MAC
+    assert record["cloud"] == '{"data":null}'
+    assert record["cloud_ms"] == 12.35
+
+
+def test_load_capture_merges_files_by_time_and_filters_mac(tmp_path):
+    def line(ts, mac):
+        return json.dumps({"ts": ts, "mac": mac, "path": "/x"}) + "\n"
+
+    rotated = tmp_path / "m8_capture.jsonl.1.gz"
+    with gzip.open(rotated, "wt", encoding="utf-8") as fh:
+        fh.write(line(1, MAC) + line(3, "AA:BB"))
+    current = tmp_path / "m8_capture.jsonl"
+    current.write_text(line(2, MAC.lower()) + "not json\n\n" + line(4, MAC))
+    records = replay.load_capture([str(rotated), str(current)])
+    assert [r["ts"] for r in records] == [1, 2, 3, 4]
+    records = replay.load_capture([str(rotated), str(current)], mac=MAC)
+    assert [r["ts"] for r in records] == [1, 2, 4]
+
+
+def test_recorded_cloud_answers_in_capture_order(monkeypatch):
+    path = "/api/AppV2/GetDeviceData"
+    records = [
+        {"path": path, "cloud": '{"n":1}', "cloud_ms": 5.0},
+        {"path": path, "cloud": None, "cloud_ms": 5000.0},
+        {"path": path, "cloud": '{"n":3}', "cloud_ms": 5.0},
+        {"path": path, "cloud": '{"n":4}', "cloud_ms": None},  # answered locally
+    ]
+    cloud = replay._start_cloud(records)
+    monkeypatch.setattr(m8, "CLOUD_HOST", "127.0.0.1")
+    monkeypatch.setattr(m8, "CLOUD_PORT", cloud.server_address[1])
+    monkeypatch.setattr(m8, "CLOUD_HEDGE", False)
+    try:
+        answers = [m8._forward_to_cloud("POST", path, b"") for _ in range(4)]
+    finally:
+        cloud.shutdown()
+        cloud.server_close()
+    assert answers == [b'{"n":1}', None, b'{"n":3}', None]
@@ -0,0 +1,62 @@
+"""snapshot_from_dict parsing and snapshot diffs."""
+from __future__ import annotations
+
+from custom_components.lifegear_hrv.const import (
+    DEVICE_MODEL_BATH_HEATER,
+    DEVICE_MODEL_M8,
+    DEVICE_MODEL_M8E_SENSOR,
+)
+from custom_components.lifegear_hrv.models import (
+    BathHeaterSnapshot,
+    HRVSnapshot,
+    SensorSnapshot,
+    snapshot_from_dict,
+)
+
+
+def test_parses_by_model():
+    assert type(snapshot_from_dict(DEVICE_MODEL_M8, {})) is HRVSnapshot
+    assert type(snapshot_from_dict(DEVICE_MODEL_BATH_HEATER, {})) is BathHeaterSnapshot
+    assert type(snapshot_from_dict(DEVICE_MODEL_M8E_SENSOR, {})) is SensorSnapshot
+
+
+def test_blank_and_garbage_become_none():
+    snap = snapshot_from_dict(DEVICE_MODEL_M8, {
+        "md_co2": "", "md_pm25": "n/a", "md_temp": "24.6", "md_speed": "3",
+        "md_temp_oa": "", "md_temp_sa": "18.25", "md_mac": "",
+    })
+    assert snap.co2 is None
+    assert snap.pm25 is None
+    assert snap.temp == 25
+    assert snap.speed == 3
+    assert snap.temp_oa is None
+    assert snap.temp_sa == 18.25
+    assert snap.mac is None
+    assert snap.local is False
+
+
+def test_internal_mode_is_normalized():
+    assert snapshot_from_dict(DEVICE_MODEL_M8, {"md_mode": "18"}).mode == 2
+    assert snapshot_from_dict(DEVICE_MODEL_M8, {"md_mode": 3}).mode == 3
+    assert snapshot_from_dict(DEVICE_MODEL_M8, {"md_mode": ""}).mode is None
+
+
+def test_as_dict_round_trips():
+    snap = snapshot_from_dict(DEVICE_MODEL_BATH_HEATER, {
+        "md_mac": "AA:BB", "md_function": "2", "md_countdown": "15", "md_ispower": 1,
+    })
+    again = BathHeaterSnapshot.from_dict(snap.as_dict())
+    assert again.diff(snap) == set()
+
+
+def test_diff_names_changed_fields():
+    old = snapshot_from_dict(DEVICE_MODEL_M8, {"md_co2": "600", "md_speed": "1", "md_mode": "1"})
+    new = snapshot_from_dict(DEVICE_MODEL_M8, {"md_co2": 640, "md_speed": "1", "md_mode": "17"})
+    assert new.diff(old) == {"co2"}
+
+
+def test_diff_against_nothing_comparable_is_none():
+    hrv = snapshot_from_dict(DEVICE_MODEL_M8, {"md_co2": "600"})
+    sensor = snapshot_from_dict(DEVICE_MODEL_M8E_SENSOR, {"md_co2": "600"})
+    assert hrv.diff(None) is None
+    assert hrv.diff(sensor) is None
@@ -0,0 +1,155 @@
+"""AccountScheduler lane ordering and rate limiting."""
+from __future__ import annotations
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from custom_components.lifegear_hrv.const import DOMAIN
+from custom_components.lifegear_hrv.scheduler import (
+    BURST,
+    LANE_BACKGROUND,
+    LANE_CONFIRM,
+    LANE_CONTROL,
+    LANE_POLL,
+    AccountScheduler,
+    Superseded,
+    current_lane,
+    get_scheduler,
+    in_lane,
+    release_scheduler,
+)
+
+
+def test_waiting_calls_are_served_by_lane_then_arrival():
+    async def run() -> list:
+        scheduler = AccountScheduler()
+        scheduler.set_limits("entry", 600, 1)
+        order = []
+        gate = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(LANE_POLL):
+                await gate.wait()
+
+        async def call(lane, name):
+            async with scheduler.slot(lane):
+                order.append(name)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.create_task(call(lane, name))
+            for lane, name in (
+                (LANE_BACKGROUND, "background"),
+                (LANE_POLL, "poll 1"),
+                (LANE_CONFIRM, "confirm"),
+                (LANE_POLL, "poll 2"),
+                (LANE_CONTROL, "control"),
+            )
+        ]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(holder, *waiters)
+        return order
+
+    assert asyncio.run(run()) == ["control", "confirm", "poll 1", "poll 2", "background"]
+
+
+def test_queued_poll_is_dropped_for_a_newer_read_of_the_same_key():
+    async def run() -> list:
+        scheduler = AccountScheduler()
+        scheduler.set_limits("entry", 600, 1)
+        order = []
+        gate = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(LANE_POLL):
+                await gate.wait()
+
+        async def call(lane, name, key):
+            try:
+                async with scheduler.slot(lane, key=key):
+                    order.append(name)
+            except Superseded:
+                order.append(f"{name} dropped")
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        stale = asyncio.create_task(call(LANE_POLL, "stale poll", "a/status"))
+        other = asyncio.create_task(call(LANE_POLL, "other entry", "b/status"))
+        await asyncio.sleep(0)
+        confirm = asyncio.create_task(call(LANE_CONFIRM, "confirm", "a/status"))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(holder, stale, other, confirm)
+        assert scheduler.diagnostics()["superseded"] == 1
+        return order
+
+    assert asyncio.run(run()) == ["stale poll dropped", "confirm", "other entry"]
+
+
+def test_rate_limits_after_the_burst():
+    rate = 1200  # per minute: one token every 50 ms
+
+    async def run() -> tuple[float, float]:
+        scheduler = AccountScheduler()
+        scheduler.set_limits("entry", rate, BURST + 3)
+        started = time.monotonic()
+        for _ in range(BURST):
+            async with scheduler.slot(LANE_POLL):
+                pass
+        burst = time.monotonic() - started
+        started = time.monotonic()
+        for _ in range(3):
+            async with scheduler.slot(LANE_POLL):
+                pass
+        return burst, time.monotonic() - started
+
+    burst, paced = asyncio.run(run())
+    interval = 60 / rate
+    assert burst < interval
+    assert paced >= 2.5 * interval
+
+
+def test_strictest_entry_limits_apply():
+    scheduler = AccountScheduler()
+    scheduler.set_limits("a", 30, 2)
+    scheduler.set_limits("b", 12, 3)
+    assert scheduler.rate == 12 / 60
+    assert scheduler.concurrency == 2
+    scheduler.remove("b")
+    assert scheduler.rate == 30 / 60
+
+
+def test_scheduler_is_dropped_with_the_accounts_last_entry():
+    hass = SimpleNamespace(data={})
+    scheduler = get_scheduler(hass, "0912")
+    assert get_scheduler(hass, "0912") is scheduler
+    scheduler.set_limits("a", 30, 2)
+    scheduler.set_limits("b", 30, 2)
+    release_scheduler(hass, "0912", "a")
+    assert get_scheduler(hass, "0912") is scheduler
+    release_scheduler(hass, "0912", "b")
+    assert hass.data[DOMAIN] == {}
+    assert get_scheduler(hass, "0912") is not scheduler
+    release_scheduler(hass, "0912")
+    assert hass.data[DOMAIN] == {}
+
+
+def test_in_lane_only_raises_priority():
+    seen = []
+
+    @in_lane(LANE_CONFIRM)
+    async def confirm():
+        seen.append(current_lane.get())
+
+    @in_lane(LANE_CONTROL)
+    async def control():
+        seen.append(current_lane.get())
+        await confirm()
+
+    asyncio.run(confirm())
+    asyncio.run(control())
+    assert seen == [LANE_CONFIRM, LANE_CONTROL, LANE_CONTROL]
+    assert current_lane.get() == LANE_POLL
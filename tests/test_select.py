@@ -0,0 +1,61 @@
+"""Optimistic selects after a command."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.lifegear_hrv import select  # noqa: E402
+from custom_components.lifegear_hrv.const import (  # noqa: E402
+    CONF_DEVICE_MODEL,
+    CONF_MAC,
+    DEVICE_MODEL_M8,
+)
+from custom_components.lifegear_hrv.models import snapshot_from_dict  # noqa: E402
+from custom_components.lifegear_hrv.select import LifegearHRVModeSelect  # noqa: E402
+
+
+@pytest.fixture
+def timers(monkeypatch):
+    timers = []
+
+    def _call_later(hass, delay, action):
+        timers.append(action)
+        return MagicMock()
+
+    monkeypatch.setattr(select, "async_call_later", _call_later)
+    return timers
+
+
+@pytest.fixture
+def entity():
+    coordinator = MagicMock()
+    coordinator.data = snapshot_from_dict(DEVICE_MODEL_M8, {"md_mode": 1})
+    coordinator.async_set_control = AsyncMock(return_value=True)
+    entry = MagicMock()
+    entry.data = {CONF_MAC: "C4:D8:D5:00:00:01", CONF_DEVICE_MODEL: DEVICE_MODEL_M8}
+    entity = LifegearHRVModeSelect(coordinator, entry)
+    entity.async_write_ha_state = MagicMock()
+    return entity
+
+
+def test_a_new_command_restarts_the_grace_timer(entity, timers):
+    first, second = entity.options[1], entity.options[2]
+    asyncio.run(entity.async_select_option(first))
+    pending = entity._grace_unsub
+    asyncio.run(entity.async_select_option(second))
+    pending.assert_called_once()
+    assert len(timers) == 2
+    assert entity._grace_unsub is not pending
+
+
+def test_ignored_command_reverts_when_the_grace_ends(entity, timers):
+    actual = entity.current_option
+    asyncio.run(entity.async_select_option(entity.options[1]))
+    assert entity.current_option == entity.options[1]
+    timers[-1](None)
+    assert entity.current_option == actual
+    assert entity._grace_unsub is None
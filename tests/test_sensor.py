@@ -0,0 +1,129 @@
+"""Significance-based sensor publishing."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from custom_components.lifegear_hrv import sensor  # noqa: E402
+from custom_components.lifegear_hrv.const import CONF_MAC  # noqa: E402
+from custom_components.lifegear_hrv.sensor import LifegearHRVBaseSensor, _moved  # noqa: E402
+
+DEADBAND = 10.0
+HEARTBEAT = 900.0
+
+
+class _Sensor(LifegearHRVBaseSensor):
+    """CO2-like sensor whose value and availability the test sets."""
+
+    _publish_key = "co2"
+    value = None
+    up = True
+
+    @property
+    def available(self) -> bool:
+        return self.up
+
+    @property
+    def native_value(self):
+        return self.value
+
+
+class Clock:
+    """Stand-in for time.monotonic that only moves when told to."""
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sensor.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def entity(monkeypatch):
+    monkeypatch.setattr(sensor, "async_track_time_interval", MagicMock())
+    coordinator = MagicMock()
+    coordinator.publish_policy.return_value = (DEADBAND, HEARTBEAT)
+    entry = MagicMock()
+    entry.data = {CONF_MAC: "C4:D8:D5:00:00:01"}
+    entity = _Sensor(coordinator, entry)
+    entity.async_write_ha_state = MagicMock()
+    return entity
+
+
+def _update(entity, value) -> bool:
+    """Feed one coordinator update; True if it wrote state."""
+    entity.async_write_ha_state.reset_mock()
+    entity.value = value
+    entity._handle_coordinator_update()
+    return entity.async_write_ha_state.called
+
+
+def test_moved():
+    assert _moved(None, 600, 10)
+    assert not _moved(None, None, 10)
+    assert not _moved(600, 609, 10)
+    assert _moved(600, 610, 10)
+    assert _moved(20, 21, 0)
+    assert not _moved(20, 20.0, 0)
+    assert _moved("a", "b", 1)
+
+
+def test_publishes_only_significant_changes(entity, clock):
+    assert _update(entity, 600)
+    clock.now += 60
+    assert not _update(entity, 605)
+    clock.now += 60
+    assert not _update(entity, 609)
+    clock.now += 60
+    assert _update(entity, 611)
+
+
+def test_availability_change_publishes(entity, clock):
+    assert _update(entity, 600)
+    entity.up = False
+    assert _update(entity, 600)
+
+
+def _heartbeat(entity) -> bool:
+    """Run one heartbeat check; True if it wrote state."""
+    entity.async_write_ha_state.reset_mock()
+    entity._async_heartbeat()
+    return entity.async_write_ha_state.called
+
+
+def test_heartbeat_is_scheduled_when_added(entity):
+    entity.hass = MagicMock()
+    asyncio.run(entity.async_added_to_hass())
+    sensor.async_track_time_interval.assert_called_once()
+    _hass, action, _interval = sensor.async_track_time_interval.call_args.args
+    assert action == entity._async_heartbeat
+
+
+def test_heartbeat_republishes_steady_value(entity, clock):
+    assert _update(entity, 600)
+    clock.now += HEARTBEAT - 1
+    assert not _heartbeat(entity)
+    clock.now += 1
+    # Due even though no coordinator update arrives
+    assert _heartbeat(entity)
+    assert not _heartbeat(entity)
+
+
+def test_held_change_is_published_at_heartbeat(entity, clock):
+    assert _update(entity, 600)
+    clock.now += 60
+    assert not _update(entity, 605)
+    clock.now += HEARTBEAT - 60
+    assert _heartbeat(entity)
+    assert entity._published == (True, 605)
@@ -0,0 +1,106 @@
+"""lifegear_hrv.set_many."""
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from homeassistant.exceptions import HomeAssistantError  # noqa: E402
+
+from custom_components.lifegear_hrv import services  # noqa: E402
+from custom_components.lifegear_hrv.const import (  # noqa: E402
+    CONF_DEVICE_MODEL,
+    DEVICE_MODEL_M8E,
+    DEVICE_MODEL_M8E_SENSOR,
+    DOMAIN,
+)
+from custom_components.lifegear_hrv.coordinator import LifegearHRVCoordinator  # noqa: E402
+from custom_components.lifegear_hrv.models import snapshot_from_dict  # noqa: E402
+
+
+def _coordinator(mac: str, model: str = DEVICE_MODEL_M8E) -> MagicMock:
+    coordinator = MagicMock(spec=LifegearHRVCoordinator)
+    coordinator.mac = mac
+    coordinator.model = model
+    coordinator.entry = MagicMock(entry_id=f"entry-{mac}", title=f"HRV {mac}",
+                                  data={CONF_DEVICE_MODEL: model})
+    coordinator.data = snapshot_from_dict(model, {"md_ispower": 1, "md_mode": 2, "md_speed": 3})
+    coordinator.async_set_control = AsyncMock(return_value=True)
+    return coordinator
+
+
+def _hass(*coordinators) -> MagicMock:
+    hass = MagicMock()
+    hass.data = {DOMAIN: {c.entry.entry_id: c for c in coordinators}}
+    return hass
+
+
+@pytest.fixture(autouse=True)
+def _no_service_target(monkeypatch):
+    monkeypatch.setattr(services, "async_extract_referenced_entity_ids", lambda hass, call: (
+        SimpleNamespace(referenced_devices=set(), referenced=set(), indirectly_referenced=set())))
+
+
+def _call(**data) -> SimpleNamespace:
+    return SimpleNamespace(data={services.ATTR_DEVICES: [], **data})
+
+
+def test_devices_are_controlled_concurrently():
+    first, second = _coordinator("AA"), _coordinator("BB")
+
+    async def run():
+        started = asyncio.Barrier(2)
+
+        async def _set(**_kwargs):
+            # Only returns once both devices are in flight at the same time
+            await asyncio.wait_for(started.wait(), 1)
+            return True
+
+        for coordinator in (first, second):
+            coordinator.async_set_control.side_effect = _set
+        return await services._async_set_many(_hass(first, second), _call(
+            power=False,
+            devices=[{services.ATTR_MAC: "aa"}, {services.ATTR_MAC: "BB"}],
+        ))
+
+    response = asyncio.run(run())
+    assert [r["ok"] for r in response["results"]] == [True, True]
+    first.async_set_control.assert_awaited_once_with(ispower=0, mode=None, speed=None)
+
+
+def test_per_device_targets_and_mode_names():
+    coordinator = _coordinator("AA")
+    response = asyncio.run(services._async_set_many(_hass(coordinator), _call(
+        speed=2, devices=[{services.ATTR_MAC: "AA", services.ATTR_SPEED: 4,
+                           services.ATTR_MODE: "新風"}],
+    )))
+    coordinator.async_set_control.assert_awaited_once_with(ispower=None, mode=2, speed=4)
+    [result] = response["results"]
+    assert result["state"] == {"power": True, "speed": 3, "mode": 2}
+
+
+def test_unknown_devices_and_sensors_are_reported():
+    sensor = _coordinator("CC", DEVICE_MODEL_M8E_SENSOR)
+    response = asyncio.run(services._async_set_many(_hass(sensor), _call(
+        power=True, devices=[{services.ATTR_MAC: "CC"}, {services.ATTR_MAC: "DD"}],
+    )))
+    assert [r.get("error") for r in response["results"]] == [
+        "sensor has no controls", "not a loaded Lifegear device"]
+
+
+def test_service_is_removed_with_the_last_entry():
+    hass = _hass(_coordinator("AA"))
+    services.async_unload_services(hass)
+    hass.services.async_remove.assert_not_called()
+    hass.data[DOMAIN].clear()
+    services.async_unload_services(hass)
+    hass.services.async_remove.assert_called_once_with(DOMAIN, services.SERVICE_SET_MANY)
+
+
+def test_nothing_selected_raises():
+    with pytest.raises(HomeAssistantError):
+        asyncio.run(services._async_set_many(_hass(), _call(power=True)))
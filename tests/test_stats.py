@@ -0,0 +1,59 @@
+"""Per-endpoint timing and error counters."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from custom_components.lifegear_hrv.health import LatencyWindow
+from custom_components.lifegear_hrv.stats import CoordinatorStats
+
+
+def test_track_counts_success_timeout_and_error():
+    stats = CoordinatorStats()
+    with stats.track("cloud", "status"):
+        pass
+    with pytest.raises(asyncio.TimeoutError):
+        with stats.track("cloud", "status"):
+            raise asyncio.TimeoutError
+    with pytest.raises(ValueError):
+        with stats.track("cloud", "status"):
+            raise ValueError("bad json")
+    endpoint = stats.endpoint("cloud", "status")
+    assert (endpoint.calls, endpoint.timeouts, endpoint.errors) == (3, 1, 1)
+    assert endpoint.last_error == "ValueError: bad json"
+    assert len(endpoint.window) == 3
+    assert endpoint.window.failure_rate == pytest.approx(2 / 3)
+
+
+def test_reject_counts_as_failure():
+    stats = CoordinatorStats()
+    stats.reject("addon", "air_index", "empty result")
+    stats.reject("addon", "air_index", "empty result")
+    with pytest.raises(asyncio.TimeoutError):
+        with stats.track("cloud", "control"):
+            raise asyncio.TimeoutError
+    assert stats.endpoint("addon", "air_index").rejected == 2
+    assert stats.failures == 3
+
+
+def test_as_dict_groups_endpoints_by_backend():
+    stats = CoordinatorStats()
+    with stats.track("cloud", "status"):
+        pass
+    stats.reject("addon", "local_status", "no data")
+    stats.record_update(True, 0.25)
+    view = stats.as_dict()
+    assert set(view["endpoints"]) == {"cloud", "addon"}
+    assert view["endpoints"]["cloud"]["status"]["calls"] == 1
+    assert view["endpoints"]["addon"]["local_status"]["last_error"] == "no data"
+    assert view["update"]["last_ms"] == 250
+
+
+def test_percentile():
+    window = LatencyWindow(size=200)
+    for ms in range(1, 101):
+        window.add(True, ms / 1000)
+    window.add(False, 9.0)
+    assert window.percentile(0.5) == 0.051
+    assert window.p95 == 0.096